@@ -0,0 +1,84 @@
+# binary_rows.py
+# A helper module that decodes next departures sent in a fixed binary
+# layout (tools/frame_server.py's /rows, encoded by its encode_rows())
+# instead of JSON: no json.loads, no dicts, no ISO strings to slice. The
+# body lands in one preallocated buffer and every field is read with
+# struct.unpack_from; route and status names are only decoded when the
+# server says its name table changed.
+#
+# Layout (little-endian), one HTTP body per request:
+#   header   b'PB', version (B), base epoch (I, board-local seconds),
+#            names id (H), names (B), rows (B)
+#   names    names x (length (B), UTF-8 bytes); name 0 is always "" (no status)
+#   rows     rows x (route name (B), seconds after base (H), status name (B), colour (B))
+# A row's seconds are NO_TIME when it only has a status. Colour indexes
+# COLORS, what the server would have drawn the row in when it encoded it.
+
+import struct
+
+import train_layout
+
+MAGIC = b'PB'
+VERSION = 1
+HEADER = '<2sBIHBB'
+HEADER_SIZE = struct.calcsize(HEADER)
+ROW = '<BHBB'
+ROW_SIZE = struct.calcsize(ROW)
+NO_TIME = 0xFFFF
+COLORS = (train_layout.GOLD, train_layout.PURPLE, train_layout.RED, train_layout.DIM)
+
+
+class RowDecoder:
+    """Decodes replies from one preallocated buffer; rows come out as (route_id, epoch, status)."""
+
+    def __init__(self, size=512, max_rows=24):
+        self.buffer = bytearray(size)
+        self.length = 0
+        self.names_id = None
+        self.names = ()
+        self.colors = bytearray(max_rows)  # Server colour index of each row last decoded
+        self.max_rows = max_rows
+
+    def read(self, chunks):
+        """Copies a response body into the buffer."""
+        length = 0
+        for chunk in chunks:
+            end = length + len(chunk)
+            if end > len(self.buffer):
+                raise ValueError(f"Rows reply over {len(self.buffer)} bytes")
+            self.buffer[length:end] = chunk
+            length = end
+        self.length = length
+
+    def records(self, limit=None):
+        """The buffered reply's rows, soonest first, as the other sources return them."""
+        buffer = self.buffer
+        if self.length < HEADER_SIZE:
+            raise ValueError("Short rows reply")
+        magic, version, base, names_id, name_count, rows = struct.unpack_from(HEADER, buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a rows reply")
+        at = HEADER_SIZE
+        if names_id != self.names_id or len(self.names) != name_count:
+            names = []
+            for _ in range(name_count):
+                length = buffer[at]
+                names.append(str(buffer[at + 1:at + 1 + length], 'utf-8'))
+                at += 1 + length
+            self.names = names
+            self.names_id = names_id
+        else:
+            for _ in range(name_count):
+                at += 1 + buffer[at]
+        if at + rows * ROW_SIZE > self.length:
+            raise ValueError("Truncated rows reply")
+        names = self.names
+        rows = min(rows, self.max_rows if limit is None else min(limit, self.max_rows))
+        records = []
+        for index in range(rows):
+            route, offset, status, color = struct.unpack_from(ROW, buffer, at)
+            at += ROW_SIZE
+            self.colors[index] = color
+            records.append((names[route], None if offset == NO_TIME else base + offset,
+                            names[status] or None))
+        return records
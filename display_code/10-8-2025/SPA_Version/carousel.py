@@ -0,0 +1,88 @@
+# carousel.py
+# A helper module that cycles the train schedule group through several
+# pages (a title, a background BMP and the routes to show) without
+# building a group per page.
+#
+# Every page shares the group's one background slot and its title and
+# prediction labels, and reads its rows from the shared PredictionStore.
+# Turning the page swaps the OnDiskBitmap (the pixels stay on flash) and
+# rewrites the labels, so an extra page costs one small Page object.
+
+import time
+
+import displayio
+
+
+class Page:
+    """One carousel page. routes: comma-separated route ids, or None for every route."""
+
+    def __init__(self, title, background, routes=None, dwell=10, max_age=60):
+        self.title = title
+        self.background = background
+        self.routes = tuple(routes.split(',')) if routes else None
+        self.dwell = dwell      # Seconds on screen before the next page
+        self.max_age = max_age  # Oldest data (seconds) this page may show without a refresh
+
+
+class Carousel:
+    """
+    Drives pages over a group laid out as setup_train_schedule_group()
+    builds it: group[0] is the background slot, group[1] the title.
+    """
+
+    def __init__(self, group, pages):
+        self.group = group
+        self.pages = pages
+        self.index = 0
+        self.shown_at = time.monotonic()
+        self._background = None  # Path of the bitmap in the slot
+        self._file = None        # OnDiskBitmap reads from this as it draws
+
+    @property
+    def page(self):
+        return self.pages[self.index]
+
+    def show(self, index):
+        """Puts page `index` on screen: background (if it differs) and title."""
+        self.index = index % len(self.pages)
+        page = self.pages[self.index]
+        if page.background != self._background:
+            self._load_background(page.background)
+        self.group[1].text = page.title
+        self.shown_at = time.monotonic()
+
+    def _load_background(self, path):
+        old_file = self._file
+        try:
+            self._file = open(path, 'rb')
+            bitmap = displayio.OnDiskBitmap(self._file)
+            self.group[0] = displayio.TileGrid(bitmap, pixel_shader=bitmap.pixel_shader)
+        except Exception as e:
+            print(f"Error loading background image: {e}")
+            self._file = None
+            self.group[0] = displayio.Group()
+        self._background = path
+        if old_file is not None:
+            old_file.close()  # Only after the slot stopped drawing from it
+
+    def close(self):
+        """Closes the background file; call once the group is off screen."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._background = None
+
+    def due(self):
+        """True when the page has had its dwell time and there is another to show."""
+        return len(self.pages) > 1 and time.monotonic() - self.shown_at >= self.page.dwell
+
+    def advance(self):
+        self.show(self.index + 1)
+
+    def stale(self, fetched_at):
+        """Whether data fetched at monotonic time `fetched_at` is too old for this page."""
+        return time.monotonic() - fetched_at > self.page.max_age
+
+    def rows(self, store, count=3):
+        """This page's next `count` (route_id, epoch, status) rows from the shared store."""
+        return store.next_n(count, self.page.routes)
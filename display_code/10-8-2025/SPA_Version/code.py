@@ -3,8 +3,11 @@
 # Subway schedule board with multiple modes
 # REFRESHED: Implements conditional zero padding for minutes < 10.
 
+import os
 import time
 import microcontroller
+from watchdog import WatchDogMode
+import rtc
 import board
 import sys # Import sys for printing exceptions
 from board import NEOPIXEL
@@ -15,11 +18,22 @@ from adafruit_matrixportal.matrix import Matrix
 from adafruit_matrixportal.network import Network
 import digitalio
 from adafruit_debouncer import Debouncer
-import json # Explicitly import json for manual parsing
 import gc # Import garbage collection module
 
 # Import the new helper file (assuming scrolling_text.py exists)
 import scrolling_text
+import memory_guard
+import gzip_stream
+import sources
+import prediction_store
+import metrics
+import request_budget
+import fetch_plan
+import carousel
+import modes
+import train_layout
+
+metrics.record_boot() # Log why we (re)started before anything else can fail
 
 # --- Button Setup ---
 pin_up = digitalio.DigitalInOut(board.BUTTON_UP)
@@ -33,56 +47,102 @@ pin_down.pull = digitalio.Pull.UP
 button_down = Debouncer(pin_down)
 
 
-# --- Mode Setup ---
-TRAIN_SCHEDULE_MODE = 0
-SECURITY_ALERT_MODE = 1
-current_mode = TRAIN_SCHEDULE_MODE
-MODE_COUNT = 2
-
 # --- CONFIGURABLE PARAMETERS ---
 BOARD_TITLE = 'To School'
 STOP_ID = '2706'
 ROUTES = '89,101' 
 BACKGROUND_IMAGE = 'Tbanner.bmp'
+# Pages the train mode cycles through: (title, background BMP, routes or None for all,
+# seconds on screen, oldest data in seconds before the page asks for a refresh).
+# All pages share one set of labels and one background slot (see carousel.py), e.g.
+# ((BOARD_TITLE, BACKGROUND_IMAGE, None, 10, 60), ('Route 89', 'Tbusdashboard.bmp', '89', 6, 45),
+#  ('Route 101', 'Tbusdashboard.bmp', '101', 6, 45)); Tblue/Tgreen/Torange/Tred-dashboard.bmp suit subway stops.
+PAGES = ((BOARD_TITLE, BACKGROUND_IMAGE, None, 10, 60),)
+FETCH_ROWS = min(3 * len(PAGES), 24) # One request feeds every page, so ask for enough rows
 
 # V3 API format
-DATA_SOURCE = f'https://api-v3.mbta.com/predictions?filter[stop]={STOP_ID}&filter[route]={ROUTES}&sort=departure_time&include=route&page[limit]=3'
+V3_PREDICTIONS = f'https://api-v3.mbta.com/predictions?filter[stop]={STOP_ID}&filter[route]={ROUTES}&sort=departure_time'
+DATA_SOURCE = f'{V3_PREDICTIONS}&include=route&page[limit]=3'
+# Cheaper request for low-memory tiers: fewer rows, no included routes, only the fields we read
+LITE_PAGE_LIMIT = 2
+DATA_SOURCE_LITE = f'{V3_PREDICTIONS}&fields[prediction]=arrival_time,departure_time,status&page[limit]={LITE_PAGE_LIMIT}'
+# The full-memory request also carries what the other modes need (see fetch_plan.py)
+SHOW_SERVICE_ALERTS = True # MBTA alerts for our routes join the alert mode's scroll text
+# Optional extra sources; the fastest healthy one is used each update (see sources.py)
+FINDER_SOURCE = None # e.g. f'https://www.mbta.com/schedules/finder_api/departures?id=89&stop={STOP_ID}&direction=1'
+GTFS_RT_SOURCE = None # e.g. 'https://cdn.mbta.com/realtime/TripUpdates.pb' (large system-wide feed)
+BINARY_ROWS_SOURCE = None # e.g. 'http://192.168.1.20:8064/rows': departures packed by tools/frame_server.py, no JSON to parse
+THIN_CLIENT_SOURCE = None # e.g. 'http://192.168.1.20:8064/frame' to show frames drawn by tools/frame_server.py
+THIN_CLIENT_DELAY = 5 # Seconds between frame requests (replies are a few bytes when nothing changed)
+USE_GZIP = True # Ask for gzip bodies when the heap has room for the inflate window
+GZIP_HEADROOM = 4096 # Bytes needed beyond the inflate window itself
+# Offline timetable from tools/gtfs_index.py, shown when live predictions fail
+SCHEDULE_INDEX_FILES = ('/sd/schedule.bin', '/schedule.bin')
 UPDATE_DELAY = 15
+# Seconds between fetches by route and hour from tools/poll_analysis.py; where it advises more
+# than UPDATE_DELAY, the rows still count down from the cache every UPDATE_DELAY in between
+POLL_SCHEDULE_FILES = ('/sd/poll_schedule.bin', '/poll_schedule.bin')
+# While another mode is on screen, refetch train data in the background (at BACKGROUND
+# priority) once it is this many seconds old, so switching back draws from the cache
+# at once; None fetches on return instead, with the buttons unread until it lands
+PREFETCH_STALENESS = 60
+# A prefetch holds up the pass of whatever is on screen until it lands (sources.UPDATE_DEADLINE
+# at most), buttons included; none starts while a button is down or this soon after a press
+PREFETCH_AFTER_PRESS = 10
 SYNC_TIME_DELAY = 120 # Sync time less often
+FULL_SYNC_DELAY = 6 * 3600 # In between, each api-v3 reply's Date header keeps the clock (see sync_from_date)
+# Reset the board if a main loop pass stalls this long (16 s is the most the M4's watchdog
+# allows; None = off). A pass makes at most one update's requests, and those end within
+# sources.UPDATE_DEADLINE + REQUEST_TIMEOUT (11 s) however many adapters fail over; the
+# time sync before them feeds the watchdog when it returns
+WATCHDOG_TIMEOUT = 16
+METRICS_DUMP_DELAY = 300 # Print the metrics block to serial this often
+METRICS_PORT = os.getenv('METRICS_PORT') # settings.toml: METRICS_PORT = 9100 serves Prometheus text at http://<board-ip>:9100/metrics
+# Free key from https://api-v3.mbta.com: 1000 requests a minute instead of 20 per IP,
+# which every board behind the same router shares. Add MBTA_API_KEY = "..." to settings.toml.
+MBTA_API_KEY = os.getenv('MBTA_API_KEY')
+# Raw API traffic log (see traffic_log.py), also set in settings.toml: TRAFFIC_LOG_DIR = "/sd"
+# (an SD card mounted there) or "/" (flash, once boot.py has made it writable) records every
+# response; TRAFFIC_REPLAY = "/sd" answers requests from those logs instead of Wi-Fi, with the
+# recorded gaps shortened TRAFFIC_REPLAY_SPEED times (0 = no waiting).
+TRAFFIC_LOG_DIR = os.getenv('TRAFFIC_LOG_DIR')
+TRAFFIC_LOG_FILES = 4 # Files in the rotation; each boot starts the next
+TRAFFIC_LOG_BYTES = 64 * 1024 # Size at which a file hands over to the next
+TRAFFIC_REPLAY = os.getenv('TRAFFIC_REPLAY')
+TRAFFIC_REPLAY_SPEED = float(os.getenv('TRAFFIC_REPLAY_SPEED') or 1)
 
 # --- Display setup ---
 matrix = Matrix()
 display = matrix.display
 network = Network(status_neopixel=NEOPIXEL)
+traffic_recorder = None
+if TRAFFIC_REPLAY:
+    import traffic_log # Optional modules load only on boards configured to use them
+    network = traffic_log.TrafficReplay(traffic_log.log_files(TRAFFIC_REPLAY, TRAFFIC_LOG_FILES),
+                                        TRAFFIC_REPLAY_SPEED)
+    if TRAFFIC_REPLAY_SPEED:
+        UPDATE_DELAY = UPDATE_DELAY / TRAFFIC_REPLAY_SPEED # Ask as often as the log answers
+        SYNC_TIME_DELAY = SYNC_TIME_DELAY / TRAFFIC_REPLAY_SPEED
+    WATCHDOG_TIMEOUT = None # Replay waits out the logged gaps inside fetch
+    print(f"Replaying traffic from {TRAFFIC_REPLAY} at {TRAFFIC_REPLAY_SPEED:g}x")
+elif TRAFFIC_LOG_DIR:
+    import traffic_log
+    traffic_recorder = network = traffic_log.TrafficRecorder(network, TRAFFIC_LOG_DIR, TRAFFIC_LOG_FILES,
+                                                             TRAFFIC_LOG_BYTES)
 
-# =======================================================================
-#               TIME PARSING HELPER
-# =======================================================================
-
-def iso_to_local_epoch(iso_time_str):
-    """
-    Parses an ISO 8601 time string into local epoch time.
-    """
-    if not iso_time_str:
-        return 0
-
-    try:
-        # Extract components: Year, Month, Day, Hour, Minute, Second
-        year = int(iso_time_str[0:4])
-        month = int(iso_time_str[5:7])
-        day = int(iso_time_str[8:10])
-        hour = int(iso_time_str[11:13])
-        minute = int(iso_time_str[14:16])
-        second = int(iso_time_str[17:19])
-        
-        # Create a time tuple: (year, month, day, hour, min, sec, weekday, yearday, dst)
-        time_tuple = (year, month, day, hour, minute, second, 0, 0, -1)
-        
-        # Convert the time tuple to local epoch seconds
-        return time.mktime(time_tuple)
-    except Exception as e:
-        print(f"ISO parse error: {e}")
-        return 0
+# --- Data sources ---
+v3_budget = request_budget.RequestBudget(keyed=bool(MBTA_API_KEY))
+v3_plan = fetch_plan.FetchPlan(V3_PREDICTIONS, FETCH_ROWS)
+v3_source = sources.V3Source(network, DATA_SOURCE, DATA_SOURCE_LITE, LITE_PAGE_LIMIT,
+                             api_key=MBTA_API_KEY, budget=v3_budget, plan=v3_plan, rows=FETCH_ROWS)
+source_list = [v3_source]
+if FINDER_SOURCE:
+    source_list.append(sources.FinderSource(network, FINDER_SOURCE, ROUTES.split(',')[0]))
+if GTFS_RT_SOURCE:
+    source_list.append(sources.GtfsRtSource(network, GTFS_RT_SOURCE, [STOP_ID], ROUTES.split(',')))
+if BINARY_ROWS_SOURCE:
+    source_list.append(sources.BinaryRowsSource(network, BINARY_ROWS_SOURCE, FETCH_ROWS))
+data_sources = sources.SourceSelector(source_list)
 
 # =======================================================================
 #               MODE 0: TRAIN SCHEDULE FUNCTIONS
@@ -90,171 +150,468 @@ def iso_to_local_epoch(iso_time_str):
 def setup_train_schedule_group():
     """Creates and returns the displayio.Group for the train schedule."""
     group = displayio.Group()
-    try:
-        bitmap = displayio.OnDiskBitmap(open(BACKGROUND_IMAGE, 'rb'))
-        group.append(displayio.TileGrid(bitmap, pixel_shader=bitmap.pixel_shader))
-    except Exception as e:
-        print(f"Error loading background image: {e}")
-        group.append(displayio.Group())
+    group.append(displayio.Group()) # Background slot; the carousel loads each page's BMP into it
 
-    colors = [0x444444, 0xDD8000, 0x9966cc] # [dim white, gold, purple]
-    font = bitmap_font.load_font("/fonts/6x10.bdf")
+    font = bitmap_font.load_font(train_layout.FONT)
 
     # Indices: 0=Background/Placeholder, 1=Title, 2/3/4=Prediction Lines
-    text_lines = [
-        adafruit_display_text.label.Label(font, color=colors[0], x=7, y=3, text=BOARD_TITLE),
-        adafruit_display_text.label.Label(font, color=colors[1], x=7, y=11, text="---"),
-        adafruit_display_text.label.Label(font, color=colors[1], x=7, y=20, text="---"),
-        adafruit_display_text.label.Label(font, color=colors[1], x=7, y=28, text="---"),
-    ]
+    text_lines = [adafruit_display_text.label.Label(font, color=train_layout.DIM, x=train_layout.TITLE_X,
+                                                    y=train_layout.TITLE_Y, text=BOARD_TITLE)]
+    for y in train_layout.ROW_YS:
+        text_lines.append(adafruit_display_text.label.Label(font, color=train_layout.GOLD,
+                                                            x=train_layout.ROW_X, y=y, text="---"))
     for line in text_lines:
         group.append(line)
     return group
 
-def update_train_schedule(group):
-    """Fetches train data from V3 API and updates the train schedule group with relative time."""
-    print("Fetching V3 train prediction data...")
-    colors = [0x444444, 0xDD8000, 0x9966cc]
-    
+# Last good predictions, kept as compact sorted arrays; used by the cached tier
+predictions_cache = prediction_store.PredictionStore()
+
+# Route short names from the included routes (route ids are names already for buses)
+route_names = {}
+
+def update_route_names(routes):
+    for route in routes:
+        name = (route.get('attributes') or {}).get('short_name')
+        if name:
+            route_names[route['id']] = name
+
+v3_plan.want('route', 'route', 'short_name', update_route_names)
+
+def render_predictions(group, predictions, current_epoch):
+    """Writes up to three (route_id, epoch, status) predictions into the prediction labels."""
+    started = metrics.start()
+
+    for i in range(3):
+        # Prediction labels start at index 2 (group[2], group[3], group[4])
+        pred_label = group[i + 2]
+        display_text, color = train_layout.EMPTY_ROW, train_layout.GOLD
+
+        if i < len(predictions):
+            try:
+                display_text, color = train_layout.row_text(predictions[i], current_epoch, route_names)
+            except Exception as e:
+                print(f"Error parsing prediction {i} data structure:")
+                print(e)
+                display_text, color = "PARSE ERR", train_layout.RED
+                metrics.count_error(e)
+
+        pred_label.color = color
+        pred_label.text = display_text
+    metrics.stop("render", started)
+
+    # Push the new text out now rather than at the next auto-refresh
+    started = metrics.start()
+    display.refresh()
+    metrics.stop("refresh", started)
+
+# Opened on first use so boards without a timetable spend no RAM on it
+offline_schedule = None
+
+def open_offline_schedule():
+    """Returns the offline ScheduleIndex, or None if no timetable file is installed."""
+    global offline_schedule
+    if offline_schedule is None:
+        for path in SCHEDULE_INDEX_FILES:
+            try:
+                open(path, 'rb').close() # No timetable installed, no module loaded
+                import schedule_index
+                offline_schedule = schedule_index.ScheduleIndex(path)
+                break
+            except (OSError, ValueError):
+                pass
+    return offline_schedule
+
+# Loaded once at startup (a few dozen bytes); None means poll every UPDATE_DELAY
+polling = None
+if not TRAFFIC_REPLAY: # A replayed log sets its own pace
+    for path in POLL_SCHEDULE_FILES:
+        try:
+            open(path, 'rb').close() # Import only if a schedule file is there; most boards have none
+            import poll_schedule
+            polling = poll_schedule.PollSchedule(path)
+            print(f"Poll schedule from {path}")
+            break
+        except (OSError, ValueError):
+            pass
+
+def update_delay(page):
+    """Seconds between fetches for the page on screen at this hour."""
+    if polling is not None:
+        advice = polling.interval(time.localtime().tm_hour, page.routes)
+        if advice:
+            return advice
+    return UPDATE_DELAY
+
+def render_scheduled(group, current_epoch):
+    """Shows the next scheduled departures from the offline timetable. Returns False if there is none."""
+    timetable = open_offline_schedule()
+    if timetable is None:
+        return False
+    now = time.localtime(current_epoch)
+    if not timetable.covers(now.tm_year * 10000 + now.tm_mon * 100 + now.tm_mday):
+        print("Offline timetable is out of date")
+        return False
+    minute = now.tm_hour * 60 + now.tm_min
+    midnight = current_epoch - minute * 60 - now.tm_sec
+    departures = timetable.next_departures(STOP_ID, ROUTES.split(','), now.tm_wday, minute)
+    if not departures:
+        return False
+    print("Showing scheduled departures (no live data)")
+    render_predictions(group, [(route, midnight + m * 60, None) for route, m in departures], current_epoch)
+    return True
+
+# The UTC offset learned at the last full sync; Date headers are UTC
+utc_offset = None
+
+def sync_from_date(date_header):
+    """
+    Keeps the clock from an api-v3 Date header so the cycle needs no time
+    request of its own. The first header after a full sync only sets the
+    offset. Returns False if the header is missing or unreadable.
+    """
+    global utc_offset
+    server_epoch = request_budget.http_date_epoch(date_header)
+    if server_epoch is None:
+        return False
+    if utc_offset is None:
+        utc_offset = round((time.time() - server_epoch) / 900) * 900
+        return True
+    local_epoch = server_epoch + utc_offset
+    if abs(local_epoch - time.time()) >= 2: # Headers are whole seconds; ignore the rounding
+        rtc.RTC().datetime = time.localtime(local_epoch)
+    return True
+
+def render_cached(group, current_epoch):
+    """Ages the last good predictions (or falls back to the timetable) without a request."""
+    predictions_cache.evict(current_epoch)
+    upcoming = train_mode.carousel.rows(predictions_cache)
+    if upcoming or not render_scheduled(group, current_epoch):
+        render_predictions(group, upcoming, current_epoch)
+
+def gzip_fits(block):
+    """gzip saves air time but the inflater needs its whole window in one block."""
+    return (USE_GZIP and gzip_stream.available()
+            and (block is None or block >= gzip_stream.WINDOW_BYTES + GZIP_HEADROOM))
+
+def prefetch_train_schedule():
+    """
+    Refreshes the prediction cache at BACKGROUND priority while another mode
+    is on screen. Nothing is drawn, and a failure only waits for the next
+    try: the screen in front of the viewer does not depend on it.
+    """
+    tier, free, block = memory_guard.choose_tier()
+    if tier == memory_guard.TIER_CACHED:
+        return False
+    try:
+        predictions = data_sources.fetch(tier, gzip_fits(block), request_budget.BACKGROUND)
+    except sources.RateLimited as e:
+        print(f"Background fetch held back: {e}")
+        return False
+    except MemoryError:
+        raise
+    except Exception as e:
+        print(f"Background fetch failed: {e}")
+        metrics.count_error(e)
+        return False
+    predictions_cache.replace(predictions)
+    del predictions
+    gc.collect()
+    return True
+
+def update_train_schedule(group, tier=None, priority=request_budget.VISIBLE):
+    """
+    Fetches train data from V3 API and updates the train schedule group with relative time.
+    Returns True if fresh predictions landed, False if the update was held back (no clock,
+    too little memory, or over the request budget) and the screen shows what it has.
+    """
+    global cached_updates
     # Get current time once for comparison
     current_epoch = time.time()
-    
+
     # --- FIX: Validate current epoch time ---
     if current_epoch < 1577836800:
         print("System time is likely unsynced or invalid. Displaying error.")
         group[2].text = "TIME"
         group[3].text = "UNSYNCED"
         group[4].text = "Check WIFI"
-        return
+        return False
     # ---------------------------------------
-    
+
+    # --- Pre-flight memory check: step down to a cheaper strategy if tight ---
+    free = block = None
+    if tier is None:
+        tier, free, block = memory_guard.choose_tier()
+        print(f"Memory tier: {memory_guard.TIER_NAMES[tier]} (free={free}, block={block})")
+        metrics.memory(free, block)
+
+    if tier == memory_guard.TIER_CACHED:
+        # Too little heap to fetch safely; age the last good predictions instead
+        print("Low memory: interpolating from cached predictions")
+        render_cached(group, current_epoch)
+        cached_updates += 1 # Only a reset clears a fragmented heap; see MAX_CACHED_UPDATES
+        return False
+
+    print("Fetching V3 train prediction data...")
     try:
-        raw_json = network.fetch_data(DATA_SOURCE, json_path=[])
-        json_data = json.loads(raw_json)
-        
-        # --- GC Optimization: Delete raw JSON string immediately ---
-        del raw_json 
-        gc.collect() 
-        # ---------------------------------------------------------
-        
-        predictions = json_data.get('data', [])
-        
-        for i in range(3):
-            display_text = "-----"
-            # Prediction labels start at index 2 (group[2], group[3], group[4])
-            pred_label = group[i + 2] 
-            pred_label.color = colors[1] # Default color (Gold)
-            
-            if i < len(predictions):
-                try:
-                    # --- Optimization: Reference objects once to reduce lookups/temp dicts ---
-                    prediction = predictions[i]
-                    attributes = prediction.get('attributes', None)
-                    relationships = prediction.get('relationships', None) 
-
-                    status = ""
-                    if attributes is not None:
-                         status = str(attributes.get('status', '')).upper()
-                    # --------------------------------------------------------------------------
-                    
-                    if status in ('BOARDING', 'BRDNG', 'ARRIVING'):
-                        display_text = "BRDNG"
-                        pred_label.color = colors[2] # Purple for boarding
-                    else:
-                        time_raw = None
-                        if attributes is not None:
-                            # Prioritize departure_time, then arrival_time
-                            time_raw = attributes.get('departure_time')
-                            if not time_raw:
-                                time_raw = attributes.get('arrival_time')
-
-                        if time_raw:
-                            # 1. Convert the prediction time to epoch seconds
-                            prediction_epoch = iso_to_local_epoch(time_raw)
-                            
-                            # 2. Calculate the difference in minutes
-                            time_diff_sec = prediction_epoch - current_epoch
-                            time_diff_min = round(time_diff_sec / 60)
-                            
-                            # Safely get the route ID
-                            route_id_data = relationships.get('route', {}).get('data', {}) if relationships else {} 
-                            route_id = f"{route_id_data.get('id', '??'):>3}"
-                            
-                            if time_diff_min <= 0:
-                                # This is the state change identified by the user
-                                display_text = f"{route_id} NOW"
-                                pred_label.color = colors[2] # Purple for immediate departure
-                            else:
-                                # --- CONDITIONAL PADDING LOGIC ---
-                                if time_diff_min < 10:
-                                    # Pad: 5 -> "05"
-                                    minute_str = f"{time_diff_min:02d}"
-                                else:
-                                    # No pad: 12 -> "12"
-                                    minute_str = str(time_diff_min)
-                                
-                                # Display route ID and time until (e.g., "89 05 min")
-                                display_text = f"{route_id} {minute_str}min"
-                        else:
-                            # If no time, but there is a status, use the status
-                            display_text = status if status else "N/A"
-                            
-                except Exception as e:
-                    print(f"Error parsing prediction {i} data structure:")
-                    print(e) 
-                    display_text = "PARSE ERR"
-                    pred_label.color = 0xFF0000 # Red error
-
-            pred_label.text = display_text
-            
+        predictions = data_sources.fetch(tier, gzip_fits(block), priority)
+        if len(source_list) > 1:
+            print(f"Data from {data_sources.last_source} ({data_sources.report()})")
+
+        predictions_cache.replace(predictions)
+        del predictions
+        cached_updates = 0
+        render_predictions(group, train_mode.carousel.rows(predictions_cache), current_epoch)
+
         # --- GC Optimization: Clean up after prediction loop ---
-        del json_data 
-        gc.collect() 
+        gc.collect()
         # -------------------------------------------------------
-            
+        return True
+
+    except sources.RateLimited as e:
+        # Over the API budget is not a fault: keep the board counting down from
+        # the cache and try again next update, without touching error_counter
+        print(f"{e}; showing cached predictions")
+        render_cached(group, current_epoch)
+        return False
+
     except Exception as e:
         # Re-raise memory error if it occurs here, so it can be caught by the main loop reset logic
         print("Error fetching V3 train data:")
-        print(e) 
-        
-        # Display connection/API error
-        group[2].text = "V3"
-        group[3].text = "API"
-        group[4].text = "Error"
+        print(e)
+
+        # Fall back to the timetable, else display connection/API error
+        if not render_scheduled(group, current_epoch):
+            group[2].text = "V3"
+            group[3].text = "API"
+            group[4].text = "Error"
         raise # Re-raise to trigger error_counter increment
 
-# Initialize Mode Groups
-train_schedule_group = setup_train_schedule_group()
+class TrainScheduleMode(modes.Mode):
+    """Live predictions over the carousel pages; the cache and fetch state outlive the group."""
+
+    name = "train schedule"
+    memory_budget = 12000 # Font glyphs, four labels and the background slot
+    uses_network = True
+    runs_in_background = PREFETCH_STALENESS is not None
+
+    def __init__(self):
+        super().__init__()
+        self.carousel = None
+        self.last_update = 0
+        self.last_render = 0
+        self.last_prefetch = 0
+        self.hold_until = 0 # No fetch before this, so a switch back is only a redraw
+
+    def enter(self, display):
+        self.group = setup_train_schedule_group()
+        self.carousel = carousel.Carousel(self.group, [carousel.Page(*page) for page in PAGES])
+        self.carousel.show(0)
+        if len(predictions_cache):
+            render_cached(self.group, time.time()) # Something to look at until the fetch lands
+            self.last_render = time.monotonic()
+        if (PREFETCH_STALENESS is None or not self.last_update
+                or time.monotonic() > self.last_update + PREFETCH_STALENESS):
+            self.last_update = 0 # Nothing warm enough: fetch on the first tick
+        else:
+            self.hold_until = time.monotonic() + UPDATE_DELAY # Warm: the next fetch waits a cycle
+        return self.group
+
+    def tick(self):
+        global last_sync
+        # Turn the page; refresh first if this page wants fresher data than we have
+        if self.carousel.due():
+            self.carousel.advance()
+            if self.carousel.stale(self.last_update):
+                self.last_update = 0
+            else:
+                render_cached(self.group, time.time())
+
+        # Update train data if it's time; in between, keep counting down from the cache
+        now = time.monotonic()
+        if now <= self.last_update + update_delay(self.carousel.page) or now <= self.hold_until:
+            if now > self.last_render + UPDATE_DELAY:
+                render_cached(self.group, time.time())
+                self.last_render = now
+            return modes.IDLE
+        v3_source.server_date = None # Only a reply to this update may set the clock
+        fetched = update_train_schedule(self.group) # Failures propagate to the main loop's error counter
+        self.last_update = self.last_render = time.monotonic() # Held back or not, wait a cycle
+        if v3_source.server_date and sync_from_date(v3_source.server_date):
+            last_sync = self.last_update # The reply's Date header was the time sync
+        return modes.UPDATED if fetched else modes.DEFERRED
+
+    def background(self):
+        # Off screen: keep the cache within PREFETCH_STALENESS, trying at most every UPDATE_DELAY
+        global last_sync
+        now = time.monotonic()
+        if now <= self.last_update + PREFETCH_STALENESS or now <= self.last_prefetch + UPDATE_DELAY:
+            return modes.IDLE
+        if not (button_up.value and button_down.value) or now <= last_press + PREFETCH_AFTER_PRESS:
+            return modes.IDLE # The viewer is at the buttons: keep the loop free to read them
+        self.last_prefetch = now
+        v3_source.server_date = None
+        if not prefetch_train_schedule():
+            return modes.IDLE
+        self.last_update = time.monotonic()
+        if v3_source.server_date and sync_from_date(v3_source.server_date):
+            last_sync = self.last_update
+        return modes.UPDATED
+
+    def exit(self):
+        if self.carousel is not None:
+            self.carousel.close() # The group is off screen: the OnDiskBitmap has stopped reading
+        self.carousel = None
+        super().exit()
+
+class ThinClientMode(modes.Mode):
+    """The train schedule drawn by tools/frame_server.py; the board only paints changed rows."""
+
+    name = "train schedule (thin client)"
+    memory_budget = 2000 # One 64x32 4-bit bitmap and its palette
+    uses_network = False # The server keeps time and does the fetching
+
+    def __init__(self):
+        super().__init__()
+        self.client = None
+        self.last_update = 0
+
+    def enter(self, display):
+        self.client = thin_client.FrameClient(display.width, display.height)
+        self.group = self.client.group
+        self.last_update = 0
+        return self.group
+
+    def tick(self):
+        if time.monotonic() <= self.last_update + THIN_CLIENT_DELAY:
+            return modes.IDLE
+        self.last_update = time.monotonic()
+        started = metrics.start()
+        deadline = time.monotonic() + sources.UPDATE_DEADLINE
+        response = network.fetch(self.client.url(THIN_CLIENT_SOURCE), timeout=sources.timeout_for(deadline))
+        finished = False
+        try:
+            if response.status_code != 200:
+                raise RuntimeError(f"Frame server answered {response.status_code}")
+            body = sources.read_body(response, deadline)
+            finished = True
+        finally:
+            sources.release(response, finished)
+        metrics.stop("fetch", started)
+        started = metrics.start()
+        changed = self.client.apply(body)
+        metrics.stop("render", started)
+        if changed:
+            display.refresh()
+        return modes.UPDATED
+
+    def exit(self):
+        self.client = None
+        super().exit()
 
 # =======================================================================
 #               MODE 1: SECURITY ALERT FUNCTIONS
 # =======================================================================
-security_alert_group = scrolling_text.create_scrolling_text_group(
-    "Security alert activated", display
-)
+ALERT_TEXT = "Security alert activated"
 
-# Set initial display group
-display.root_group = train_schedule_group 
+class SecurityAlertMode(modes.Mode):
+    """The scrolling alert; MBTA service alerts arrive with the train fetch (see fetch_plan.py)."""
+
+    name = "security alert"
+    memory_budget = 6000 # Font glyphs and one scrolling label
+
+    def __init__(self):
+        super().__init__()
+        self.text = ALERT_TEXT
+
+    def enter(self, display):
+        self.group = scrolling_text.create_scrolling_text_group(self.text, display)
+        return self.group
+
+    def tick(self):
+        # The scrolling_label animates itself
+        self.group[0].update()
+        return modes.IDLE
+
+    def update_service_alerts(self, alerts):
+        """Appends the MBTA's current alerts for our routes to the scroll text."""
+        headers = []
+        for alert in alerts:
+            attributes = alert.get('attributes') or {}
+            header = attributes.get('short_header') or attributes.get('header')
+            if header:
+                headers.append(header)
+        text = " | ".join([ALERT_TEXT] + headers)
+        if text != self.text:
+            self.text = text
+            if self.group is not None:
+                self.group[0].full_text = text
+
+# =======================================================================
+#                          MODES
+# =======================================================================
+# Add a mode here (a modes.Mode subclass) and the buttons cycle through it;
+# only the mode on screen holds its group, fonts and buffers
+if THIN_CLIENT_SOURCE:
+    import thin_client # Only thin-client boards load the frame decoder
+    train_mode = ThinClientMode()
+else:
+    train_mode = TrainScheduleMode()
+alert_mode = SecurityAlertMode()
+if SHOW_SERVICE_ALERTS:
+    v3_plan.want('alerts', 'alert', 'short_header,header', alert_mode.update_service_alerts)
+mode_manager = modes.ModeManager(display, [train_mode, alert_mode])
+mode_manager.switch(0)
 
 # =======================================================================
 #                          INITIAL SETUP
 # =======================================================================
 error_counter = 0
 last_sync = 0
-last_train_update = 0
+last_full_sync = 0
+last_press = 0 # Background prefetches wait PREFETCH_AFTER_PRESS after this
 MAX_FAILURES = 4 # --- ADDED: Constant for reset limit ---
+cached_updates = 0 # Updates in a row the memory tier answered from the cache
+# The cached tier counts down without fetching; if the heap stays too fragmented to fetch
+# for this many updates in a row (about 5 minutes), reset rather than run out of rows
+MAX_CACHED_UPDATES = 20
+
+def reset_board(cause, message):
+    """Notes why, dumps the metrics and resets."""
+    print(message)
+    metrics.note_reset(cause)
+    metrics.dump()
+    if traffic_recorder:
+        traffic_recorder.poll() # The responses that led here are what the log is for
+    # Wait briefly to let the message display before reboot
+    time.sleep(5)
+    microcontroller.reset()
 
 # --- FIX: Force initial time sync before main loop starts ---
 print("Initial time sync...")
 try:
     network.get_local_time()
-    last_sync = time.monotonic()
+    last_sync = last_full_sync = time.monotonic()
     gc.collect() 
 except Exception as e:
     print("Initial time sync failed (will retry in main loop):", e)
     error_counter = 1 # Start counter if initial sync fails
+    metrics.count_error(e)
 # -----------------------------------------------------------
 
+# --- Optional /metrics endpoint ---
+# The M4 talks to its ESP32 over SPI (network._wifi.esp); the S3 has native sockets
+metrics_server = None
+if METRICS_PORT:
+    metrics_server = metrics.serve(int(METRICS_PORT), getattr(getattr(network, '_wifi', None), 'esp', None))
+last_metrics_dump = time.monotonic()
+
+# --- Hang watchdog: only the main loop feeds it, so a stall anywhere resets the board ---
+if WATCHDOG_TIMEOUT:
+    microcontroller.watchdog.timeout = WATCHDOG_TIMEOUT
+    microcontroller.watchdog.mode = WatchDogMode.RESET
+    microcontroller.watchdog.feed()
+
 
 # =======================================================================
 #                          MAIN LOOP
@@ -265,57 +622,71 @@ while True:
     button_down.update()
 
     if button_up.fell or button_down.fell:
-        new_mode = (current_mode + 1) % MODE_COUNT
-        
-        if new_mode != current_mode:
-            current_mode = new_mode
-            print(f"Mode changed to: {current_mode}")
-            last_train_update = 0 # Force immediate update on mode change
-            
-            # --- Centralized Display Management ---
-            if current_mode == TRAIN_SCHEDULE_MODE:
-                display.root_group = train_schedule_group
-            elif current_mode == SECURITY_ALERT_MODE:
-                display.root_group = security_alert_group
-            
-            gc.collect()
+        last_press = time.monotonic()
+    if (button_up.fell or button_down.fell) and len(mode_manager.modes) > 1:
+        # The old mode's group is released before the new one is built
+        try:
+            mode_manager.next()
+            print(f"Mode changed to: {mode_manager.current.name}")
+        except Exception as e:
+            # enter() failed, or even mode 0 did not fit: counted like a failed update
+            print("Mode switch failed:", e)
+            error_counter += 1
+            metrics.count_error(e)
+            if mode_manager.current is None:
+                error_counter = MAX_FAILURES # Nothing on screen to tick: reset below
 
     # --- Step 2: Run the code for the current mode ---
-    if current_mode == TRAIN_SCHEDULE_MODE:
+    if mode_manager.uses_network():
         # Sync time if needed (Crucial for accurate time calculation!)
-        if time.monotonic() > last_sync + SYNC_TIME_DELAY:
+        if (time.monotonic() > last_sync + SYNC_TIME_DELAY
+                or time.monotonic() > last_full_sync + FULL_SYNC_DELAY):
             try:
                 print("Syncing time...")
                 network.get_local_time() 
-                last_sync = time.monotonic()
+                last_sync = last_full_sync = time.monotonic()
+                utc_offset = None # Relearn it (DST may have changed)
                 error_counter = 0 # Reset counter on sync success
                 gc.collect() 
             except Exception as e:
                 print("Time sync failed:", e)
                 error_counter += 1 # Increment counter on sync failure
+                metrics.count_error(e)
+            if WATCHDOG_TIMEOUT:
+                microcontroller.watchdog.feed() # The sync came back; the fetch gets a full period
 
-        # Update train data if it's time
-        if time.monotonic() > last_train_update + UPDATE_DELAY:
-            try:
-                update_train_schedule(train_schedule_group)
-                last_train_update = time.monotonic()
-                error_counter = 0 # Reset counter on update success
-            except Exception as e:
-                # Catch MemoryError or other failures re-raised from update_train_schedule
-                print("Critical update failure caught in main loop:", e)
-                error_counter += 1 # Increment counter on update failure
-        
-        # --- ADDED: RESET CHECK ---
-        if error_counter >= MAX_FAILURES:
-            print(f"!!! CRITICAL FAILURE: {error_counter} consecutive errors. Resetting board. !!!")
-            # Wait briefly to let the message display before reboot
-            time.sleep(5) 
-            microcontroller.reset()
-        # ---------------------------
-
-    elif current_mode == SECURITY_ALERT_MODE:
-        # The scrolling_label animates itself
-        security_alert_group[0].update()
+    try:
+        if mode_manager.tick() == modes.UPDATED:
+            error_counter = 0 # Reset counter on update success; a deferred update leaves it
+    except Exception as e:
+        # Catch MemoryError or other failures re-raised from update_train_schedule
+        print("Critical update failure caught in main loop:", e)
+        error_counter += 1 # Increment counter on update failure
+        metrics.count_error(e)
+
+    # --- ADDED: RESET CHECK ---
+    if error_counter >= MAX_FAILURES:
+        reset_board(metrics.CAUSE_ERRORS,
+                    f"!!! CRITICAL FAILURE: {error_counter} consecutive errors. Resetting board. !!!")
+    if cached_updates >= MAX_CACHED_UPDATES:
+        reset_board(metrics.CAUSE_MEMORY,
+                    f"!!! LOW MEMORY: {cached_updates} updates without room to fetch. Resetting board. !!!")
+    # ---------------------------
+
+    # --- The pass finished: tell the watchdog the loop is alive ---
+    if WATCHDOG_TIMEOUT:
+        microcontroller.watchdog.feed()
+
+    # --- Traffic log: write out what the last fetch buffered, now the frame is up ---
+    if traffic_recorder:
+        traffic_recorder.poll()
+
+    # --- Metrics: answer a waiting /metrics request, dump to serial now and then ---
+    if metrics_server:
+        metrics_server.poll()
+    if time.monotonic() > last_metrics_dump + METRICS_DUMP_DELAY:
+        metrics.dump()
+        last_metrics_dump = time.monotonic()
 
     # A tiny sleep to prevent the loop from running too fast
     time.sleep(0.1)
\ No newline at end of file
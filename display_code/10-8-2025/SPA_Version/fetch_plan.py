@@ -0,0 +1,67 @@
+# fetch_plan.py
+# A helper module that folds what every running mode needs from api-v3
+# into the one /predictions request the train mode makes each cycle.
+#
+# A mode asks for a related resource type once (want()); the plan adds it
+# to `include=` with a sparse fieldset so only the attributes it reads come
+# back, and after the fetch hands each mode its slice of `included`. The
+# response's Date header stands in for the time sync, so an update cycle
+# is one round trip however many modes are running.
+
+PREDICTION_FIELDS = 'arrival_time,departure_time,status'
+
+
+class FetchPlan:
+    """
+    Builds the combined /predictions URL and routes `included` resources
+    back to the modes that asked for them.
+    """
+
+    def __init__(self, base_url, page_limit, prediction_fields=PREDICTION_FIELDS):
+        self.base_url = base_url  # /predictions?filter[...]&sort=... (no include, fields or page)
+        self.page_limit = page_limit
+        self.prediction_fields = prediction_fields
+        # resource type -> (include name, fields, consumer)
+        self.wants = {}
+        self._url = None
+
+    def want(self, include, resource_type, fields, consumer):
+        """
+        Adds `include` (e.g. 'alerts') to every request from now on.
+        consumer(resources) gets the list of included resources of
+        `resource_type` (e.g. 'alert') after each full fetch, empty if none.
+        """
+        self.wants[resource_type] = (include, fields, consumer)
+        self._url = None
+
+    def drop(self, resource_type):
+        """Stops asking for a resource type (the mode that wanted it is gone)."""
+        if self.wants.pop(resource_type, None) is not None:
+            self._url = None
+
+    def url(self):
+        """The combined request URL, rebuilt only when the wants change."""
+        if self._url is None:
+            parts = [self.base_url]
+            includes = []
+            if self.prediction_fields:
+                parts.append(f"fields[prediction]={self.prediction_fields}")
+            for resource_type, (include, fields, _) in self.wants.items():
+                includes.append(include)
+                if fields:
+                    parts.append(f"fields[{resource_type}]={fields}")
+            if includes:
+                parts.append("include=" + ",".join(includes))
+            parts.append(f"page[limit]={self.page_limit}")
+            self._url = "&".join(parts)
+        return self._url
+
+    def distribute(self, included):
+        """Hands each wanting mode its resources from a response's `included` array."""
+        by_type = {resource_type: [] for resource_type in self.wants}
+        for resource in included or ():
+            bucket = by_type.get(resource.get('type'))
+            if bucket is not None:
+                bucket.append(resource)
+        for resource_type, resources in by_type.items():
+            self.wants[resource_type][2](resources)
@@ -0,0 +1,220 @@
+# gtfs_rt.py
+# A helper module that reads a GTFS-Realtime TripUpdates feed (protobuf) as
+# it streams in and keeps only the stop times for our stop. Nothing but the
+# current chunk and the matching rows is ever held in RAM, so any agency's
+# feed can drive the board without a protobuf library.
+
+# Protobuf wire types
+_VARINT = 0
+_FIXED64 = 1
+_LENGTH = 2
+_FIXED32 = 5
+
+# Field numbers from gtfs-realtime.proto
+_FEED_HEADER = 1
+_FEED_ENTITY = 2
+_HEADER_TIMESTAMP = 3
+_ENTITY_TRIP_UPDATE = 3
+_TRIP_UPDATE_TRIP = 1
+_TRIP_UPDATE_STOP_TIME = 2
+_TRIP_ROUTE_ID = 5
+_TRIP_DIRECTION_ID = 6
+_STOP_TIME_ARRIVAL = 2
+_STOP_TIME_DEPARTURE = 3
+_STOP_TIME_STOP_ID = 4
+_EVENT_TIME = 2
+
+
+class _Reader:
+    """Byte-at-a-time view over an iterator of chunks, counting its position."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buf = b""
+        self._at = 0
+        self.pos = 0
+
+    def _fill(self):
+        while self._at >= len(self._buf):
+            self._buf = next(self._chunks)  # StopIteration means end of feed
+            self._at = 0
+
+    def at_end(self):
+        try:
+            self._fill()
+        except StopIteration:
+            return True
+        return False
+
+    def byte(self):
+        self._fill()
+        value = self._buf[self._at]
+        self._at += 1
+        self.pos += 1
+        return value
+
+    def varint(self):
+        result = 0
+        shift = 0
+        while True:
+            value = self.byte()
+            result |= (value & 0x7F) << shift
+            if not value & 0x80:
+                return result
+            shift += 7
+
+    def read(self, count):
+        out = bytearray(count)
+        filled = 0
+        while filled < count:
+            self._fill()
+            step = min(count - filled, len(self._buf) - self._at)
+            out[filled:filled + step] = self._buf[self._at:self._at + step]
+            self._at += step
+            filled += step
+        self.pos += count
+        return bytes(out)
+
+    def skip(self, count):
+        while count:
+            self._fill()
+            step = min(count, len(self._buf) - self._at)
+            self._at += step
+            self.pos += step
+            count -= step
+
+    def skip_field(self, wire):
+        if wire == _VARINT:
+            self.varint()
+        elif wire == _LENGTH:
+            self.skip(self.varint())
+        elif wire == _FIXED64:
+            self.skip(8)
+        elif wire == _FIXED32:
+            self.skip(4)
+        else:
+            raise ValueError("Unsupported protobuf wire type %d" % wire)
+
+
+class TripUpdateFilter:
+    """
+    Streams a TripUpdates FeedMessage and collects the stop times at our stops.
+
+    After parse(), self.records holds (route_id, direction_id, epoch, stop_id)
+    tuples sorted by epoch, where epoch is the UTC departure time (or arrival
+    time when there is no departure). self.feed_timestamp is the feed
+    header's UTC timestamp, handy for working out the board's UTC offset.
+    stop_ids None keeps every stop (for host tools reading the whole feed).
+    """
+
+    def __init__(self, stop_ids, routes=None):
+        self.stop_ids = set(s.encode() for s in stop_ids) if stop_ids is not None else None
+        self.routes = set(routes) if routes else None
+        self.records = []
+        self.feed_timestamp = 0
+        self.entities = 0
+
+    def parse(self, chunks):
+        """Consumes the whole feed from an iterator of bytes chunks."""
+        reader = _Reader(chunks)
+        while not reader.at_end():
+            key = reader.varint()
+            field, wire = key >> 3, key & 7
+            if field == _FEED_ENTITY and wire == _LENGTH:
+                end = reader.varint()
+                end += reader.pos
+                self.entities += 1
+                self._entity(reader, end)
+            elif field == _FEED_HEADER and wire == _LENGTH:
+                end = reader.varint()
+                end += reader.pos
+                self._header(reader, end)
+            else:
+                reader.skip_field(wire)
+        self.records.sort(key=lambda record: record[2])
+        return self.records
+
+    def _header(self, reader, end):
+        while reader.pos < end:
+            key = reader.varint()
+            if key == (_HEADER_TIMESTAMP << 3) | _VARINT:
+                self.feed_timestamp = reader.varint()
+            else:
+                reader.skip_field(key & 7)
+
+    def _entity(self, reader, end):
+        while reader.pos < end:
+            key = reader.varint()
+            if key == (_ENTITY_TRIP_UPDATE << 3) | _LENGTH:
+                length = reader.varint()
+                self._trip_update(reader, reader.pos + length)
+            else:
+                reader.skip_field(key & 7)
+
+    def _trip_update(self, reader, end):
+        route_id = None
+        direction_id = None
+        while reader.pos < end:
+            key = reader.varint()
+            if key == (_TRIP_UPDATE_TRIP << 3) | _LENGTH:
+                length = reader.varint()
+                route_id, direction_id = self._trip(reader, reader.pos + length)
+                if self.routes is not None and route_id not in self.routes:
+                    reader.skip(end - reader.pos)  # Not our route: skip the rest unread
+                    return
+            elif key == (_TRIP_UPDATE_STOP_TIME << 3) | _LENGTH:
+                length = reader.varint()
+                hit = self._stop_time_update(reader, reader.pos + length)
+                if hit is not None:
+                    self.records.append((route_id, direction_id, hit[0], hit[1]))
+            else:
+                reader.skip_field(key & 7)
+
+    def _trip(self, reader, end):
+        route_id = None
+        direction_id = None
+        while reader.pos < end:
+            key = reader.varint()
+            if key == (_TRIP_ROUTE_ID << 3) | _LENGTH:
+                route_id = reader.read(reader.varint()).decode()
+            elif key == (_TRIP_DIRECTION_ID << 3) | _VARINT:
+                direction_id = reader.varint()
+            else:
+                reader.skip_field(key & 7)
+        return route_id, direction_id
+
+    def _stop_time_update(self, reader, end):
+        """Returns (epoch, stop_id) if this stop time is at one of our stops."""
+        arrival = departure = None
+        stop_id = None
+        while reader.pos < end:
+            key = reader.varint()
+            if key == (_STOP_TIME_STOP_ID << 3) | _LENGTH:
+                stop_id = reader.read(reader.varint())
+                if self.stop_ids is not None and stop_id not in self.stop_ids:
+                    reader.skip(end - reader.pos)  # Not our stop
+                    return None
+            elif key == (_STOP_TIME_ARRIVAL << 3) | _LENGTH:
+                length = reader.varint()
+                arrival = self._event_time(reader, reader.pos + length)
+            elif key == (_STOP_TIME_DEPARTURE << 3) | _LENGTH:
+                length = reader.varint()
+                departure = self._event_time(reader, reader.pos + length)
+            else:
+                reader.skip_field(key & 7)
+        if stop_id is None:
+            return None
+        epoch = departure or arrival
+        if not epoch:
+            return None
+        return epoch, stop_id.decode()
+
+    def _event_time(self, reader, end):
+        epoch = None
+        while reader.pos < end:
+            key = reader.varint()
+            if key == (_EVENT_TIME << 3) | _VARINT:
+                epoch = reader.varint()
+            else:
+                reader.skip_field(key & 7)
+        return epoch
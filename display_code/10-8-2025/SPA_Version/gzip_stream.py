@@ -0,0 +1,73 @@
+# gzip_stream.py
+# A helper module that inflates a gzip HTTP body chunk by chunk, so only one
+# compressed chunk and one decompressed chunk are ever in RAM at a time.
+
+try:
+    import zlib
+except ImportError:
+    zlib = None
+try:
+    import deflate  # CircuitPython 9+
+except ImportError:
+    deflate = None
+
+# gzip carries no window size, so we must match what the server compressed
+# with. MBTA's front end uses the zlib default of 15 (a 32 KB window).
+WINDOW_BITS = 15
+WINDOW_BYTES = 1 << WINDOW_BITS
+OUT_CHUNK_SIZE = 256
+
+ACCEPT_GZIP = {"Accept-Encoding": "gzip"}
+
+_decompressobj = getattr(zlib, "decompressobj", None) if zlib else None
+
+
+def available():
+    """True if this firmware can inflate gzip incrementally."""
+    return _decompressobj is not None or deflate is not None
+
+
+def is_gzip(response):
+    """True if the response body is gzip-encoded."""
+    return "gzip" in response.headers.get("content-encoding", "")
+
+
+class _ChunkReader:
+    """Makes an iterator of bytes chunks look like a stream with readinto()."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._pending = memoryview(b"")
+
+    def readinto(self, buf):
+        while not len(self._pending):
+            try:
+                self._pending = memoryview(next(self._chunks))
+            except StopIteration:
+                return 0
+        count = min(len(buf), len(self._pending))
+        buf[:count] = self._pending[:count]
+        self._pending = self._pending[count:]
+        return count
+
+
+def iter_inflated(chunks, window_bits=WINDOW_BITS, out_size=OUT_CHUNK_SIZE):
+    """Yields decompressed pieces of a gzip body as its compressed chunks arrive."""
+    if _decompressobj is not None:
+        inflater = _decompressobj(16 + window_bits)  # 16+: expect a gzip header
+        for chunk in chunks:
+            data = inflater.decompress(chunk)
+            if data:
+                yield data
+        data = inflater.flush()
+        if data:
+            yield data
+        return
+
+    stream = deflate.DeflateIO(_ChunkReader(chunks), deflate.GZIP, window_bits)
+    buf = bytearray(out_size)
+    while True:
+        count = stream.readinto(buf)
+        if not count:
+            return
+        yield bytes(buf[:count])
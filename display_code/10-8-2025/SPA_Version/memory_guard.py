@@ -0,0 +1,75 @@
+# memory_guard.py
+# A helper module that checks the heap before each train update and picks
+# how much work that update is allowed to do.
+
+import gc
+
+# --- Tiers, cheapest last ---
+TIER_FULL = 0        # Normal request, json.loads on the whole body
+TIER_SMALL_PAGE = 1  # Smaller page[limit] and sparse fields, still json.loads
+TIER_STREAM = 2      # Small request, scanned chunk by chunk (no full body)
+TIER_CACHED = 3      # No fetch at all, recompute minutes from cached epochs
+TIER_NAMES = ("full", "small page", "stream", "cached")
+
+# --- Minimum (mem_free, largest block) in bytes for each fetching tier ---
+# A 3-prediction V3 body with include=route is ~6 KB and json.loads needs
+# roughly twice that in contiguous pieces, so FULL keeps a wide margin.
+FULL_MIN_FREE = 48000
+FULL_MIN_BLOCK = 16000
+SMALL_MIN_FREE = 28000
+SMALL_MIN_BLOCK = 8000
+STREAM_MIN_FREE = 12000
+STREAM_MIN_BLOCK = 2048
+
+PROBE_LIMIT = 40960  # Never probe past this; covers the 32 KB gzip window
+PROBE_STEP = 512     # Stop the binary search when the window is this small
+
+
+def mem_free():
+    """Returns gc.mem_free(), or None where the port does not provide it."""
+    reader = getattr(gc, "mem_free", None)
+    if reader is None:
+        return None
+    return reader()
+
+
+def largest_free_block(limit=PROBE_LIMIT, step=PROBE_STEP):
+    """
+    Binary-searches the biggest bytearray the heap can hand out right now.
+    CircuitPython has no API for the largest free block, so we ask for it.
+    """
+    low, high = 0, limit
+    while high - low > step:
+        size = (low + high) // 2
+        try:
+            probe = bytearray(size)
+            del probe
+            low = size
+        except MemoryError:
+            high = size
+    return low
+
+
+def choose_tier(free=None, block=None):
+    """
+    Picks the cheapest-needed tier for the next update. Pass free/block to
+    override the measured values (the host simulator does this to fake
+    heap pressure).
+    """
+    gc.collect()
+    if free is None:
+        free = mem_free()
+    if free is None:
+        return TIER_FULL, None, None  # Host Python: no heap limits to respect
+    if block is None:
+        block = largest_free_block()
+
+    if free >= FULL_MIN_FREE and block >= FULL_MIN_BLOCK:
+        tier = TIER_FULL
+    elif free >= SMALL_MIN_FREE and block >= SMALL_MIN_BLOCK:
+        tier = TIER_SMALL_PAGE
+    elif free >= STREAM_MIN_FREE and block >= STREAM_MIN_BLOCK:
+        tier = TIER_STREAM
+    else:
+        tier = TIER_CACHED
+    return tier, free, block
@@ -0,0 +1,287 @@
+# metrics.py
+# A helper module that keeps the board's runtime numbers in fixed-size
+# buffers: recent timings for fetch/parse/render/refresh, heap snapshots,
+# error counts by exception type and the last few reset reasons (kept in
+# microcontroller.nvm so they survive the reset). Everything can be dumped
+# to serial, or served as Prometheus text on a tiny /metrics endpoint.
+#
+# Recording is two clock reads and an array store, nothing is allocated
+# per sample, so it can stay on in the field.
+
+import time
+from array import array
+
+import microcontroller
+
+RING_SIZE = 16                 # Samples kept per timer
+TIMERS = ("fetch", "parse", "render", "refresh")
+
+# Reset history lives at the end of nvm: a count byte, the cause noted
+# before a deliberate reset, then RESET_SLOTS (reason, cause) pairs, newest first
+RESET_SLOTS = 8
+NVM_OFFSET = len(microcontroller.nvm) - 2 - 2 * RESET_SLOTS
+REASONS = ("UNKNOWN", "POWER_ON", "BROWNOUT", "SOFTWARE", "DEEP_SLEEP_ALARM",
+           "RESET_PIN", "WATCHDOG", "RESCUE_DEBUG")
+CAUSES = ("none", "errors", "watchdog", "memory")   # Why the code asked for a reset
+CAUSE_NONE, CAUSE_ERRORS, CAUSE_WATCHDOG, CAUSE_MEMORY = 0, 1, 2, 3
+
+try:
+    _ticks_ns = time.monotonic_ns  # Integer ns: no float rounding after long uptimes
+except AttributeError:
+    _ticks_ns = None
+
+
+def now_ns():
+    if _ticks_ns is not None:
+        return _ticks_ns()
+    return int(time.monotonic() * 1000000000)
+
+
+class Ring:
+    """The last RING_SIZE samples (milliseconds) in a float array."""
+
+    def __init__(self, size=RING_SIZE):
+        self.samples = array('f', [0.0] * size)
+        self.index = 0
+        self.count = 0      # Samples ever added
+        self.last = 0.0
+
+    def add(self, value):
+        self.samples[self.index] = value
+        self.index = (self.index + 1) % len(self.samples)
+        self.count += 1
+        self.last = value
+
+    def stats(self):
+        """(last, mean, max) over the samples held."""
+        held = min(self.count, len(self.samples))
+        if not held:
+            return 0.0, 0.0, 0.0
+        total = peak = 0.0
+        for i in range(held):
+            value = self.samples[i]
+            total += value
+            if value > peak:
+                peak = value
+        return self.last, total / held, peak
+
+
+timers = {name: Ring() for name in TIMERS}
+errors = {}                   # Exception type name -> count
+mem_free = None               # Last heap snapshot (None where gc has no mem_free)
+mem_block = None
+boot_ns = now_ns()
+
+
+def start():
+    """Returns a start mark for stop()."""
+    return now_ns()
+
+
+def stop(name, started):
+    """Records the time since `started` under the named timer; returns it in ms."""
+    elapsed = (now_ns() - started) / 1000000
+    timers[name].add(elapsed)
+    return elapsed
+
+
+def count_error(error):
+    """Counts an exception (or a short name) under its type."""
+    name = error if isinstance(error, str) else type(error).__name__
+    errors[name] = errors.get(name, 0) + 1
+
+
+def memory(free, block=None):
+    """Keeps the latest heap figures (pass what memory_guard already measured)."""
+    global mem_free, mem_block
+    mem_free = free
+    if block is not None:
+        mem_block = block
+
+
+# =======================================================================
+#               RESET HISTORY (survives resets in nvm)
+# =======================================================================
+def _reason_code():
+    name = str(microcontroller.cpu.reset_reason).split('.')[-1]
+    return REASONS.index(name) if name in REASONS else 0
+
+
+def record_boot():
+    """Call once at startup: pushes this boot's reset reason (and noted cause) onto the history."""
+    nvm = microcontroller.nvm
+    count = nvm[NVM_OFFSET]
+    if count > RESET_SLOTS:
+        count = 0  # Never written (erased nvm reads 0xFF)
+    cause = nvm[NVM_OFFSET + 1]
+    if cause >= len(CAUSES):
+        cause = CAUSE_NONE
+    reason = _reason_code()
+    if cause == CAUSE_NONE and REASONS[reason] == "WATCHDOG":
+        cause = CAUSE_WATCHDOG  # A watchdog reset gives the code no chance to note it
+    first = NVM_OFFSET + 2
+    kept = min(count, RESET_SLOTS - 1)
+    if kept:
+        nvm[first + 2:first + 2 + 2 * kept] = nvm[first:first + 2 * kept]
+    nvm[first] = reason
+    nvm[first + 1] = cause
+    nvm[NVM_OFFSET] = kept + 1
+    nvm[NVM_OFFSET + 1] = CAUSE_NONE  # Unexplained until note_reset() says otherwise
+
+
+def note_reset(cause):
+    """Remembers why the code is about to call microcontroller.reset()."""
+    microcontroller.nvm[NVM_OFFSET + 1] = cause
+
+
+def reset_history():
+    """[(reason name, cause name)] newest first; the first entry is this boot."""
+    nvm = microcontroller.nvm
+    count = nvm[NVM_OFFSET]
+    if count > RESET_SLOTS:
+        return []
+    history = []
+    for slot in range(count):
+        at = NVM_OFFSET + 2 + 2 * slot
+        reason = nvm[at]
+        cause = nvm[at + 1]
+        history.append((REASONS[reason] if reason < len(REASONS) else "UNKNOWN",
+                        CAUSES[cause] if cause < len(CAUSES) else "none"))
+    return history
+
+
+# =======================================================================
+#               OUTPUT (serial dump and Prometheus text)
+# =======================================================================
+def lines():
+    """Yields the metrics as Prometheus text-format lines."""
+    yield "# TYPE board_uptime_seconds gauge"
+    yield f"board_uptime_seconds {(now_ns() - boot_ns) // 1000000000}"
+    yield "# TYPE board_op_ms gauge"
+    for name in TIMERS:
+        last, mean, peak = timers[name].stats()
+        yield f'board_op_ms{{op="{name}",stat="last"}} {last:.1f}'
+        yield f'board_op_ms{{op="{name}",stat="mean"}} {mean:.1f}'
+        yield f'board_op_ms{{op="{name}",stat="max"}} {peak:.1f}'
+    yield "# TYPE board_op_total counter"
+    for name in TIMERS:
+        yield f'board_op_total{{op="{name}"}} {timers[name].count}'
+    if mem_free is not None:
+        yield "# TYPE board_mem_free_bytes gauge"
+        yield f"board_mem_free_bytes {mem_free}"
+    if mem_block is not None:
+        yield "# TYPE board_mem_largest_block_bytes gauge"
+        yield f"board_mem_largest_block_bytes {mem_block}"
+    yield "# TYPE board_errors_total counter"
+    for name in errors:
+        yield f'board_errors_total{{type="{name}"}} {errors[name]}'
+    yield "# TYPE board_reset_history gauge"
+    for slot, (reason, cause) in enumerate(reset_history()):
+        yield f'board_reset_history{{slot="{slot}",reason="{reason}",cause="{cause}"}} 1'
+
+
+def dump():
+    """Prints every metric to serial between markers, one per line."""
+    print("--- metrics ---")
+    for line in lines():
+        if line[0] != '#':
+            print(line)
+    print("--- end metrics ---")
+
+
+# =======================================================================
+#               OPTIONAL /metrics ENDPOINT
+# =======================================================================
+class _SocketServer:
+    """Native sockets (socketpool on the S3): one request per poll(), never blocks."""
+
+    def __init__(self, port):
+        import socketpool
+        import wifi
+        pool = socketpool.SocketPool(wifi.radio)
+        self.sock = pool.socket(pool.AF_INET, pool.SOCK_STREAM)
+        self.sock.setsockopt(pool.SOL_SOCKET, pool.SO_REUSEADDR, 1)
+        self.sock.bind(("0.0.0.0", port))
+        self.sock.listen(1)
+        self.sock.setblocking(False)
+        self.buffer = bytearray(256)
+        print(f"Metrics on http://{wifi.radio.ipv4_address}:{port}/metrics")
+
+    def poll(self):
+        try:
+            conn, _ = self.sock.accept()
+        except OSError:
+            return  # Nobody waiting
+        try:
+            conn.settimeout(1)
+            size = conn.recv_into(self.buffer)
+            if self.buffer[:size].startswith(b"GET /metrics"):
+                conn.send(b"HTTP/1.0 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n\r\n")
+                for line in lines():
+                    conn.send(line.encode() + b"\n")
+            else:
+                conn.send(b"HTTP/1.0 404 Not Found\r\n\r\n")
+        except OSError as e:
+            count_error(e)
+        finally:
+            conn.close()
+
+
+class _EspServer:
+    """
+    ESP32 co-processor (Matrix Portal M4): a listening socket on the ESP32,
+    driven with ESP_SPIcontrol's socket calls, since the bundled
+    adafruit_esp32spi has no server module. One request per poll(); a
+    client that connects but sends nothing gets REQUEST_WAIT seconds.
+    """
+
+    NO_SOCKET = 255    # socket_available() on the listening socket: nobody waiting
+    REQUEST_WAIT = 1
+
+    def __init__(self, port, esp):
+        self.esp = esp
+        self.server = esp.get_socket()
+        esp.start_server(port, self.server)
+        print(f"Metrics on http://{esp.pretty_ip(esp.ip_address)}:{port}/metrics")
+
+    def poll(self):
+        esp = self.esp
+        try:
+            client = esp.socket_available(self.server)  # The listening socket hands over a client
+        except (OSError, RuntimeError) as e:
+            count_error(e)
+            return
+        if client == self.NO_SOCKET:
+            return
+        try:
+            give_up = time.monotonic() + self.REQUEST_WAIT
+            while not esp.socket_available(client):
+                if time.monotonic() > give_up:
+                    raise OSError("No request from metrics client")
+                time.sleep(0.01)
+            request = esp.socket_read(client, min(esp.socket_available(client), 64))
+            if request.startswith(b"GET /metrics"):
+                esp.socket_write(client, b"HTTP/1.0 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n\r\n")
+                for line in lines():
+                    esp.socket_write(client, line.encode() + b"\n")
+            else:
+                esp.socket_write(client, b"HTTP/1.0 404 Not Found\r\n\r\n")
+        except (OSError, RuntimeError) as e:
+            count_error(e)
+        finally:
+            esp.socket_close(client)
+
+
+def serve(port, esp=None):
+    """
+    Starts the /metrics endpoint; call poll() on the result every loop.
+    Pass the ESP32SPI object on co-processor boards. Returns None (and the
+    board carries on) if the port has no server support.
+    """
+    try:
+        if esp is not None:
+            return _EspServer(port, esp)
+        return _SocketServer(port)
+    except (ImportError, OSError, RuntimeError) as e:
+        print(f"Metrics endpoint unavailable: {e}")
+        return None
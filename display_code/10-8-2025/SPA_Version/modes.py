@@ -0,0 +1,114 @@
+# modes.py
+# A helper module that gives each board mode a lifecycle the main loop
+# drives: enter() builds the mode's group, fonts and buffers, tick() runs
+# once per loop while it is on screen, exit() lets all of it go. A mode
+# that keeps data warm while off screen (background()) does so without a
+# group, from what it kept on the instance.
+#
+# Only the mode on screen holds display objects, so peak memory is the
+# largest mode rather than the sum of every mode the board can show.
+
+import gc
+
+import memory_guard
+
+# What tick() and background() return
+IDLE = 0        # Nothing was due this pass (False works too)
+UPDATED = 1     # A network update landed (True works too)
+DEFERRED = 2    # An update was due but held back (request budget, low memory, no clock):
+                # neither a success nor a failure, so the main loop leaves its error count alone
+
+
+class Mode:
+    """
+    Base mode. Subclasses build self.group in enter() and return it;
+    exit() drops it. Anything that must survive a switch (cached data,
+    settings) belongs on the instance, not in the group.
+    """
+
+    name = "mode"
+    memory_budget = 0      # Bytes enter() expects to allocate
+    uses_network = False   # True if the board should keep its clock synced for this mode
+    runs_in_background = False  # True if background() should run while another mode is on screen
+
+    def __init__(self):
+        self.group = None
+
+    def enter(self, display):
+        """Builds what the mode shows; returns the group to put on screen."""
+        raise NotImplementedError
+
+    def tick(self):
+        """One pass of the main loop. Returns IDLE, UPDATED or DEFERRED."""
+        return IDLE
+
+    def background(self):
+        """One pass of the main loop while another mode is on screen; no group to draw into."""
+        return IDLE
+
+    def exit(self):
+        """Releases everything enter() built."""
+        self.group = None
+
+
+class ModeManager:
+    """Switches between modes, reclaiming the old one's memory before the next is built."""
+
+    def __init__(self, display, modes):
+        self.display = display
+        self.modes = modes
+        self.index = 0
+        self.current = None
+
+    def switch(self, index):
+        """Exits the current mode and enters modes[index]."""
+        if self.current is not None:
+            self.display.root_group = None  # Nothing may still point at the old group
+            self.current.exit()
+            self.current = None
+        gc.collect()
+
+        self.index = index % len(self.modes)
+        mode = self.modes[self.index]
+        before = memory_guard.mem_free()
+        if before is not None and before < mode.memory_budget:
+            print(f"Mode {mode.name} wants {mode.memory_budget} bytes, {before} free")
+        try:
+            group = mode.enter(self.display)
+        except MemoryError:
+            mode.exit()
+            gc.collect()
+            if self.index == 0:
+                raise
+            print(f"Not enough memory for mode {mode.name}; back to {self.modes[0].name}")
+            return self.switch(0)
+        self.current = mode
+        self.display.root_group = group
+        gc.collect()
+        if before is not None:
+            print(f"Mode {mode.name}: {before - memory_guard.mem_free()} bytes (budget {mode.memory_budget})")
+        return mode
+
+    def next(self):
+        return self.switch(self.index + 1)
+
+    def uses_network(self):
+        """Whether the mode on screen, or one working in the background, needs the network."""
+        return any(mode.uses_network and (mode is self.current or mode.runs_in_background)
+                   for mode in self.modes)
+
+    def tick(self):
+        """
+        Ticks the mode on screen, then lets the others work in the background,
+        unless the mode on screen just updated (or tried to: a deferred update
+        may still have made a request): one update's requests per pass keeps
+        the pass inside the watchdog timeout. Returns what the current mode's
+        tick() did.
+        """
+        updated = self.current.tick()
+        if updated:
+            return updated
+        for mode in self.modes:
+            if mode is not self.current and mode.runs_in_background:
+                mode.background()
+        return updated
@@ -0,0 +1,52 @@
+# poll_schedule.py
+# A helper module that reads the polling schedule written by
+# tools/poll_analysis.py: for each route (and "*" for pages showing every
+# route), the seconds between fetches the recorded traffic says are enough
+# in each hour of the day. Quiet hours get long intervals, busy ones short.
+#
+# File layout (little-endian):
+#   header   b"POLL", version (B), tables (B), stale-share target in 0.1% (H)
+#   tables   route length (B), route, then 24 x seconds (B), 0 = no advice
+
+import struct
+
+MAGIC = b"POLL"
+_HEADER = "<4sBBH"
+_HEADER_SIZE = struct.calcsize(_HEADER)
+HOURS = 24
+ALL_ROUTES = "*"
+
+
+def _exact(schedule, count):
+    data = schedule.read(count)
+    if len(data) < count:
+        raise ValueError("Truncated poll schedule")
+    return data
+
+
+class PollSchedule:
+    """Seconds between fetches per route and local hour; a few dozen bytes in RAM."""
+
+    def __init__(self, path):
+        with open(path, "rb") as schedule:
+            magic, version, count, self.target = struct.unpack(_HEADER, _exact(schedule, _HEADER_SIZE))
+            if magic != MAGIC or version != 1:
+                raise ValueError("Not a poll schedule: " + path)
+            self._tables = {}
+            for _ in range(count):
+                route = _exact(schedule, _exact(schedule, 1)[0]).decode()
+                self._tables[route] = _exact(schedule, HOURS)
+
+    def interval(self, hour, routes=None):
+        """
+        Seconds between fetches at local `hour` for a page showing `routes`
+        (a tuple of route ids, or None for every route): the shortest any of
+        them needs. None if the schedule has no advice for that hour.
+        """
+        names = routes or (ALL_ROUTES,)
+        best = None
+        for name in names:
+            table = self._tables.get(name) or self._tables.get(ALL_ROUTES)
+            if table is not None and table[hour] and (best is None or table[hour] < best):
+                best = table[hour]
+        return best
@@ -0,0 +1,118 @@
+# prediction_store.py
+# A helper module that keeps predictions in flat arrays instead of the
+# nested dicts json.loads builds. Rows stay sorted by time as they are
+# inserted, drop out once they pass the display horizon, and anything that
+# shows predictions (interpolation, streaming updates, multi-page views)
+# can share one store.
+
+from array import array
+
+NO_TIME = 0          # Epoch stored for status-only rows (e.g. "Boarding")
+NO_DIRECTION = -1
+
+
+class PredictionStore:
+    """
+    Predictions as parallel arrays: epochs (array 'l'), and small-int route,
+    direction and status codes ('B', 'b', 'B'). Route and status strings
+    are interned once in short tables. Rows come back out as the board's
+    usual (route_id, epoch, status) tuples, epoch None for status-only rows.
+    """
+
+    def __init__(self, capacity=24):
+        # Fixed-size columns plus a row count: nothing is allocated per update,
+        # and CircuitPython's array has no insert() or pop() anyway.
+        self.capacity = capacity
+        self.count = 0
+        self.epochs = array('l', [0] * capacity)
+        self.routes = array('B', [0] * capacity)
+        self.directions = array('b', [0] * capacity)
+        self.statuses = array('B', [0] * capacity)
+        self._route_names = []
+        self._status_names = [None]  # Code 0 is "no status"
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        """Drops every row and the names they used; the tables are emptied in place."""
+        self.count = 0
+        # Codes only mean something to the rows holding them, and a table kept
+        # across fetches fills up with every route and status ever seen
+        del self._route_names[:]
+        del self._status_names[1:]
+
+    def _code(self, table, name):
+        try:
+            return table.index(name)
+        except ValueError:
+            if len(table) >= 255:
+                raise ValueError("Too many distinct names for the store")
+            table.append(name)
+            return len(table) - 1
+
+    def insert(self, route_id, epoch, status=None, direction=NO_DIRECTION):
+        """Adds one prediction in time order (binary search, then one shift)."""
+        epoch = NO_TIME if epoch is None else int(epoch)
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.epochs[middle] <= epoch:
+                low = middle + 1
+            else:
+                high = middle
+        if low >= self.capacity:
+            return  # Later than everything we have room for; keep the soonest
+        last = min(self.count, self.capacity - 1)
+        for column in (self.epochs, self.routes, self.directions, self.statuses):
+            for position in range(last, low, -1):
+                column[position] = column[position - 1]
+        self.epochs[low] = epoch
+        self.routes[low] = self._code(self._route_names, route_id)
+        self.directions[low] = direction
+        self.statuses[low] = self._code(self._status_names, status)
+        self.count = last + 1
+
+    def replace(self, records, direction=NO_DIRECTION):
+        """Swaps in a fresh fetch of (route_id, epoch, status) records."""
+        self.clear()
+        for route_id, epoch, status in records:
+            self.insert(route_id, epoch, status, direction)
+
+    def evict(self, now, grace=60):
+        """Drops timed rows that left more than `grace` seconds ago. Returns how many."""
+        keep = 0
+        while keep < self.count and self.epochs[keep] == NO_TIME:
+            keep += 1
+        first_live = keep
+        while first_live < self.count and self.epochs[first_live] <= now - grace:
+            first_live += 1
+        dropped = first_live - keep
+        if dropped:
+            for column in (self.epochs, self.routes, self.directions, self.statuses):
+                for position in range(first_live, self.count):
+                    column[position - dropped] = column[position]
+            self.count -= dropped
+        return dropped
+
+    def next_n(self, count, route_id=None, direction=None):
+        """The first `count` rows, optionally for one route (or a tuple of routes) and/or direction."""
+        route_codes = None
+        if route_id is not None:
+            wanted = route_id if isinstance(route_id, (tuple, list)) else (route_id,)
+            route_codes = [self._route_names.index(r) for r in wanted if r in self._route_names]
+            if not route_codes:
+                return []
+        rows = []
+        for index in range(self.count):
+            if route_codes is not None and self.routes[index] not in route_codes:
+                continue
+            if direction is not None and self.directions[index] != direction:
+                continue
+            epoch = self.epochs[index]
+            rows.append((self._route_names[self.routes[index]],
+                         None if epoch == NO_TIME else epoch,
+                         self._status_names[self.statuses[index]]))
+            if len(rows) == count:
+                break
+        return rows
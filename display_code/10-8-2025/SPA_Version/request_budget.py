@@ -0,0 +1,121 @@
+# request_budget.py
+# A helper module that keeps the board inside the MBTA API rate limit.
+#
+# api-v3 allows about 20 requests a minute per IP without a key (1000 with
+# one), and every board behind the same router shares that. Each response
+# says how much is left (x-ratelimit-remaining) and when the window starts
+# over (x-ratelimit-reset), so the budget spreads what is left evenly over
+# the rest of the window instead of spending it as fast as the loop asks.
+# The visible page always gets the next token; background refreshes only
+# run while a reserve is left over.
+
+import time
+
+VISIBLE = 0       # The page on screen right now
+BACKGROUND = 1    # Prefetches and anything the viewer is not looking at
+
+ANON_LIMIT = 20   # Requests per window without an API key
+KEYED_LIMIT = 1000
+WINDOW = 60       # Seconds
+BURST = 3         # Tokens the bucket can hold: short bursts only
+RESERVE = 1       # Tokens background requests must leave for the visible page
+
+MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun",
+          "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+
+def http_date_epoch(value):
+    """'Thu, 30 Oct 2025 12:05:01 GMT' -> epoch seconds (None if it does not parse)."""
+    try:
+        _, day, month, year, clock, _ = value.split(' ')
+        hour, minute, second = clock.split(':')
+        return time.mktime((int(year), MONTHS.index(month) + 1, int(day),
+                            int(hour), int(minute), int(second), 0, 0, -1))
+    except (ValueError, AttributeError):
+        return None
+
+
+class RequestBudget:
+    """
+    Token bucket for one API. allow() spends a token if the priority may
+    have one; observe() re-sizes the bucket from each response's headers;
+    penalize() stops everything after a 429 until the server's Retry-After.
+    """
+
+    def __init__(self, keyed=False, window=WINDOW, burst=BURST, reserve=RESERVE):
+        self.limit = KEYED_LIMIT if keyed else ANON_LIMIT
+        self.window = window
+        self.burst = burst
+        self.reserve = reserve
+        self.rate = self.limit / window   # Tokens per second
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.reset_at = 0.0               # When the server's current window ends
+        self.remaining = None             # Last x-ratelimit-remaining seen
+        self.deferred = 0                 # Requests turned away so far
+
+    def _refill(self, now):
+        if self.reset_at and now >= self.reset_at:
+            # A fresh window: back to the nominal rate until the headers say otherwise
+            self.rate = self.limit / self.window
+            self.reset_at = 0.0
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait(self, priority=VISIBLE):
+        """Seconds until a request at this priority would be allowed."""
+        now = time.monotonic()
+        self._refill(now)
+        needed = 1 + (self.reserve if priority == BACKGROUND else 0)
+        blocked = max(0.0, self.blocked_until - now)
+        if self.tokens >= needed:
+            return blocked
+        return max(blocked, (needed - self.tokens) / self.rate if self.rate else self.window)
+
+    def allow(self, priority=VISIBLE):
+        """Takes a token and returns True, or returns False if the request should wait."""
+        if self.wait(priority) > 0:
+            self.deferred += 1
+            return False
+        self.tokens -= 1
+        return True
+
+    def observe(self, headers):
+        """Adjusts the refill rate from x-ratelimit-* headers (lower-case keys)."""
+        remaining = headers.get('x-ratelimit-remaining')
+        if remaining is None:
+            return
+        remaining = int(remaining)
+        limit = headers.get('x-ratelimit-limit')
+        if limit:
+            self.limit = int(limit)
+        self.remaining = remaining
+        reset_in = self.window
+        reset = headers.get('x-ratelimit-reset')
+        if reset:
+            # reset is a UTC epoch; compare it with the server's own Date, not our local clock
+            server_now = http_date_epoch(headers.get('date'))
+            if server_now is not None:
+                reset_in = max(1, int(reset) - server_now)
+        now = time.monotonic()
+        self._refill(now)
+        # Share what is left evenly over the rest of the window
+        self.rate = remaining / reset_in
+        self.reset_at = now + reset_in
+        if remaining < 1:
+            self.tokens = 0.0
+            self.blocked_until = max(self.blocked_until, now + reset_in)
+        elif self.tokens > remaining:
+            self.tokens = float(remaining)
+
+    def penalize(self, retry_after=None):
+        """Called on a 429: no requests until Retry-After (or one window) has passed."""
+        now = time.monotonic()
+        self.tokens = 0.0
+        self.updated = now
+        self.blocked_until = now + (retry_after if retry_after else self.window)
+
+    def report(self):
+        left = "?" if self.remaining is None else self.remaining
+        return f"{self.tokens:.1f} tokens, {left}/{self.limit} left, {self.deferred} deferred"
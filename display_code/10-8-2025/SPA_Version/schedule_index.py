@@ -0,0 +1,96 @@
+# schedule_index.py
+# A helper module that reads the offline schedule table built by
+# tools/gtfs_index.py and finds the next scheduled departures without any
+# network. Only the small directory is kept in RAM; departure minutes are
+# binary-searched straight from the file.
+
+import struct
+
+MAGIC = b"GTFI"
+_HEADER = "<4sBHII"
+_HEADER_SIZE = struct.calcsize(_HEADER)
+_ENTRY_TAIL = "<BBIH"
+_ENTRY_TAIL_SIZE = struct.calcsize(_ENTRY_TAIL)
+MINUTES_PER_DAY = 1440
+
+
+def _exact(schedule, count):
+    data = schedule.read(count)
+    if len(data) < count:
+        raise ValueError("Truncated schedule index")
+    return data
+
+
+class ScheduleIndex:
+    """Scheduled departure minutes per (stop, route, direction, weekday mask)."""
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        try:
+            magic, version, count, self.valid_from, self.valid_to = struct.unpack(
+                _HEADER, _exact(self._file, _HEADER_SIZE))
+            if magic != MAGIC or version != 1:
+                raise ValueError("Not a schedule index: " + path)
+            self._tables = {}
+            self._word = bytearray(2)
+            for _ in range(count):
+                stop = self._read_text()
+                route = self._read_text()
+                direction, mask, offset, length = struct.unpack(
+                    _ENTRY_TAIL, _exact(self._file, _ENTRY_TAIL_SIZE))
+                self._tables[(stop, route, direction, mask)] = (offset, length)
+            end = self._file.seek(0, 2)
+            if any(offset + 2 * length > end for offset, length in self._tables.values()):
+                raise ValueError("Truncated schedule index")
+        except Exception:
+            self._file.close() # Nothing else will: the caller never gets the object
+            raise
+
+    def _read_text(self):
+        return _exact(self._file, _exact(self._file, 1)[0]).decode()
+
+    def _minute_at(self, offset, position):
+        self._file.seek(offset + 2 * position)
+        self._file.readinto(self._word)
+        return self._word[0] | (self._word[1] << 8)
+
+    def _first_at_or_after(self, offset, length, minute):
+        """Binary search: index of the first departure >= minute."""
+        low, high = 0, length
+        while low < high:
+            middle = (low + high) // 2
+            if self._minute_at(offset, middle) < minute:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def covers(self, yyyymmdd):
+        """True if the table was built for a service period containing this date."""
+        return self.valid_from <= yyyymmdd <= self.valid_to
+
+    def next_departures(self, stop, routes, weekday, minute, direction=None, count=3):
+        """
+        Returns up to `count` (route, minutes_after_midnight) pairs departing
+        at or after `minute` today, earliest first. Trips still running from
+        yesterday's service day (GTFS times past 24:00) are included too.
+        """
+        found = []
+        yesterday = (weekday - 1) % 7
+        for (t_stop, t_route, t_direction, t_mask), (offset, length) in self._tables.items():
+            if t_stop != stop or t_route not in routes:
+                continue
+            if direction is not None and t_direction != direction:
+                continue
+            for day, shift in ((weekday, 0), (yesterday, MINUTES_PER_DAY)):
+                # shift: yesterday's service day runs past midnight as minutes >= 1440
+                if not t_mask & (1 << day):
+                    continue
+                position = self._first_at_or_after(offset, length, minute + shift)
+                for index in range(position, min(position + count, length)):
+                    found.append((self._minute_at(offset, index) - shift, t_route))
+        found.sort()
+        return [(route, departure) for departure, route in found[:count]]
+
+    def close(self):
+        self._file.close()
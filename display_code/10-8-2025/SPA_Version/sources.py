@@ -0,0 +1,516 @@
+# sources.py
+# Data-source adapters for the train schedule mode.
+#
+# Every adapter fetches from one endpoint and hands back the same prediction
+# records, (route_id, epoch, status), with epoch in board-local seconds (None
+# when the API only gave a status). SourceSelector keeps rolling latency,
+# payload and error figures for each adapter and always asks the fastest
+# healthy one first, failing over to the next within the same update.
+# Adapters given a RequestBudget (request_budget.py) ask it before every
+# request and feed it each response's rate-limit headers.
+#
+# No update may hang the board: SourceSelector gives each one UPDATE_DEADLINE
+# seconds, shared by every adapter it fails over to. No request or read
+# starts after it, a body still arriving then is abandoned, and each socket
+# operation blocks for at most REQUEST_TIMEOUT (less if the deadline is
+# nearer when the request goes out). A read started just before the
+# deadline can still block for its timeout, so an update's requests end
+# within UPDATE_DEADLINE + REQUEST_TIMEOUT. A body not read to the end is
+# abandoned with release(), not drained. V3 replies cut short still yield
+# the predictions that arrived whole.
+
+import time
+import json
+import gc
+
+import memory_guard
+import metrics
+import stream_json
+import gzip_stream
+from request_budget import VISIBLE
+
+CHUNK_SIZE = 256
+ROWS = 3
+REQUEST_TIMEOUT = 5   # Seconds any one connect or read may block
+UPDATE_DEADLINE = 6   # Seconds after which an update starts no request or read, failovers included
+
+
+def iso_to_local_epoch(iso_time_str):
+    """
+    Parses an ISO 8601 time string into local epoch time.
+    """
+    if not iso_time_str:
+        return 0
+
+    try:
+        # Extract components: Year, Month, Day, Hour, Minute, Second
+        year = int(iso_time_str[0:4])
+        month = int(iso_time_str[5:7])
+        day = int(iso_time_str[8:10])
+        hour = int(iso_time_str[11:13])
+        minute = int(iso_time_str[14:16])
+        second = int(iso_time_str[17:19])
+
+        # Create a time tuple: (year, month, day, hour, min, sec, weekday, yearday, dst)
+        time_tuple = (year, month, day, hour, minute, second, 0, 0, -1)
+
+        # Convert the time tuple to local epoch seconds
+        return time.mktime(time_tuple)
+    except Exception as e:
+        print(f"ISO parse error: {e}")
+        return 0
+
+
+def load_json(raw):
+    """fetch_data already parses application/json bodies; V3's vnd.api+json comes back as text."""
+    if isinstance(raw, (str, bytes, bytearray)):
+        return json.loads(raw)
+    return raw
+
+
+class DeadlineExceeded(OSError):
+    """The update's deadline passed before the reply (or the next request) was done."""
+
+    def __init__(self, received):
+        super().__init__(f"Update deadline passed after {received} bytes")
+
+
+def timeout_for(deadline):
+    """The socket timeout for a request started now: REQUEST_TIMEOUT, less if the deadline is nearer."""
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded(0)
+    return min(REQUEST_TIMEOUT, left)
+
+
+def release(response, finished):
+    """
+    Closes a response. adafruit_requests' close() first reads off whatever is
+    left of the body, which blocks again on a stalled socket and can raise;
+    a body not read to the end (stopped early, cut short, out of time) has
+    its socket closed and taken off the response instead, so close() has
+    nothing to drain. Never raises: the caller's own result or error stands.
+    """
+    try:
+        socket = None if finished else getattr(response, 'socket', None)
+        if socket is not None:
+            session = getattr(response, '_session', None)
+            try:
+                if session is not None:
+                    session._connection_manager.close_socket(socket) # Also forgets it
+                else:
+                    socket.close()
+            finally:
+                response.socket = None
+        response.close()
+    except Exception as e:
+        print(f"Closing response: {e}")
+
+
+def read_body(response, deadline):
+    """The whole body as a bytearray, read in chunks so the deadline can stop it."""
+    body = bytearray()
+    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+        body.extend(chunk)
+        if time.monotonic() > deadline:
+            raise DeadlineExceeded(len(body))
+    return body
+
+
+class HttpStatusError(Exception):
+    """A reply other than 200; network.fetch() returns those like any other."""
+
+    def __init__(self, status, url):
+        super().__init__(f"Code {status}: {url}")
+        self.status = status
+
+
+class RateLimited(Exception):
+    """The API answered 429, or the budget held the request back; retry_in is seconds."""
+
+    def __init__(self, retry_in):
+        super().__init__(f"Rate limited, retry in {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+def retry_after(response, default=None):
+    """Retry-After in seconds (the MBTA sends seconds, never an HTTP date)."""
+    try:
+        return int(response.headers.get('retry-after'))
+    except (AttributeError, TypeError, ValueError):
+        return default
+
+
+class Source:
+    """Base adapter. Subclasses set `name` and implement fetch()."""
+
+    name = "source"
+    streams = False  # True if it can run without the whole body in RAM
+
+    def __init__(self, network, api_key=None, budget=None):
+        self.network = network
+        self.api_key = api_key
+        self.budget = budget  # RequestBudget, or None for an endpoint with no limit
+        self.last_payload = 0  # Bytes received by the last fetch
+        self.server_date = None  # Date header of the last good response; callers clear it before an update
+
+    def supports(self, tier):
+        """Whether this adapter can run at the given memory tier."""
+        if tier == memory_guard.TIER_CACHED:
+            return False
+        return tier == memory_guard.TIER_FULL or self.streams
+
+    def fetch(self, tier, use_gzip, deadline):
+        """Returns a list of (route_id, epoch, status) records, soonest first, by `deadline` (monotonic)."""
+        raise NotImplementedError
+
+    def _request(self, url, deadline, use_gzip=False):
+        """network.fetch() with the API key, feeding rate-limit headers to the budget."""
+        headers = None
+        if use_gzip or self.api_key:
+            headers = dict(gzip_stream.ACCEPT_GZIP) if use_gzip else {}
+            if self.api_key:
+                headers['x-api-key'] = self.api_key
+        # Transport errors (no reply at all) propagate; a reply comes back whatever its status
+        response = self.network.fetch(url, headers=headers, timeout=timeout_for(deadline))
+        if self.budget is not None:
+            self.budget.observe(response.headers)
+            if response.status_code == 429:
+                wait = retry_after(response, self.budget.window)
+                self.budget.penalize(wait)
+                release(response, False)
+                raise RateLimited(wait)
+        if response.status_code != 200: # fetch() hands back error replies; only fetch_data() checks
+            release(response, False) # The error body is not worth waiting for
+            raise HttpStatusError(response.status_code, url)
+        self.server_date = response.headers.get('date')
+        return response
+
+    def _open(self, url, deadline, use_gzip=False):
+        """
+        Starts a request; returns (response, chunks), counting bytes,
+        inflating gzip and raising DeadlineExceeded if the body runs late.
+        """
+        response = self._request(url, deadline, use_gzip)
+        self.last_payload = 0
+        chunks = self._counted(response.iter_content(chunk_size=CHUNK_SIZE), deadline)
+        if gzip_stream.is_gzip(response):
+            chunks = gzip_stream.iter_inflated(chunks)
+        return response, chunks
+
+    def _counted(self, chunks, deadline):
+        for chunk in chunks:
+            self.last_payload += len(chunk)
+            yield chunk
+            if time.monotonic() > deadline:
+                raise DeadlineExceeded(self.last_payload)
+
+
+class V3Source(Source):
+    """
+    api-v3.mbta.com /predictions, with the memory-tier request variants.
+    Given a FetchPlan, the full tier asks for the plan's combined URL and
+    distributes its `included` resources to the modes that want them.
+    """
+
+    name = "v3"
+    streams = True
+
+    def __init__(self, network, url, lite_url, lite_limit, api_key=None, budget=None, plan=None,
+                 rows=ROWS):
+        super().__init__(network, api_key, budget)
+        self.url = url
+        self.lite_url = lite_url
+        self.lite_limit = lite_limit
+        self.plan = plan
+        self.rows = rows  # Records kept from a full-tier reply (more when several pages share it)
+
+    def fetch(self, tier, use_gzip, deadline):
+        started = metrics.start()
+        if tier == memory_guard.TIER_STREAM:
+            # Scan the body chunk by chunk; stop reading once we have our rows
+            scanner = stream_json.PredictionScanner(self.lite_limit)
+            response, chunks = self._open(self.lite_url, deadline, use_gzip)
+            finished = False
+            try:
+                for chunk in chunks:
+                    if scanner.feed(chunk):
+                        break # The rest of the body is abandoned, not downloaded
+                else:
+                    finished = True
+            except OSError as e: # Timed out or dropped partway: keep the rows that arrived whole
+                if not scanner.records:
+                    raise
+                self._cut_short(e, len(scanner.records))
+            finally:
+                release(response, finished)
+            metrics.stop("fetch", started) # Parsing is interleaved with the download here
+            return self._records(scanner.records)
+
+        full = tier == memory_guard.TIER_FULL
+        url = self.lite_url
+        if full:
+            url = self.plan.url() if self.plan is not None else self.url
+        # fetch() rather than fetch_data() so the rate-limit headers reach the budget, read
+        # chunk by chunk so the deadline can stop it; with gzip only the inflated body
+        # accumulates, each compressed chunk is dropped once inflated
+        response, chunks = self._open(url, deadline, use_gzip)
+        raw_json = bytearray()
+        finished = False
+        try:
+            for chunk in chunks:
+                raw_json.extend(chunk)
+            finished = True
+        except OSError as e: # Timed out or dropped partway: scan what arrived for whole predictions
+            scanner = stream_json.PredictionScanner(self.rows)
+            scanner.feed(raw_json)
+            del raw_json
+            if not scanner.records:
+                raise
+            self._cut_short(e, len(scanner.records))
+            metrics.stop("fetch", started)
+            return self._records(scanner.records)
+        finally:
+            release(response, finished)
+        metrics.stop("fetch", started)
+        started = metrics.start()
+        json_data = load_json(raw_json)
+
+        # --- GC Optimization: Delete raw JSON string immediately ---
+        del raw_json
+        gc.collect()
+        # ---------------------------------------------------------
+
+        fields = [stream_json.prediction_fields(p) for p in json_data.get('data', [])[:self.rows]]
+        if full and self.plan is not None:
+            self.plan.distribute(json_data.get('included'))
+        del json_data
+        records = self._records(fields)
+        metrics.stop("parse", started)
+        return records
+
+    def _cut_short(self, error, count):
+        print(f"{error}; using the {count} predictions read before it")
+        metrics.count_error(error)
+
+    def _records(self, fields):
+        # Convert the prediction time to epoch seconds once; the cache keeps epochs
+        return [(route_id, iso_to_local_epoch(time_raw) if time_raw else None, status)
+                for route_id, time_raw, status in fields]
+
+
+class FinderSource(Source):
+    """www.mbta.com finder_api /departures (the New Version board's source)."""
+
+    name = "finder"
+
+    def __init__(self, network, url, route_id):
+        super().__init__(network)
+        self.url = url
+        self.route_id = route_id
+
+    def fetch(self, tier, use_gzip, deadline):
+        started = metrics.start()
+        response = self._request(self.url, deadline)
+        finished = False
+        try:
+            body = read_body(response, deadline)
+            finished = True
+        finally:
+            release(response, finished)
+        metrics.stop("fetch", started)
+        schedule = load_json(body)
+        del body
+        now = time.time()
+        records = []
+        for entry in schedule:
+            try:
+                time_parts = entry['realtime']['prediction']['time']
+            except (KeyError, TypeError):
+                continue
+            route = entry.get('route') or {}
+            route_id = route.get('id', self.route_id) if isinstance(route, dict) else self.route_id
+            first = str(time_parts[0]).lower()
+            if first in ('boarding', 'arriving', 'brding'):
+                records.append((route_id, None, 'BOARDING'))
+            else:
+                epoch = self._finder_epoch(first, time_parts, now)
+                if epoch is not None:
+                    records.append((route_id, epoch, None))
+            if len(records) == ROWS:
+                break
+        del schedule
+        return records
+
+    def _finder_epoch(self, first, time_parts, now):
+        """finder_api gives '5', ' ', 'min' for near trains and '9:41', ' ', 'PM' for later ones."""
+        if ':' not in first:
+            try:
+                return now + int(first) * 60
+            except ValueError:
+                return None
+        hours, minutes = first.split(':')
+        hour = int(hours) % 12
+        if len(time_parts) > 2 and str(time_parts[2]).upper().startswith('P'):
+            hour += 12
+        today = time.localtime(now)
+        epoch = time.mktime((today.tm_year, today.tm_mon, today.tm_mday, hour, int(minutes), 0, 0, 0, -1))
+        if epoch < now - 12 * 3600:
+            epoch += 24 * 3600  # Past midnight
+        return epoch
+
+
+class GtfsRtSource(Source):
+    """Any agency's GTFS-Realtime TripUpdates feed, filtered to our stop as it streams."""
+
+    name = "gtfs-rt"
+    streams = True
+
+    def __init__(self, network, url, stop_ids, routes=None):
+        super().__init__(network)
+        self.url = url
+        self.stop_ids = stop_ids
+        self.routes = routes
+        import gtfs_rt # Only boards with GTFS_RT_SOURCE set pay for the protobuf decoder
+        self.feed_filter = gtfs_rt.TripUpdateFilter
+
+    def fetch(self, tier, use_gzip, deadline):
+        started = metrics.start()
+        feed = self.feed_filter(self.stop_ids, self.routes)
+        response, chunks = self._open(self.url, deadline, use_gzip)
+        finished = False
+        try:
+            feed.parse(chunks)
+            finished = True
+        finally:
+            release(response, finished)
+        metrics.stop("fetch", started) # Decoded as it streams
+        # Feed times are UTC; the board clock is local. The header timestamp is
+        # "now" in UTC, so the difference is our offset (rounded to 15 min).
+        offset = 0
+        if feed.feed_timestamp:
+            offset = round((time.time() - feed.feed_timestamp) / 900) * 900
+        now = time.time()
+        return [(route_id, epoch + offset, None)
+                for route_id, _, epoch, _ in feed.records if epoch + offset > now - 60][:ROWS]
+
+
+class BinaryRowsSource(Source):
+    """
+    tools/frame_server.py's /rows: the next departures already picked and
+    packed by a computer on the LAN (binary_rows.py), so the board reads
+    fixed-size fields out of one reused buffer instead of parsing JSON.
+    """
+
+    name = "binary"
+    streams = True  # The buffer is allocated once, whatever the tier
+
+    def __init__(self, network, url, rows=ROWS):
+        super().__init__(network)
+        self.url = url
+        self.rows = rows
+        import binary_rows # Loaded only on boards that configure this adapter
+        self.decoder = binary_rows.RowDecoder(max_rows=max(rows, ROWS))
+
+    def fetch(self, tier, use_gzip, deadline):
+        started = metrics.start()
+        response, chunks = self._open(f"{self.url}?count={self.rows}", deadline)
+        finished = False
+        try:
+            self.decoder.read(chunks)
+            finished = True
+        finally:
+            release(response, finished)
+        metrics.stop("fetch", started) # Read into the buffer; decoding is a few unpacks
+        return self.decoder.records(self.rows if tier == memory_guard.TIER_FULL else ROWS)
+
+
+class SourceSelector:
+    """Routes each fetch to the fastest healthy adapter and fails over instantly."""
+
+    def __init__(self, sources, smoothing=0.3, max_error_rate=0.5, max_failures=2, retry_after=300):
+        self.sources = sources
+        self.smoothing = smoothing
+        self.max_error_rate = max_error_rate
+        self.max_failures = max_failures
+        self.retry_after = retry_after
+        # Per source: [latency s (None = untried), payload bytes, error rate, failures in a row, down until]
+        self.stats = {source.name: [None, 0, 0.0, 0, 0] for source in sources}
+        self.last_source = None
+
+    def ranked(self, tier):
+        """Adapters usable at this tier, healthy ones fastest first, then the rest."""
+        now = time.monotonic()
+        usable = [s for s in self.sources if s.supports(tier)]
+        healthy = [s for s in usable if self.stats[s.name][4] <= now]
+        # Untried adapters sort first so each gets measured once
+        healthy.sort(key=lambda s: (self.stats[s.name][0] or 0, self.stats[s.name][1]))
+        return healthy + [s for s in usable if s not in healthy]
+
+    def fetch(self, tier, use_gzip, priority=VISIBLE):
+        """
+        Fetches records from the best adapter, trying the others on failure
+        until UPDATE_DEADLINE has passed. An adapter whose budget says wait
+        is skipped, not marked down; if nothing else could answer,
+        RateLimited says how long to wait.
+        """
+        deadline = time.monotonic() + UPDATE_DEADLINE
+        last_error = None
+        waits = []
+        for source in self.ranked(tier):
+            if time.monotonic() >= deadline:
+                last_error = last_error or DeadlineExceeded(0)
+                break # Out of time: the other adapters wait for the next update
+            if source.budget is not None and not source.budget.allow(priority):
+                waits.append(source.budget.wait(priority))
+                continue
+            start = time.monotonic()
+            try:
+                records = source.fetch(tier, use_gzip, deadline)
+            except RateLimited as e:  # The server's limit, not the adapter's health
+                print(f"Source {source.name}: {e}")
+                waits.append(e.retry_in)
+                continue
+            except Exception as e:  # Any failure fails over; MemoryError included
+                self._failed(source)
+                print(f"Source {source.name} failed: {e}")
+                last_error = e
+                gc.collect()
+                continue
+            self._succeeded(source, time.monotonic() - start)
+            self.last_source = source.name
+            return records
+        if last_error is None:
+            if waits:
+                raise RateLimited(min(waits))
+            raise RuntimeError("No data source for this memory tier")
+        raise last_error
+
+    def _succeeded(self, source, elapsed):
+        stats = self.stats[source.name]
+        a = self.smoothing
+        stats[0] = elapsed if stats[0] is None else stats[0] + a * (elapsed - stats[0])
+        stats[1] = source.last_payload if not stats[1] else int(stats[1] + a * (source.last_payload - stats[1]))
+        stats[2] *= 1 - a
+        stats[3] = 0
+        stats[4] = 0
+
+    def _failed(self, source):
+        stats = self.stats[source.name]
+        stats[2] += self.smoothing * (1 - stats[2])
+        stats[3] += 1
+        if stats[3] >= self.max_failures or stats[2] > self.max_error_rate:
+            stats[4] = time.monotonic() + self.retry_after  # Rest it, then probe again
+
+    def report(self):
+        """One line per adapter for the serial log."""
+        lines = []
+        for source in self.sources:
+            latency, payload, error_rate, failures, down_until = self.stats[source.name]
+            state = "down" if down_until > time.monotonic() else "ok"
+            latency_ms = "-" if latency is None else f"{latency * 1000:.0f}ms"
+            line = f"{source.name}: {state} {latency_ms} {payload}B err={error_rate:.2f}"
+            if source.budget is not None:
+                line += f" budget={source.budget.report()}"
+            lines.append(line)
+        return "; ".join(lines)
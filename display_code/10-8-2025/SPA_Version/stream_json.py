@@ -0,0 +1,131 @@
+# stream_json.py
+# A helper module that pulls prediction fields out of a V3 /predictions
+# response one chunk at a time, so the whole body never has to sit in RAM.
+
+_QUOTE = 0x22
+_BACKSLASH = 0x5C
+_OPEN_OBJ = 0x7B
+_CLOSE_OBJ = 0x7D
+_OPEN_ARR = 0x5B
+_CLOSE_ARR = 0x5D
+_COLON = 0x3A
+_COMMA = 0x2C
+
+MAX_STRING = 64  # Longer strings are truncated; none of our fields get close
+
+_ATTRIBUTE_FIELDS = ("arrival_time", "departure_time", "status")
+
+
+def prediction_fields(prediction):
+    """
+    Returns (route_id, time_raw, status) from one json.loads'd prediction,
+    the same tuple PredictionScanner produces. departure_time wins over
+    arrival_time, as on the board.
+    """
+    attributes = prediction.get('attributes', None) or {}
+    relationships = prediction.get('relationships', None) or {}
+    route_data = relationships.get('route', {}).get('data', {}) or {}
+    time_raw = attributes.get('departure_time') or attributes.get('arrival_time')
+    return (route_data.get('id'), time_raw, attributes.get('status'))
+
+
+class PredictionScanner:
+    """
+    Incremental scanner over the bytes of a V3 predictions document.
+
+    Call feed() with each chunk as it comes off the socket. Finished
+    predictions are appended to self.records as (route_id, time_raw, status)
+    tuples, and feed() returns True once `limit` records are in (or the
+    'data' array has closed), so the caller can stop reading the body.
+    Only the current token is ever buffered.
+    """
+
+    def __init__(self, limit=3):
+        self.limit = limit
+        self.records = []
+        self.done = False
+        self._stack = []           # One '{' or '[' per open level
+        self._keys = []            # Most recent key at each level
+        self._in_string = False
+        self._escape = False
+        self._buf = bytearray()
+        self._expect_key = False
+        self._current = None       # [route_id, departure, arrival, status]
+
+    def feed(self, chunk):
+        """Consumes one bytes chunk. Returns True when no more data is needed."""
+        if self.done:
+            return True
+        buf = self._buf
+        for c in chunk:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    if len(buf) < MAX_STRING:
+                        buf.append(c)
+                elif c == _BACKSLASH:
+                    self._escape = True
+                elif c == _QUOTE:
+                    self._in_string = False
+                    self._string_done()
+                    if self.done:
+                        return True
+                elif len(buf) < MAX_STRING:
+                    buf.append(c)
+            elif c == _QUOTE:
+                self._in_string = True
+                buf[:] = b''
+            elif c == _OPEN_OBJ:
+                self._stack.append(c)
+                self._keys.append(None)
+                self._expect_key = True
+                if len(self._stack) == 3 and self._keys[0] == 'data':
+                    self._current = [None, None, None, None]
+            elif c == _OPEN_ARR:
+                self._stack.append(c)
+                self._keys.append(None)
+            elif c == _CLOSE_OBJ or c == _CLOSE_ARR:
+                self._close()
+                if self.done:
+                    return True
+            elif c == _COLON:
+                self._expect_key = False
+            elif c == _COMMA:
+                self._expect_key = bool(self._stack) and self._stack[-1] == _OPEN_OBJ
+        return False
+
+    def _close(self):
+        depth = len(self._stack)
+        in_data = depth >= 2 and self._keys[0] == 'data'
+        if in_data and depth == 3 and self._current is not None:
+            route_id, departure, arrival, status = self._current
+            self.records.append((route_id, departure or arrival, status))
+            self._current = None
+            if len(self.records) >= self.limit:
+                self.done = True
+        self._stack.pop()
+        self._keys.pop()
+        if in_data and depth == 2:
+            self.done = True  # 'data' array closed
+        self._expect_key = False
+
+    def _string_done(self):
+        text = self._buf.decode()
+        if self._stack and self._stack[-1] == _OPEN_OBJ and self._expect_key:
+            self._keys[-1] = text
+            return
+        current = self._current
+        if current is None:
+            return
+        keys = self._keys
+        depth = len(keys)
+        if depth == 4 and keys[2] == 'attributes' and keys[3] in _ATTRIBUTE_FIELDS:
+            if keys[3] == 'departure_time':
+                current[1] = text
+            elif keys[3] == 'arrival_time':
+                current[2] = text
+            else:
+                current[3] = text
+        elif (depth == 6 and keys[2] == 'relationships' and keys[3] == 'route'
+              and keys[4] == 'data' and keys[5] == 'id'):
+            current[0] = text
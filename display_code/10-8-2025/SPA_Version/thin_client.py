@@ -0,0 +1,81 @@
+# thin_client.py
+# A helper module for thin-client mode: a computer on the same network
+# (tools/frame_server.py) draws the train schedule screen and the board
+# only paints the pixel rows that changed into one indexed Bitmap.
+#
+# No JSON, no time parsing and no labels on the board: the screen is a
+# 64x32 4-bit Bitmap (1 KB) and its palette, and an update is a short
+# run-length encoded list of rows.
+#
+# Wire format (big-endian), one HTTP body per request:
+#   header   b'TF', version (B), flags (B), session (I), seq (I), rows (B)
+#   palette  if flags & FLAG_PALETTE: count (B), then count x (R, G, B)
+#   rows     y (B), runs (B), then runs x (length (B), color index (B))
+# Each row record replaces a whole pixel row. The board asks for
+# ?session=<session>&since=<seq> of the last frame it painted; the server
+# answers with only the rows changed since then, or with every row and
+# the palette (FLAG_FULL) when it doesn't know that session.
+
+import struct
+
+import displayio
+
+try:
+    import bitmaptools  # CircuitPython 7+: fills a run in C
+except ImportError:
+    bitmaptools = None
+
+MAGIC = b'TF'
+VERSION = 1
+FLAG_PALETTE = 1
+FLAG_FULL = 2
+HEADER = '>2sBBIIB'
+HEADER_SIZE = struct.calcsize(HEADER)
+COLORS = 16  # Palette slots, so the Bitmap needs 4 bits per pixel
+
+
+class FrameClient:
+    """Holds the screen Bitmap and paints frame server replies into it."""
+
+    def __init__(self, width=64, height=32):
+        self.bitmap = displayio.Bitmap(width, height, COLORS)
+        self.palette = displayio.Palette(COLORS)
+        self.group = displayio.Group()
+        self.group.append(displayio.TileGrid(self.bitmap, pixel_shader=self.palette))
+        self.session = 0
+        self.seq = 0
+        self.rows_painted = 0
+
+    def url(self, base):
+        """The request for everything that changed since the last painted frame."""
+        return f"{base}?session={self.session}&since={self.seq}"
+
+    def apply(self, body):
+        """Paints one reply. Returns True if anything on screen changed."""
+        magic, version, flags, session, seq, rows = struct.unpack_from(HEADER, body, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a frame server reply")
+        at = HEADER_SIZE
+        if flags & FLAG_PALETTE:
+            count = body[at]
+            at += 1
+            for index in range(count):
+                self.palette[index] = (body[at] << 16) | (body[at + 1] << 8) | body[at + 2]
+                at += 3
+        bitmap = self.bitmap
+        for _ in range(rows):
+            y, runs = body[at], body[at + 1]
+            at += 2
+            x = 0
+            for _ in range(runs):
+                length, value = body[at], body[at + 1]
+                at += 2
+                if bitmaptools is not None:
+                    bitmaptools.fill_region(bitmap, x, y, x + length, y + 1, value)
+                else:
+                    for px in range(x, x + length):
+                        bitmap[px, y] = value
+                x += length
+        self.session, self.seq = session, seq
+        self.rows_painted += rows
+        return bool(rows or flags & FLAG_PALETTE)
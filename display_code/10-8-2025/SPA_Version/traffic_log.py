@@ -0,0 +1,519 @@
+# traffic_log.py
+# A helper module that records every raw API response the board gets to a
+# small rotating log on SD (or flash), and plays such logs back in place
+# of the network, so traffic captured in the field can drive the board,
+# the simulator and the benchmarks offline, reset sequences included.
+#
+# TrafficRecorder wraps the Network object: responses pass through as
+# usual and each chunk the board reads is copied into one preallocated
+# buffer. The buffer is only written out by poll(), which the main loop
+# calls after the screen is drawn, or when a record would not fit (which
+# happens during the fetch, never during rendering). Any file error turns
+# recording off rather than reaching the fetch path.
+#
+# Log files are <directory>/traffic0.bin ... traffic<N-1>.bin; each boot
+# starts the next one, and a file that has grown past max_bytes hands over
+# to the next at the following record, overwriting the oldest. Format
+# (little-endian):
+#   file     b'TL', version (B), sequence (I), reset reason (B), cause (B)
+#   record   kind (B), monotonic ms (I), wall-clock epoch (I), url length (H), url
+#            (length 0: the same URL as the file's previous request)
+#     RESPONSE   status (H), headers length (H), "name: value\n" headers, then the
+#                body as the board read it: chunks of length (H) + bytes, a
+#                zero length, and an end byte (END_COMPLETE, _CLOSED, _DROPPED)
+#     ERROR      message length (H), "ExceptionName: message"
+#     TIME       nothing more (no URL): the wall clock the time sync set
+# A record cut short by a reset just ends the file.
+
+import json
+import struct
+import time
+
+import metrics
+import rtc
+
+MAGIC = b'TL'
+VERSION = 1
+FILE_HEADER = '<2sBIBB'
+RECORD = '<BIIH'
+RESPONSE = '<HH'
+LENGTH = '<H'
+
+RESPONSE_RECORD = 1
+ERROR_RECORD = 2
+TIME_RECORD = 3
+
+END_COMPLETE = 0  # Body read to the end
+END_CLOSED = 1    # Closed early (e.g. a streaming scanner had its rows)
+END_DROPPED = 2   # The connection dropped while reading
+
+# Response headers the board acts on; the rest are not worth the SD space
+KEPT_HEADERS = ('content-type', 'content-encoding', 'date', 'retry-after',
+                'x-ratelimit-limit', 'x-ratelimit-remaining', 'x-ratelimit-reset')
+MAX_CHUNK = 0xFFFF
+
+
+def _parse_data(response, json_path):
+    """What portalbase's fetch_data returns: parsed JSON along json_path, else the text."""
+    if response.status_code != 200:  # portalbase's check_response, which fetch() skips
+        response.close()
+        raise HttpError(f"Code {response.status_code}", response)
+    text = response.text
+    if json_path is None or 'json' not in (response.headers.get('content-type') or ''):
+        return text
+    value = json.loads(text)
+    for key in json_path:
+        value = value[key]
+    return value
+
+
+def log_path(directory, index):
+    return f"{directory.rstrip('/')}/traffic{index}.bin"
+
+
+def _file_header(path):
+    """(sequence, reason, cause) of an existing log file, or None."""
+    try:
+        with open(path, 'rb') as log:
+            head = log.read(struct.calcsize(FILE_HEADER))
+    except OSError:
+        return None
+    if len(head) < struct.calcsize(FILE_HEADER):
+        return None
+    magic, version, sequence, reason, cause = struct.unpack(FILE_HEADER, head)
+    if magic != MAGIC or version != VERSION:
+        return None
+    return sequence, reason, cause
+
+
+def log_files(directory, files):
+    """Existing log paths in the order they were written, oldest first."""
+    found = []
+    for index in range(files):
+        path = log_path(directory, index)
+        header = _file_header(path)
+        if header is not None:
+            found.append((header[0], path))
+    found.sort()
+    return [path for _, path in found]
+
+
+class TrafficRecorder:
+    """A Network stand-in that logs what passes through to the real one."""
+
+    def __init__(self, network, directory, files=4, max_bytes=65536, buffer_size=4096):
+        self.network = network
+        self.directory = directory
+        self.files = files
+        self.max_bytes = max_bytes
+        self.buffer = bytearray(buffer_size)
+        self.pending = 0     # Bytes of self.buffer waiting for poll()
+        self.records = 0
+        self.written = 0     # Bytes written this boot
+        self.log = None
+        self.open_response = None  # Its record still needs an end byte
+        self.last_url = None       # Written in full once per file
+        self.size = 0
+        self.index = 0
+        self.sequence = 0
+        self.enabled = True
+        try:
+            newest = None
+            for index in range(files):
+                header = _file_header(log_path(directory, index))
+                if header is not None and (newest is None or header[0] > newest[0]):
+                    newest = (header[0], index)
+            if newest is not None:
+                self.sequence = newest[0]
+                self.index = newest[1]
+            self._next_file()
+        except OSError as e:
+            self._disable(e)
+
+    def __getattr__(self, name):
+        # Everything not recorded (connect, enabled, requests...) is the real network's
+        return getattr(self.network, name)
+
+    # --- Network interface ---
+    def fetch(self, url, *, headers=None, timeout=10):
+        started, wall = time.monotonic(), time.time()
+        try:
+            response = self.network.fetch(url, headers=headers, timeout=timeout)
+        except Exception as e:
+            failed = getattr(e, 'response', None)
+            if failed is not None:
+                self._response(started, wall, url, failed)
+                self._end(END_CLOSED)
+            else:
+                self._error(started, wall, url, e)
+            raise
+        self._response(started, wall, url, response)
+        self.open_response = _RecordedResponse(response, self)
+        return self.open_response
+
+    def fetch_data(self, url, *, headers=None, json_path=None, regexp_path=None, timeout=10):
+        # portalbase's fetch_data parses as it reads; record the text and parse it the same way
+        response = self.fetch(url, headers=headers, timeout=timeout)
+        try:
+            return _parse_data(response, json_path)
+        finally:
+            response.close()
+
+    def get_local_time(self, location=None, max_attempts=10):
+        result = self.network.get_local_time(location, max_attempts)
+        self._record(TIME_RECORD, time.monotonic(), time.time(), None)
+        return result
+
+    # --- Writing ---
+    def poll(self):
+        """Writes out whatever is buffered. Call when the frame is already on screen."""
+        if self.pending and self.enabled:
+            try:
+                self.log.write(memoryview(self.buffer)[:self.pending])
+                self.log.flush()
+                self.size += self.pending
+                self.written += self.pending
+            except OSError as e:
+                self._disable(e)
+            self.pending = 0
+
+    def _put(self, data):
+        if not self.enabled:
+            return
+        if self.pending + len(data) > len(self.buffer):
+            self.poll()  # Mid-fetch: the screen is not waiting on us
+            if len(data) > len(self.buffer):
+                try:
+                    self.log.write(data)
+                    self.size += len(data)
+                    self.written += len(data)
+                except OSError as e:
+                    self._disable(e)
+                return
+        self.buffer[self.pending:self.pending + len(data)] = data
+        self.pending += len(data)
+
+    def _record(self, kind, started, wall, url):
+        if self.open_response is not None:
+            self.open_response._finish(END_CLOSED)  # Dropped without close(); end its record
+        if not self.enabled:
+            return
+        if self.size + self.pending >= self.max_bytes:
+            self.poll()
+            try:
+                self._next_file()
+            except OSError as e:
+                self._disable(e)
+                return
+        written = b""
+        if url is not None and url != self.last_url:
+            written = url.encode()
+            self.last_url = url
+        self._put(struct.pack(RECORD, kind, int(started * 1000) & 0xFFFFFFFF, int(wall), len(written)))
+        self._put(written)
+        self.records += 1
+
+    def _response(self, started, wall, url, response):
+        self._record(RESPONSE_RECORD, started, wall, url)
+        kept = ""
+        for name in KEPT_HEADERS:
+            value = response.headers.get(name)
+            if value is not None:
+                kept += f"{name}: {value}\n"
+        kept = kept.encode()
+        self._put(struct.pack(RESPONSE, response.status_code, len(kept)))
+        self._put(kept)
+
+    def _chunk(self, chunk):
+        for start in range(0, len(chunk), MAX_CHUNK):
+            piece = chunk[start:start + MAX_CHUNK]
+            self._put(struct.pack(LENGTH, len(piece)))
+            self._put(piece)
+
+    def _end(self, how):
+        self._put(struct.pack('<HB', 0, how))
+
+    def _error(self, started, wall, url, error):
+        self._record(ERROR_RECORD, started, wall, url)
+        message = f"{type(error).__name__}: {error}".encode()[:MAX_CHUNK]
+        self._put(struct.pack(LENGTH, len(message)))
+        self._put(message)
+
+    def _next_file(self):
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+        self.sequence += 1
+        self.last_url = None
+        self.index = (self.index + 1) % self.files if self.sequence > 1 else 0
+        history = metrics.reset_history()
+        reason, cause = history[0] if history else ("UNKNOWN", "none")
+        self.log = open(log_path(self.directory, self.index), 'wb')
+        self.log.write(struct.pack(FILE_HEADER, MAGIC, VERSION, self.sequence,
+                                   metrics.REASONS.index(reason), metrics.CAUSES.index(cause)))
+        self.size = struct.calcsize(FILE_HEADER)
+
+    def _disable(self, error):
+        print(f"Traffic log off: {error}")
+        self.enabled = False
+        self.pending = 0
+
+
+class _RecordedResponse:
+    """Passes a response through, copying each chunk the board reads into the log."""
+
+    def __init__(self, response, recorder):
+        self._response = response
+        self._recorder = recorder
+        self._ended = False
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    @property
+    def socket(self):
+        return self._response.socket
+
+    @socket.setter
+    def socket(self, value):
+        # sources.release() drops a stalled socket so close() does not drain it
+        self._response.socket = value
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        try:
+            for chunk in self._response.iter_content(chunk_size=chunk_size):
+                self._recorder._chunk(chunk)
+                yield chunk
+        except OSError:
+            self._finish(END_DROPPED)
+            raise
+        self._finish(END_COMPLETE)
+
+    @property
+    def content(self):
+        try:
+            body = self._response.content
+        except OSError:
+            self._finish(END_DROPPED)
+            raise
+        self._recorder._chunk(body)
+        self._finish(END_COMPLETE)
+        return body
+
+    @property
+    def text(self):
+        return str(self.content, 'utf-8')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def close(self):
+        self._finish(END_CLOSED)
+        self._response.close()
+
+    def _finish(self, how):
+        if not self._ended:
+            self._ended = True
+            self._recorder._end(how)
+            if self._recorder.open_response is self:
+                self._recorder.open_response = None
+
+
+# =======================================================================
+#                          PLAYBACK
+# =======================================================================
+class Record:
+    """One logged exchange. The body stays in the file until it is read."""
+
+    def __init__(self, kind, mono_ms, wall, url):
+        self.kind = kind
+        self.mono_ms = mono_ms
+        self.wall = wall
+        self.url = url
+        self.status = 0
+        self.headers = {}
+        self.message = ""
+        self.path = None
+        self.body_at = 0   # File offset of the first chunk length
+        self.end = END_COMPLETE
+
+
+class LogReader:
+    """Reads records from log files in order, seeking past bodies."""
+
+    def __init__(self, paths):
+        self.paths = paths
+        self.last_url = None
+
+    def __iter__(self):
+        for path in self.paths:
+            with open(path, 'rb') as log:
+                if log.read(struct.calcsize(FILE_HEADER))[:2] != MAGIC:
+                    continue
+                self.last_url = None
+                while True:
+                    try:
+                        record = self._read(log, path)
+                    except (ValueError, struct.error):  # Cut short by a reset
+                        break
+                    if record is None:
+                        break
+                    yield record
+
+    def _read(self, log, path):
+        head = log.read(struct.calcsize(RECORD))
+        if not head:
+            return None
+        kind, mono_ms, wall, url_length = struct.unpack(RECORD, head)
+        url = None
+        if kind != TIME_RECORD:
+            if url_length:
+                self.last_url = _exact(log, url_length).decode()
+            url = self.last_url
+        record = Record(kind, mono_ms, wall, url)
+        record.path = path
+        if kind == RESPONSE_RECORD:
+            record.status, headers_length = struct.unpack(RESPONSE, _exact(log, struct.calcsize(RESPONSE)))
+            for line in _exact(log, headers_length).decode().split("\n"):
+                name, _, value = line.partition(": ")
+                if name:
+                    record.headers[name] = value
+            record.body_at = log.tell()
+            while True:
+                length = struct.unpack(LENGTH, _exact(log, 2))[0]
+                if not length:
+                    break
+                log.seek(length, 1)
+            record.end = _exact(log, 1)[0]
+        elif kind == ERROR_RECORD:
+            record.message = _exact(log, struct.unpack(LENGTH, _exact(log, 2))[0]).decode()
+        elif kind != TIME_RECORD:
+            raise ValueError("Unknown record kind")
+        return record
+
+
+def _exact(log, count):
+    data = log.read(count)
+    if len(data) < count:
+        raise ValueError("Truncated record")
+    return data
+
+
+def body_chunks(record):
+    """The body of a RESPONSE record, in the chunks the board originally read."""
+    with open(record.path, 'rb') as log:
+        log.seek(record.body_at)
+        while True:
+            length = struct.unpack(LENGTH, log.read(2))[0]
+            if not length:
+                return
+            yield log.read(length)
+
+
+class HttpError(Exception):
+    """A non-200 reply to fetch_data(), carrying the response the way portalbase's does."""
+
+    def __init__(self, message, response):
+        super().__init__(message)
+        self.response = response
+
+
+class _ReplayResponse:
+    def __init__(self, record):
+        self.status_code = record.status
+        self.headers = record.headers
+        self._record = record
+        self._closed = False
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        # The logged chunks, not chunk_size: they are what the board read last time
+        for chunk in body_chunks(self._record):
+            if self._closed:
+                return
+            yield chunk
+        if self._record.end == END_DROPPED:
+            raise OSError(104, "Connection dropped (replayed)")
+
+    @property
+    def content(self):
+        body = b"".join(body_chunks(self._record))
+        if self._record.end == END_DROPPED:
+            raise OSError(104, "Connection dropped (replayed)")
+        return body
+
+    @property
+    def text(self):
+        return str(self.content, 'utf-8')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def close(self):
+        self._closed = True
+
+
+class TrafficReplay:
+    """
+    A Network stand-in that answers from log files instead of Wi-Fi.
+    Requests get the logged responses in logged order (a differing URL is
+    reported, not skipped), paced to the logged gaps divided by `speed`
+    (0 for no pacing); time syncs set the clock to the logged wall time.
+    At the end of the logs it starts over when `loop` is set.
+    """
+
+    def __init__(self, paths, speed=1.0, loop=True):
+        self.reader = LogReader(paths)
+        self.speed = speed
+        self.loop = loop
+        self.records = iter(self.reader)
+        self.ahead = None    # Record peeked at but not yet served
+        self.first = None    # (logged ms, monotonic at replay start)
+        self.served = 0
+        self.mismatches = 0
+
+    def _peek(self):
+        while self.ahead is None:
+            try:
+                self.ahead = next(self.records)
+            except StopIteration:
+                if not self.loop or not self.served:
+                    raise OSError("Traffic replay finished")
+                print(f"Traffic replay: end of log after {self.served} records, starting over")
+                self.records = iter(self.reader)
+                self.first = None
+        return self.ahead
+
+    def _take(self):
+        """The next record, once its logged moment has come round at `speed`."""
+        record = self._peek()
+        self.ahead = None
+        if self.first is None:
+            self.first = (record.mono_ms, time.monotonic())
+        elif self.speed:
+            due = self.first[1] + ((record.mono_ms - self.first[0]) & 0xFFFFFFFF) / 1000 / self.speed
+            wait = due - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+        self.served += 1
+        return record
+
+    def fetch(self, url, *, headers=None, timeout=10):
+        while self._peek().kind == TIME_RECORD:
+            self._take()  # A time sync the board has not asked for (yet); not a response
+        record = self._take()
+        if record.url != url:
+            self.mismatches += 1
+            print(f"Traffic replay: asked for {url}, log has {record.url}")
+        if record.kind == ERROR_RECORD:
+            name, _, message = record.message.partition(": ")
+            raise MemoryError(message) if name == "MemoryError" else OSError(record.message)
+        return _ReplayResponse(record)  # Error replies too, as portalbase's fetch() returns them
+
+    def fetch_data(self, url, *, headers=None, json_path=None, regexp_path=None, timeout=10):
+        return _parse_data(self.fetch(url, headers=headers, timeout=timeout), json_path)
+
+    def get_local_time(self, location=None, max_attempts=10):
+        # The logged sync if it is next, else the wall clock of whatever comes next
+        record = self._take() if self._peek().kind == TIME_RECORD else self._peek()
+        rtc.RTC().datetime = time.localtime(record.wall)
+        return record.wall
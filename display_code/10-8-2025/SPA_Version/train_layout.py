@@ -0,0 +1,43 @@
+# train_layout.py
+# A helper module with the train schedule screen's layout: where the title
+# and the three prediction rows sit, their colours, and the text a
+# (route_id, epoch, status) prediction turns into.
+#
+# The board's labels and tools/frame_server.py (which draws the same
+# screen on a computer for thin-client mode) both read it from here.
+
+FONT = "/fonts/6x10.bdf"
+
+DIM = 0x444444     # Title
+GOLD = 0xDD8000    # Predictions
+PURPLE = 0x9966cc  # Boarding or leaving now
+RED = 0xFF0000     # Unreadable prediction
+
+TITLE_X, TITLE_Y = 7, 3
+ROW_X = 7
+ROW_YS = (11, 20, 28)  # Label y (vertical centre) of each prediction row
+
+EMPTY_ROW = "-----"
+
+
+def row_text(prediction, current_epoch, route_names):
+    """(text, color) for one (route_id, epoch, status) prediction; raises if it is malformed."""
+    route_raw, prediction_epoch, status = prediction
+    status = str(status or '').upper()
+
+    if status in ('BOARDING', 'BRDNG', 'ARRIVING'):
+        return "BRDNG", PURPLE
+    if prediction_epoch is None:
+        # If no time, but there is a status, use the status
+        return (status if status else "N/A"), GOLD
+
+    # Calculate the difference in minutes
+    time_diff_min = round((prediction_epoch - current_epoch) / 60)
+    route_id = f"{route_names.get(route_raw) or route_raw or '??':>3}"
+
+    if time_diff_min <= 0:
+        return f"{route_id} NOW", PURPLE
+    # --- CONDITIONAL PADDING LOGIC ---
+    # Pad: 5 -> "05", no pad: 12 -> "12" (e.g. "89 05min")
+    minute_str = f"{time_diff_min:02d}" if time_diff_min < 10 else str(time_diff_min)
+    return f"{route_id} {minute_str}min", GOLD
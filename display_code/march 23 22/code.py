@@ -7,20 +7,30 @@ RASTER EYES for Adafruit Matrix Portal: animated spooky eyes.
 """
 
 # pylint: disable=import-error
+import gc
 import math
 import random
 import time
+import board
+import digitalio
 import displayio
 import adafruit_imageload
 from adafruit_matrixportal.matrix import Matrix
 
-# TO LOAD DIFFERENT EYE DESIGNS: change the middle word here (between
-# 'eyes.' and '.data') to one of the folder names inside the 'eyes' folder:
-#from eyes.werewolf.data import EYE_DATA
-#from eyes.cyclops.data import EYE_DATA
-from eyes.kobold.data import EYE_DATA
-#from eyes.adabot.data import EYE_DATA
-#from eyes.skull.data import EYE_DATA
+from eyes.manifest import DESIGNS, MANIFEST
+
+# TO START WITH A DIFFERENT EYE DESIGN: set this to one of the folder names
+# inside the 'eyes' folder (listed in eyes/manifest.py). The UP and DOWN
+# buttons step through the others while running. After adding a design or
+# changing its images or data.py, run tools/eyes_manifest.py on a computer
+# to rebuild eyes/manifest.py.
+DESIGN = 'kobold'
+DESIGN_CACHE_SIZE = 2 # Designs kept loaded (1 or 2); switching back is instant
+SWITCH_INTERVAL = 0   # Seconds between automatic design changes (0 = off)
+
+TARGET_FPS = 40     # Frames per second the animation is paced to
+EASE_STEPS = 64     # Entries in the eye-move easing table
+STATS_INTERVAL = 10 # Seconds between frame statistics prints (0 = off)
 
 # UTILITY FUNCTIONS AND CLASSES --------------------------------------------
 
@@ -30,30 +40,111 @@ class Sprite(displayio.TileGrid):
        because TileGrid doesn't appear to have a way to poll that later,
        object still functions in a displayio.Group.
     """
-    def __init__(self, filename, transparent=None):
-        """Create Sprite object from color-paletted BMP file, optionally
-           set one color to transparent (pass as RGB tuple or list to locate
-           nearest color, or integer to use a known specific color index).
+    def __init__(self, image):
+        """Create Sprite object from an eyes/manifest.py image entry:
+           (path, width, height, transparent color index or None). The
+           index was matched to the design's transparent RGB on the host,
+           so there's no palette search here.
         """
+        filename, _, height, transparent = image
         bitmap, palette = adafruit_imageload.load(
             filename, bitmap=displayio.Bitmap, palette=displayio.Palette)
-        if isinstance(transparent, (tuple, list)): # Find closest RGB match
-            closest_distance = 0x1000000           # Force first match
-            for color_index, color in enumerate(palette): # Compare each...
-                delta = (transparent[0] - ((color >> 16) & 0xFF),
-                         transparent[1] - ((color >> 8) & 0xFF),
-                         transparent[2] - (color & 0xFF))
-                rgb_distance = (delta[0] * delta[0] +
-                                delta[1] * delta[1] +
-                                delta[2] * delta[2]) # Actually dist^2
-                if rgb_distance < closest_distance:  # but adequate for
-                    closest_distance = rgb_distance  # compare purposes,
-                    closest_index = color_index      # no sqrt needed
-            palette.make_transparent(closest_index)
-        elif isinstance(transparent, int):
+        if transparent is not None:
             palette.make_transparent(transparent)
         super(Sprite, self).__init__(bitmap, pixel_shader=palette)
-        self.height = bitmap.height
+        self.height = height
+
+
+# Loaded designs, most recently shown first: [name, Group of sprites]
+DESIGN_CACHE = []
+
+
+def design_group(name):
+    """ Return the sprite Group for design 'name', reusing it from
+        DESIGN_CACHE if present, else loading its images (evicting the
+        least recently shown design first, so no more than
+        DESIGN_CACHE_SIZE designs' bitmaps are ever in RAM).
+        Order in which sprites are added determines the 'stacking order'
+        and visual priority. Lower lid is added before the upper lid so
+        that if they overlap, the upper lid is 'on top' (e.g. if it has
+        eyelashes or such).
+    """
+    for index, entry in enumerate(DESIGN_CACHE):
+        if entry[0] == name:
+            DESIGN_CACHE.insert(0, DESIGN_CACHE.pop(index))
+            return entry[1]
+    while len(DESIGN_CACHE) >= DESIGN_CACHE_SIZE:
+        if DESIGN_CACHE.pop()[1] is SPRITES: # Only with a cache of 1:
+            DISPLAY.show(displayio.Group())  # let the display drop it too
+        gc.collect()
+    data = MANIFEST[name]
+    group = displayio.Group()
+    for key in ('eye_image', 'lower_lid_image', 'upper_lid_image',
+                'stencil_image'):
+        group.append(Sprite(data[key]))
+    DESIGN_CACHE.insert(0, [name, group])
+    return group
+
+
+# pylint: disable=global-statement
+def show_design(name):
+    """ Put design 'name' on screen and derive its motion bounds. Eye and
+        lid motion restarts from center, since positions are relative to
+        the previous design's range.
+    """
+    global DESIGN, EYE_DATA, SPRITES, SHOWN, EYE_CENTER, EYE_RANGE
+    global UPPER_LID_MIN, UPPER_LID_MAX, LOWER_LID_MIN, LOWER_LID_MAX
+    global EYE_PREV, EYE_NEXT
+    start = time.monotonic_ns()
+    cached = any(entry[0] == name for entry in DESIGN_CACHE)
+    DESIGN, EYE_DATA = name, MANIFEST[name]
+    SPRITES = design_group(name)
+    SHOWN = [(sprite.x, sprite.y) for sprite in SPRITES]
+    DISPLAY.show(SPRITES)
+    DISPLAY.refresh() # auto_refresh is off and the main loop only refreshes frames that moved
+
+    EYE_CENTER = ((EYE_DATA['eye_move_min'][0] +       # Pixel coords of eye
+                   EYE_DATA['eye_move_max'][0]) / 2,   # image when centered
+                  (EYE_DATA['eye_move_min'][1] +       # ('neutral' position)
+                   EYE_DATA['eye_move_max'][1]) / 2)
+    EYE_RANGE = (abs(EYE_DATA['eye_move_max'][0] -     # Max eye image motion
+                     EYE_DATA['eye_move_min'][0]) / 2, # delta from center
+                 abs(EYE_DATA['eye_move_max'][1] -
+                     EYE_DATA['eye_move_min'][1]) / 2)
+    UPPER_LID_MIN = (min(EYE_DATA['upper_lid_open'][0],    # Motion bounds
+                         EYE_DATA['upper_lid_closed'][0]), # of upper and
+                     min(EYE_DATA['upper_lid_open'][1],    # lower eyelids
+                         EYE_DATA['upper_lid_closed'][1]))
+    UPPER_LID_MAX = (max(EYE_DATA['upper_lid_open'][0],
+                         EYE_DATA['upper_lid_closed'][0]),
+                     max(EYE_DATA['upper_lid_open'][1],
+                         EYE_DATA['upper_lid_closed'][1]))
+    LOWER_LID_MIN = (min(EYE_DATA['lower_lid_open'][0],
+                         EYE_DATA['lower_lid_closed'][0]),
+                     min(EYE_DATA['lower_lid_open'][1],
+                         EYE_DATA['lower_lid_closed'][1]))
+    LOWER_LID_MAX = (max(EYE_DATA['lower_lid_open'][0],
+                         EYE_DATA['lower_lid_closed'][0]),
+                     max(EYE_DATA['lower_lid_open'][1],
+                         EYE_DATA['lower_lid_closed'][1]))
+    EYE_PREV = EYE_NEXT = (0, 0)
+    print('Design', name, 'in', (time.monotonic_ns() - start) // 1000000,
+          'ms', '(cached)' if cached else '(loaded)')
+
+
+def move_sprite(index, x, y):
+    """ Move SPRITES[index] to integer pixel position (x, y), but only if
+        that's not where it already is. Returns True if it moved. Most
+        frames the eye is holding still or a lid is pinned at its bounds,
+        so most calls write nothing and leave the display clean.
+    """
+    global SKIPPED_WRITES
+    if SHOWN[index] == (x, y):
+        SKIPPED_WRITES += 1
+        return False
+    SPRITES[index].x, SPRITES[index].y = x, y
+    SHOWN[index] = (x, y)
+    return True
 
 
 # ONE-TIME INITIALIZATION --------------------------------------------------
@@ -61,54 +152,62 @@ class Sprite(displayio.TileGrid):
 MATRIX = Matrix(bit_depth=6)
 DISPLAY = MATRIX.display
 
-# Order in which sprites are added determines the 'stacking order' and
-# visual priority. Lower lid is added before the upper lid so that if they
-# overlap, the upper lid is 'on top' (e.g. if it has eyelashes or such).
-SPRITES = displayio.Group()
-SPRITES.append(Sprite(EYE_DATA['eye_image'])) # Base image is opaque
-SPRITES.append(Sprite(EYE_DATA['lower_lid_image'], EYE_DATA['transparent']))
-SPRITES.append(Sprite(EYE_DATA['upper_lid_image'], EYE_DATA['transparent']))
-SPRITES.append(Sprite(EYE_DATA['stencil_image'], EYE_DATA['transparent']))
-DISPLAY.show(SPRITES)
-
-EYE_CENTER = ((EYE_DATA['eye_move_min'][0] +           # Pixel coords of eye
-               EYE_DATA['eye_move_max'][0]) / 2,       # image when centered
-              (EYE_DATA['eye_move_min'][1] +           # ('neutral' position)
-               EYE_DATA['eye_move_max'][1]) / 2)
-EYE_RANGE = (abs(EYE_DATA['eye_move_max'][0] -         # Max eye image motion
-                 EYE_DATA['eye_move_min'][0]) / 2,     # delta from center
-             abs(EYE_DATA['eye_move_max'][1] -
-                 EYE_DATA['eye_move_min'][1]) / 2)
-UPPER_LID_MIN = (min(EYE_DATA['upper_lid_open'][0],    # Motion bounds of
-                     EYE_DATA['upper_lid_closed'][0]), # upper and lower
-                 min(EYE_DATA['upper_lid_open'][1],    # eyelids
-                     EYE_DATA['upper_lid_closed'][1]))
-UPPER_LID_MAX = (max(EYE_DATA['upper_lid_open'][0],
-                     EYE_DATA['upper_lid_closed'][0]),
-                 max(EYE_DATA['upper_lid_open'][1],
-                     EYE_DATA['upper_lid_closed'][1]))
-LOWER_LID_MIN = (min(EYE_DATA['lower_lid_open'][0],
-                     EYE_DATA['lower_lid_closed'][0]),
-                 min(EYE_DATA['lower_lid_open'][1],
-                     EYE_DATA['lower_lid_closed'][1]))
-LOWER_LID_MAX = (max(EYE_DATA['lower_lid_open'][0],
-                     EYE_DATA['lower_lid_closed'][0]),
-                 max(EYE_DATA['lower_lid_open'][1],
-                     EYE_DATA['lower_lid_closed'][1]))
-EYE_PREV = (0, 0)
-EYE_NEXT = (0, 0)
+DISPLAY.auto_refresh = False # Refreshed below, only on frames that moved
+# Sprites on screen and the last (x, y) written to each, set by
+# show_design(). Only the starting design loads here, others on demand.
+SPRITES = SHOWN = None
+show_design(DESIGN)
+
+# UP and DOWN buttons step through DESIGNS. Sampled once a frame, which
+# is slow enough to need no other debouncing.
+BUTTONS = []
+for PIN in (board.BUTTON_UP, board.BUTTON_DOWN):
+    BUTTON = digitalio.DigitalInOut(PIN)
+    BUTTON.switch_to_input(pull=digitalio.Pull.UP)
+    BUTTONS.append(BUTTON)
+BUTTONS_HELD = [False, False]
+TIME_OF_LAST_SWITCH = time.monotonic()
+
 MOVE_STATE = False                                     # Initially stationary
 MOVE_EVENT_DURATION = random.uniform(0.1, 3)           # Time to first move
 BLINK_STATE = 2                                        # Start eyes closed
 BLINK_EVENT_DURATION = random.uniform(0.25, 0.5)       # Time for eyes to open
 TIME_OF_LAST_MOVE_EVENT = TIME_OF_LAST_BLINK_EVENT = time.monotonic()
 
+# Ease in/out 3*e^2-2*e^3 sampled once here, so a frame's move is a table
+# lookup instead of float polynomial math. EASE_STEPS + 1 entries cover
+# 0.0 to 1.0 inclusive; 64 steps is well under a pixel over the eye range.
+EASE = tuple(3 * (i / EASE_STEPS) ** 2 - 2 * (i / EASE_STEPS) ** 3
+             for i in range(EASE_STEPS + 1))
+
+FRAME_TIME = 1 / TARGET_FPS
+NEXT_FRAME = time.monotonic()
+# Frame statistics since the last print
+FRAMES = REFRESHES = SKIPPED_WRITES = 0
+BUSY = 0.0 # Seconds spent computing frames (not sleeping)
+STATS_START = time.monotonic()
+
 
 # MAIN LOOP ----------------------------------------------------------------
 
 while True:
     NOW = time.monotonic()
 
+    # Design switching -----------------------------------------------------
+
+    STEP = 0
+    for INDEX, BUTTON in enumerate(BUTTONS):
+        PRESSED = not BUTTON.value # Buttons pull low when pressed
+        if PRESSED and not BUTTONS_HELD[INDEX]:
+            STEP = 1 if INDEX == 0 else -1
+        BUTTONS_HELD[INDEX] = PRESSED
+    if SWITCH_INTERVAL and NOW - TIME_OF_LAST_SWITCH >= SWITCH_INTERVAL:
+        STEP = 1
+    if STEP:
+        show_design(DESIGNS[(DESIGNS.index(DESIGN) + STEP) % len(DESIGNS)])
+        MOVE_STATE = False # Hold at center until the next move
+        TIME_OF_LAST_MOVE_EVENT = TIME_OF_LAST_SWITCH = NOW
+
     # Eye movement ---------------------------------------------------------
 
     if NOW - TIME_OF_LAST_MOVE_EVENT > MOVE_EVENT_DURATION:
@@ -123,9 +222,9 @@ while True:
             MOVE_EVENT_DURATION = random.uniform(0.04, 3)    # Hold time
             EYE_PREV = EYE_NEXT
 
-    # Fraction of move elapsed (0.0 to 1.0), then ease in/out 3*e^2-2*e^3
-    RATIO = (NOW - TIME_OF_LAST_MOVE_EVENT) / MOVE_EVENT_DURATION
-    RATIO = 3 * RATIO * RATIO - 2 * RATIO * RATIO * RATIO
+    # Fraction of move elapsed (0.0 to 1.0), then ease in/out from table
+    RATIO = EASE[min(int((NOW - TIME_OF_LAST_MOVE_EVENT) /
+                         MOVE_EVENT_DURATION * EASE_STEPS + 0.5), EASE_STEPS)]
     EYE_POS = (EYE_PREV[0] + RATIO * (EYE_NEXT[0] - EYE_PREV[0]),
                EYE_PREV[1] + RATIO * (EYE_NEXT[1] - EYE_PREV[1]))
 
@@ -178,9 +277,31 @@ while True:
 
     # Move eye sprites -----------------------------------------------------
 
-    SPRITES[0].x, SPRITES[0].y = (int(EYE_CENTER[0] + EYE_POS[0] + 0.5),
-                                  int(EYE_CENTER[1] + EYE_POS[1] + 0.5))
-    SPRITES[2].x, SPRITES[2].y = (int(UPPER_LID_POS[0] + 0.5),
-                                  int(UPPER_LID_POS[1] + 0.5))
-    SPRITES[1].x, SPRITES[1].y = (int(LOWER_LID_POS[0] + 0.5),
-                                  int(LOWER_LID_POS[1] + 0.5))
+    MOVED = move_sprite(0, int(EYE_CENTER[0] + EYE_POS[0] + 0.5),
+                        int(EYE_CENTER[1] + EYE_POS[1] + 0.5))
+    MOVED = move_sprite(2, int(UPPER_LID_POS[0] + 0.5),
+                        int(UPPER_LID_POS[1] + 0.5)) or MOVED
+    MOVED = move_sprite(1, int(LOWER_LID_POS[0] + 0.5),
+                        int(LOWER_LID_POS[1] + 0.5)) or MOVED
+    if MOVED:
+        DISPLAY.refresh()
+        REFRESHES += 1
+
+    # Frame pacing and statistics ------------------------------------------
+
+    FRAMES += 1
+    DONE = time.monotonic()
+    BUSY += DONE - NOW
+    if STATS_INTERVAL and DONE - STATS_START >= STATS_INTERVAL:
+        print('{0:.1f} fps, {1} refreshes, {2} sprite writes skipped, '
+              '{3:.0f}% busy'.format(FRAMES / (DONE - STATS_START),
+                                     REFRESHES, SKIPPED_WRITES,
+                                     BUSY * 100 / (DONE - STATS_START)))
+        FRAMES = REFRESHES = SKIPPED_WRITES = 0
+        BUSY = 0.0
+        STATS_START = DONE
+    NEXT_FRAME += FRAME_TIME
+    if NEXT_FRAME > DONE:
+        time.sleep(NEXT_FRAME - DONE)
+    else:             # Running late (e.g. a slow refresh); don't try to
+        NEXT_FRAME = DONE # catch up with a burst of frames, just resync
@@ -0,0 +1,82 @@
+# eyes/manifest.py
+# Generated by tools/eyes_manifest.py from each design's data.py and BMPs;
+# edit those and re-run the tool rather than editing this file.
+#
+# DESIGNS: design names in switching order.
+# MANIFEST[name]: the design's data.py settings, with each image entry
+# replaced by (path, width, height, transparent palette index or None).
+
+DESIGNS = ('adabot', 'cyclops', 'kobold', 'skull', 'werewolf')
+
+MANIFEST = {
+    'adabot': {
+        'eye_image'        : ('/eyes/adabot/adabot-eyes.bmp', 46, 22, None),
+        'upper_lid_image'  : ('/eyes/adabot/adabot-upper-lids.bmp', 38, 11, 48),
+        'lower_lid_image'  : ('/eyes/adabot/adabot-lower-lids.bmp', 38, 6, 39),
+        'stencil_image'    : ('/eyes/adabot/adabot-stencil.bmp', 64, 32, 62),
+        'eye_move_min'     : (5, -1),
+        'eye_move_max'     : (13, 7),
+        'upper_lid_open'   : (13, -5),
+        'upper_lid_center' : (13, -5),
+        'upper_lid_closed' : (13, 7),
+        'lower_lid_open'   : (13, 22),
+        'lower_lid_center' : (13, 22),
+        'lower_lid_closed' : (13, 15),
+    },
+    'cyclops': {
+        'eye_image'        : ('/eyes/cyclops/cyclops-eye.bmp', 54, 50, None),
+        'upper_lid_image'  : ('/eyes/cyclops/cyclops-upper-lid.bmp', 34, 29, 99),
+        'lower_lid_image'  : ('/eyes/cyclops/cyclops-lower-lid.bmp', 34, 15, 0),
+        'stencil_image'    : ('/eyes/cyclops/cyclops-stencil.bmp', 64, 32, 75),
+        'eye_move_min'     : (-4, -15),
+        'eye_move_max'     : (14, -2),
+        'upper_lid_open'   : (15, -23),
+        'upper_lid_center' : (15, -18),
+        'upper_lid_closed' : (15, 0),
+        'lower_lid_open'   : (15, 24),
+        'lower_lid_center' : (15, 23),
+        'lower_lid_closed' : (15, 17),
+    },
+    'kobold': {
+        'eye_image'        : ('/eyes/kobold/kobold-eyes.bmp', 68, 36, None),
+        'upper_lid_image'  : ('/eyes/kobold/kobold-upper-lids.bmp', 52, 20, 0),
+        'lower_lid_image'  : ('/eyes/kobold/kobold-lower-lids.bmp', 52, 13, 0),
+        'stencil_image'    : ('/eyes/kobold/kobold-stencil.bmp', 64, 32, 241),
+        'eye_move_min'     : (-10, -9),
+        'eye_move_max'     : (6, 6),
+        'upper_lid_open'   : (6, -7),
+        'upper_lid_center' : (6, -4),
+        'upper_lid_closed' : (6, 6),
+        'lower_lid_open'   : (6, 25),
+        'lower_lid_center' : (6, 23),
+        'lower_lid_closed' : (6, 15),
+    },
+    'skull': {
+        'eye_image'        : ('/eyes/skull/skull-eyes.bmp', 51, 23, None),
+        'upper_lid_image'  : ('/eyes/skull/skull-upper-lids.bmp', 41, 13, 0),
+        'lower_lid_image'  : ('/eyes/skull/skull-lower-lids.bmp', 41, 8, 0),
+        'stencil_image'    : ('/eyes/skull/skull-stencil.bmp', 64, 32, 190),
+        'eye_move_min'     : (1, -4),
+        'eye_move_max'     : (11, 5),
+        'upper_lid_open'   : (11, -6),
+        'upper_lid_center' : (11, -3),
+        'upper_lid_closed' : (11, 5),
+        'lower_lid_open'   : (11, 17),
+        'lower_lid_center' : (11, 16),
+        'lower_lid_closed' : (11, 13),
+    },
+    'werewolf': {
+        'eye_image'        : ('/eyes/werewolf/werewolf-eyes.bmp', 60, 31, None),
+        'upper_lid_image'  : ('/eyes/werewolf/werewolf-upper-lids.bmp', 50, 18, 0),
+        'lower_lid_image'  : ('/eyes/werewolf/werewolf-lower-lids.bmp', 50, 8, 0),
+        'stencil_image'    : ('/eyes/werewolf/werewolf-stencil.bmp', 64, 32, 1),
+        'eye_move_min'     : (-3, -5),
+        'eye_move_max'     : (7, 6),
+        'upper_lid_open'   : (7, -4),
+        'upper_lid_center' : (7, -1),
+        'upper_lid_closed' : (7, 8),
+        'lower_lid_open'   : (7, 22),
+        'lower_lid_center' : (7, 21),
+        'lower_lid_closed' : (7, 17),
+    },
+}
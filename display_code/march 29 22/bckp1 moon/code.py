@@ -4,7 +4,8 @@
 
 """
 MOON PHASE CLOCK for Adafruit Matrix Portal: displays current time, lunar
-phase and time of next moonrise or moonset. Requires WiFi internet access.
+phase and time of next moonrise or moonset. Lunar data is computed on the
+board (lunar.py); WiFi is only needed to set the clock.
 
 Written by Phil 'PaintYourDragon' Burgess for Adafruit Industries.
 MIT license, all text above must be included in any redistribution.
@@ -28,6 +29,7 @@ from adafruit_matrixportal.matrix import Matrix
 from adafruit_bitmap_font import bitmap_font
 import adafruit_display_text.label
 import adafruit_lis3dh
+import lunar
 
 try:
     from secrets import secrets
@@ -41,6 +43,7 @@ TWELVE_HOUR = True # If set, use 12-hour time vs 24-hour (e.g. 3:00 vs 15:00)
 COUNTDOWN = False  # If set, show time to (vs time of) next rise/set event
 MONTH_DAY = True   # If set, use MM/DD vs DD/MM (e.g. 31/12 vs 12/31)
 BITPLANES = 6      # Ideally 6, but can set lower if RAM is tight
+MOON_CACHE_SIZE = 3 # Moon phase bitmaps kept open (each is a file handle + TileGrid)
 
 
 # SOME UTILITY FUNCTIONS AND CLASSES ---------------------------------------
@@ -106,6 +109,38 @@ def hh_mm(time_struct):
     return hour_string + ':' + '{0:0>2}'.format(time_struct.tm_min)
 
 
+# Moon bitmaps already opened, most recently used first: [frame, TileGrid,
+# file]. FRAME only changes every ~7 hours, so a short list covers the
+# current frame and any it flips back to when a new day's data arrives.
+MOON_CACHE = []
+BITMAP_OPENS = 0 # Moon bitmaps read from flash since midnight
+
+
+def moon_tile_grid(frame):
+    """ Return a TileGrid for moon bitmap 'frame' (0-99), reusing one from
+        MOON_CACHE if present, else opening the BMP and evicting the least
+        recently used entry. OnDiskBitmap reads pixels from the open file,
+        so the file is only closed when its TileGrid leaves the cache.
+    """
+    global BITMAP_OPENS
+    for index, entry in enumerate(MOON_CACHE):
+        if entry[0] == frame:
+            MOON_CACHE.insert(0, MOON_CACHE.pop(index))
+            return entry[1]
+    file = open('moon/moon' + '{0:0>2}'.format(frame) + '.bmp', 'rb')
+    # CircuitPython 6 & 7 compatible
+    bitmap = displayio.OnDiskBitmap(file)
+    tile_grid = displayio.TileGrid(
+        bitmap,
+        pixel_shader=getattr(bitmap, 'pixel_shader', displayio.ColorConverter())
+    )
+    BITMAP_OPENS += 1
+    MOON_CACHE.insert(0, [frame, tile_grid, file])
+    if len(MOON_CACHE) > MOON_CACHE_SIZE:
+        MOON_CACHE.pop()[2].close()
+    return tile_grid
+
+
 # pylint: disable=too-few-public-methods
 class MoonData():
     """ Class holding lunar data for a given day (00:00:00 to 23:59:59).
@@ -122,9 +157,9 @@ class MoonData():
     def __init__(self, datetime, hours_ahead, utc_offset):
         """ Initialize MoonData object elements (see above) from a
             time.struct_time, hours to skip ahead (typically 0 or 24),
-            and a UTC offset (as a string) and a query to the MET Norway
-            Sunrise API (also provides lunar data), documented at:
-            https://api.met.no/weatherapi/sunrise/2.0/documentation
+            and a UTC offset (as a string), computed locally by lunar.py
+            -- no network, so a new day's data is ready in well under a
+            second instead of waiting on (and retrying) a server.
         """
         if hours_ahead:
             # Can't change attribute in datetime struct, need to create
@@ -138,40 +173,13 @@ class MoonData():
                 datetime.tm_min,
                 datetime.tm_sec,
                 -1, -1, -1))))
-        # strftime() not available here
-        url = ('https://api.met.no/weatherapi/sunrise/2.0/.json?lat=' +
-               str(LATITUDE) + '&lon=' + str(LONGITUDE) +
-               '&date=' + str(datetime.tm_year) + '-' +
-               '{0:0>2}'.format(datetime.tm_mon) + '-' +
-               '{0:0>2}'.format(datetime.tm_mday) +
-               '&offset=' + utc_offset)
-        print('Fetching moon data via', url)
-        # pylint: disable=bare-except
-        for _ in range(5): # Retries
-            try:
-                location_data = NETWORK.fetch_data(url,
-                                                   json_path=[['location']])
-                moon_data = location_data['time'][0]
-                #print(moon_data)
-                # Reconstitute JSON data into the elements we need
-                self.age = float(moon_data['moonphase']['value']) / 100
-                self.midnight = time.mktime(parse_time(
-                    moon_data['moonphase']['time']))
-                if 'moonrise' in moon_data:
-                    self.rise = time.mktime(
-                        parse_time(moon_data['moonrise']['time']))
-                else:
-                    self.rise = None
-                if 'moonset' in moon_data:
-                    self.set = time.mktime(
-                        parse_time(moon_data['moonset']['time']))
-                else:
-                    self.set = None
-                return # Success!
-            except:
-                # Moon server error (maybe), try again after 15 seconds.
-                # (Might be a memory error, that should be handled different)
-                time.sleep(15)
+        self.midnight = time.mktime(time.struct_time((
+            datetime.tm_year, datetime.tm_mon, datetime.tm_mday,
+            0, 0, 0, -1, -1, -1)))
+        offset = lunar.offset_seconds(utc_offset)
+        self.age = lunar.phase(self.midnight - offset)[0]
+        self.rise, self.set = lunar.rise_set(self.midnight, LATITUDE,
+                                             LONGITUDE, offset)
 
 
 # ONE-TIME INITIALIZATION --------------------------------------------------
@@ -252,14 +260,14 @@ NETWORK.connect()
 # Fetch latitude/longitude from secrets.py. If not present, use
 # IP geolocation. This only needs to be done once, at startup!
 try:
-    LATITUDE = secrets['latitude']
-    LONGITUDE = secrets['longitude']
+    LATITUDE = float(secrets['latitude'])
+    LONGITUDE = float(secrets['longitude'])
     print('Using stored geolocation: ', LATITUDE, LONGITUDE)
 except KeyError:
-    LATITUDE, LONGITUDE = (
-        NETWORK.fetch_data('http://www.geoplugin.net/json.gp',
-                           json_path=[['geoplugin_latitude'],
-                                      ['geoplugin_longitude']]))
+    LATITUDE, LONGITUDE = (float(value) for value in
+                           NETWORK.fetch_data('http://www.geoplugin.net/json.gp',
+                                              json_path=[['geoplugin_latitude'],
+                                                         ['geoplugin_longitude']]))
     print('Using IP geolocation: ', LATITUDE, LONGITUDE)
 
 # Load time zone string from secrets.py, else IP geolocation for this too
@@ -278,15 +286,20 @@ except:
     DATETIME, UTC_OFFSET = time.localtime(), '+00:00'
 LAST_SYNC = time.mktime(DATETIME)
 
-# Poll server for moon data for current 24-hour period and +24 ahead
+# Compute moon data for current 24-hour period and +24 ahead
 PERIOD = []
 for DAY in range(2):
     PERIOD.append(MoonData(DATETIME, DAY * 24, UTC_OFFSET))
 # PERIOD[0] is the current 24-hour time period we're in. PERIOD[1] is the
-# following 24 hours. Data is shifted down and new data fetched as days
+# following 24 hours. Data is shifted down and new data computed as days
 # expire. Thought we might need a PERIOD[2] for certain circumstances but
 # it appears not, that's changed easily enough if needed.
 
+# What's on screen now, so each pass only touches what changed. Most passes
+# change nothing (the clock moves once a minute, the moon every few hours).
+SHOWN_FRAME = SHOWN_PERCENT = SHOWN_EVENT = SHOWN_CLOCK = None
+OPENS_DAY = time.localtime().tm_mday
+
 
 # MAIN LOOP ----------------------------------------------------------------
 
@@ -307,7 +320,7 @@ while True:
             # the server with repeated queries).
             LAST_SYNC += 30 * 60 # 30 minutes -> seconds
 
-    # If PERIOD has expired, move data down and fetch new +24-hour data
+    # If PERIOD has expired, move data down and compute new +24-hour data
     if NOW >= PERIOD[1].midnight:
         PERIOD[0] = PERIOD[1]
         PERIOD[1] = MoonData(time.localtime(), 24, UTC_OFFSET)
@@ -374,42 +387,38 @@ while True:
             EVENT_Y = 26   # Rise/set in middle
             MOON_Y = 32    # Moon at bottom
 
-    print()
+    CHANGED = False
 
-    # Update moon image (GROUP[0])
-    FILENAME = 'moon/moon' + '{0:0>2}'.format(FRAME) + '.bmp'
-
-    # CircuitPython 6 & 7 compatible
-    BITMAP = displayio.OnDiskBitmap(open(FILENAME, 'rb'))
-    TILE_GRID = displayio.TileGrid(
-        BITMAP,
-        pixel_shader=getattr(BITMAP, 'pixel_shader', displayio.ColorConverter())
-    )
-
-    # # CircuitPython 7+ compatible
-    # BITMAP = displayio.OnDiskBitmap(FILENAME)
-    # TILE_GRID = displayio.TileGrid(BITMAP, pixel_shader=BITMAP.pixel_shader)
-
-    TILE_GRID.x = 0
-    TILE_GRID.y = MOON_Y
-    GROUP[0] = TILE_GRID
+    # Update moon image (GROUP[0]), from MOON_CACHE unless the frame is new
+    if (FRAME, MOON_Y) != SHOWN_FRAME:
+        TILE_GRID = moon_tile_grid(FRAME)
+        TILE_GRID.x = 0
+        TILE_GRID.y = MOON_Y
+        if TILE_GRID is not GROUP[0]: # Same frame, moon just moved: already in the group
+            GROUP[0] = TILE_GRID
+        SHOWN_FRAME = (FRAME, MOON_Y)
+        CHANGED = True
 
     # Update percent value (5 labels: GROUP[1-4] for outline, [5] for text)
     if PERCENT >= 99.95:
         STRING = '100%'
     else:
         STRING = '{:.1f}'.format(PERCENT + 0.05) + '%'
-    print(NOW, STRING, 'full')
-    # Set element 5 first, use its size and position for setting others
-    GROUP[5].text = STRING
-    GROUP[5].x = 16 - GROUP[5].bounding_box[2] // 2
-    GROUP[5].y = MOON_Y + 16
-    for _ in range(1, 5):
-        GROUP[_].text = GROUP[5].text
-    GROUP[1].x, GROUP[1].y = GROUP[5].x, GROUP[5].y - 1 # Up 1 pixel
-    GROUP[2].x, GROUP[2].y = GROUP[5].x - 1, GROUP[5].y # Left
-    GROUP[3].x, GROUP[3].y = GROUP[5].x + 1, GROUP[5].y # Right
-    GROUP[4].x, GROUP[4].y = GROUP[5].x, GROUP[5].y + 1 # Down
+    if (STRING, MOON_Y) != SHOWN_PERCENT:
+        print()
+        print(NOW, STRING, 'full')
+        # Set element 5 first, use its size and position for setting others
+        GROUP[5].text = STRING
+        GROUP[5].x = 16 - GROUP[5].bounding_box[2] // 2
+        GROUP[5].y = MOON_Y + 16
+        for _ in range(1, 5):
+            GROUP[_].text = GROUP[5].text
+        GROUP[1].x, GROUP[1].y = GROUP[5].x, GROUP[5].y - 1 # Up 1 pixel
+        GROUP[2].x, GROUP[2].y = GROUP[5].x - 1, GROUP[5].y # Left
+        GROUP[3].x, GROUP[3].y = GROUP[5].x + 1, GROUP[5].y # Right
+        GROUP[4].x, GROUP[4].y = GROUP[5].x, GROUP[5].y + 1 # Down
+        SHOWN_PERCENT = (STRING, MOON_Y)
+        CHANGED = True
 
     # Update next-event time (GROUP[8] and [9])
     # Do this before time because we need uncorrupted NOW value
@@ -420,36 +429,48 @@ while True:
         STRING = str(MINUTES // 60) + ':' + '{0:0>2}'.format(MINUTES % 60)
     else: # Show NEXT_EVENT in clock time
         STRING = hh_mm(EVENT_TIME)
-    GROUP[9].text = STRING
-    XPOS = CENTER_X - (GROUP[9].bounding_box[2] + 6) // 2
-    GROUP[8].x = XPOS
-    if RISEN:                    # Next event is SET
-        GROUP[8].text = '\u21A7' # Downwards arrow from bar
-        GROUP[8].y = EVENT_Y - 2
-        print('Sets:', STRING)
-    else:                        # Next event is RISE
-        GROUP[8].text = '\u21A5' # Upwards arrow from bar
-        GROUP[8].y = EVENT_Y - 1
-        print('Rises:', STRING)
-    GROUP[9].x = XPOS + 6
-    GROUP[9].y = EVENT_Y
-    # Show event time in green if a.m., amber if p.m.
-    GROUP[8].color = GROUP[9].color = (0x00FF00 if EVENT_TIME.tm_hour < 12
-                                       else 0xC04000)
+    if (STRING, RISEN, EVENT_Y, EVENT_TIME.tm_hour < 12) != SHOWN_EVENT:
+        GROUP[9].text = STRING
+        XPOS = CENTER_X - (GROUP[9].bounding_box[2] + 6) // 2
+        GROUP[8].x = XPOS
+        if RISEN:                    # Next event is SET
+            GROUP[8].text = '\u21A7' # Downwards arrow from bar
+            GROUP[8].y = EVENT_Y - 2
+            print('Sets:', STRING)
+        else:                        # Next event is RISE
+            GROUP[8].text = '\u21A5' # Upwards arrow from bar
+            GROUP[8].y = EVENT_Y - 1
+            print('Rises:', STRING)
+        GROUP[9].x = XPOS + 6
+        GROUP[9].y = EVENT_Y
+        # Show event time in green if a.m., amber if p.m.
+        GROUP[8].color = GROUP[9].color = (0x00FF00 if EVENT_TIME.tm_hour < 12
+                                           else 0xC04000)
+        SHOWN_EVENT = (STRING, RISEN, EVENT_Y, EVENT_TIME.tm_hour < 12)
+        CHANGED = True
 
     # Update time (GROUP[6]) and date (GROUP[7])
     NOW = time.localtime()
     STRING = hh_mm(NOW)
-    GROUP[6].text = STRING
-    GROUP[6].x = CENTER_X - GROUP[6].bounding_box[2] // 2
-    GROUP[6].y = TIME_Y
     if MONTH_DAY:
-        STRING = str(NOW.tm_mon) + '/' + str(NOW.tm_mday)
+        DATE_STRING = str(NOW.tm_mon) + '/' + str(NOW.tm_mday)
     else:
-        STRING = str(NOW.tm_mday) + '/' + str(NOW.tm_mon)
-    GROUP[7].text = STRING
-    GROUP[7].x = CENTER_X - GROUP[7].bounding_box[2] // 2
-    GROUP[7].y = TIME_Y + 10
-
-    DISPLAY.refresh() # Force full repaint (splash screen sometimes sticks)
+        DATE_STRING = str(NOW.tm_mday) + '/' + str(NOW.tm_mon)
+    if (STRING, DATE_STRING, TIME_Y) != SHOWN_CLOCK:
+        GROUP[6].text = STRING
+        GROUP[6].x = CENTER_X - GROUP[6].bounding_box[2] // 2
+        GROUP[6].y = TIME_Y
+        GROUP[7].text = DATE_STRING
+        GROUP[7].x = CENTER_X - GROUP[7].bounding_box[2] // 2
+        GROUP[7].y = TIME_Y + 10
+        SHOWN_CLOCK = (STRING, DATE_STRING, TIME_Y)
+        CHANGED = True
+
+    if NOW.tm_mday != OPENS_DAY: # Log yesterday's bitmap reads (was 17280/day)
+        print('Moon bitmap opens yesterday:', BITMAP_OPENS)
+        BITMAP_OPENS = 0
+        OPENS_DAY = NOW.tm_mday
+
+    if CHANGED:
+        DISPLAY.refresh() # Force full repaint (splash screen sometimes sticks)
     time.sleep(5)
@@ -0,0 +1,289 @@
+"""
+Local lunar ephemeris for the moon phase clock: moon age, fraction lit and
+moonrise/moonset from latitude, longitude and the clock, with no network.
+
+Positions use the largest periodic terms of the ELP-2000/82 lunar theory as
+tabulated in Meeus, 'Astronomical Algorithms' (2nd ed.) ch. 47, good to a
+few hundredths of a degree; the Moon moves half a degree an hour, so rise,
+set and phase come out within a minute.
+
+CircuitPython floats are 30-bit, too coarse to multiply a fast angle rate
+by thousands of days. Epochs are split into whole days (exact, in ints) and
+a fraction of a day; the whole-day part of every angle is reduced modulo
+360 degrees in integer nanodegrees before any float math happens.
+"""
+
+import math
+
+J2000 = 946728000        # 2000-01-01 12:00:00 UTC as epoch seconds
+FULL_CIRCLE = 360000000000 # Nanodegrees
+
+# Mean arguments: (degrees at J2000, rate in nanodegrees per day)
+MEAN_LONGITUDE = (218.3164477, 13176396475)  # L'
+ELONGATION = (297.8501921, 12190749114)      # D
+SUN_ANOMALY = (357.5291092, 985600282)       # M
+MOON_ANOMALY = (134.9633964, 13064992950)    # M'
+LATITUDE_ARG = (93.2720950, 13229350240)     # F
+A1 = (119.75, 3609829)
+A2 = (53.09, 13121541136)
+A3 = (313.45, 13176358220)
+SUN_LONGITUDE = (280.46646, 985647360)
+# Sidereal time: whole days advance 360 + 0.98564736629 degrees, so the
+# integer part only needs the remainder; the fraction needs the full rate.
+SIDEREAL = (280.46061837, 985647366)
+SIDEREAL_RATE = 360.98564736629
+
+# Longitude (1e-6 degree) and distance (1e-3 km) terms:
+# (D, M, M', F, sine coefficient, cosine coefficient)
+LONGITUDE_TERMS = (
+    (0, 0, 1, 0, 6288774, -20905355),
+    (2, 0, -1, 0, 1274027, -3699111),
+    (2, 0, 0, 0, 658314, -2955968),
+    (0, 0, 2, 0, 213618, -569925),
+    (0, 1, 0, 0, -185116, 48888),
+    (0, 0, 0, 2, -114332, -3149),
+    (2, 0, -2, 0, 58793, 246158),
+    (2, -1, -1, 0, 57066, -152138),
+    (2, 0, 1, 0, 53322, -170733),
+    (2, -1, 0, 0, 45758, -204586),
+    (0, 1, -1, 0, -40923, -129620),
+    (1, 0, 0, 0, -34720, 108743),
+    (0, 1, 1, 0, -30383, 104755),
+    (2, 0, 0, -2, 15327, 10321),
+    (0, 0, 1, 2, -12528, 0),
+    (0, 0, 1, -2, 10980, 79661),
+    (4, 0, -1, 0, 10675, -34782),
+    (0, 0, 3, 0, 10034, -23210),
+    (4, 0, -2, 0, 8548, -21636),
+    (2, 1, -1, 0, -7888, 24208),
+    (2, 1, 0, 0, -6766, 30824),
+    (1, 0, -1, 0, -5163, -8379),
+    (1, 1, 0, 0, 4987, -16675),
+    (2, -1, 1, 0, 4036, -12831),
+    (2, 0, 2, 0, 3994, -10445),
+    (4, 0, 0, 0, 3861, -11650),
+    (2, 0, -3, 0, 3665, 14403),
+    (0, 1, -2, 0, -2689, -7003),
+    (2, 0, -1, 2, -2602, 0),
+    (2, -1, -2, 0, 2390, 10056),
+    (1, 0, 1, 0, -2348, 6322),
+    (2, -2, 0, 0, 2236, -9884),
+    (0, 1, 2, 0, -2120, 5751),
+    (0, 2, 0, 0, -2069, 0),
+    (2, -2, -1, 0, 2048, -4950),
+    (2, 0, 1, -2, -1773, 4130),
+    (2, 0, 0, 2, -1595, 0),
+    (4, -1, -1, 0, 1215, -3958),
+    (0, 0, 2, 2, -1110, 0),
+    (3, 0, -1, 0, -892, 3258),
+    (2, 1, 1, 0, -810, 2616),
+    (4, -1, -2, 0, 759, -1897),
+    (0, 2, -1, 0, -713, -2117),
+    (2, 2, -1, 0, -700, 2354),
+    (2, 1, -2, 0, 691, 0),
+    (2, -1, 0, -2, 596, 0),
+    (4, 0, 1, 0, 549, -1423),
+    (0, 0, 4, 0, 537, -1117),
+    (4, -1, 0, 0, 520, -1571),
+    (1, 0, -2, 0, -487, -1739),
+)
+
+# Latitude terms (1e-6 degree): (D, M, M', F, sine coefficient)
+LATITUDE_TERMS = (
+    (0, 0, 0, 1, 5128122),
+    (0, 0, 1, 1, 280602),
+    (0, 0, 1, -1, 277693),
+    (2, 0, 0, -1, 173237),
+    (2, 0, -1, 1, 55413),
+    (2, 0, -1, -1, 46271),
+    (2, 0, 0, 1, 32573),
+    (0, 0, 2, 1, 17198),
+    (2, 0, 1, -1, 9266),
+    (0, 0, 2, -1, 8822),
+    (2, -1, 0, -1, 8216),
+    (2, 0, -2, -1, 4324),
+    (2, 0, 1, 1, 4200),
+    (2, 1, 0, -1, -3359),
+    (2, -1, -1, 1, 2463),
+    (2, -1, 0, 1, 2211),
+    (2, -1, -1, -1, 2065),
+    (0, 1, -1, -1, -1870),
+    (4, 0, -1, -1, 1828),
+    (0, 1, 0, 1, -1794),
+    (0, 0, 0, 3, -1749),
+    (0, 1, -1, 1, -1565),
+    (1, 0, 0, 1, -1491),
+    (0, 1, 1, 1, -1475),
+    (0, 1, 1, -1, -1410),
+    (0, 1, 0, -1, -1344),
+    (1, 0, 0, -1, -1335),
+    (0, 0, 3, 1, 1107),
+    (4, 0, 0, -1, 1021),
+    (4, 0, -1, 1, 833),
+)
+
+
+def offset_seconds(utc_offset):
+    """ Convert a UTC offset string as WorldTimeAPI gives it ('-04:00',
+        '+05:30') to seconds east of UTC.
+    """
+    sign = -1 if utc_offset[0] == '-' else 1
+    hours_minutes = utc_offset.lstrip('+-').split(':')
+    return sign * (int(hours_minutes[0]) * 3600 + int(hours_minutes[1]) * 60)
+
+
+def _days(utc):
+    """ Split UTC epoch seconds into (whole days, fraction of a day) since
+        J2000. Whole days stay an int so later products are exact.
+    """
+    whole = int(utc)
+    seconds = whole - J2000
+    return seconds // 86400, (seconds % 86400 + (utc - whole)) / 86400
+
+
+def _angle(argument, days, fraction):
+    """ Mean argument (degrees, nanodegrees/day) at days + fraction,
+        reduced to 0-360 degrees.
+    """
+    base, rate = argument
+    whole = (rate * days) % FULL_CIRCLE
+    return (base + whole / 1e9 + rate * fraction / 1e9) % 360
+
+
+def moon_position(utc):
+    """ Geocentric ecliptic longitude and latitude (degrees) and distance
+        (km) of the Moon at UTC epoch seconds.
+    """
+    days, fraction = _days(utc)
+    centuries = (days + fraction) / 36525
+    mean_longitude = _angle(MEAN_LONGITUDE, days, fraction)
+    elongation = _angle(ELONGATION, days, fraction)
+    sun_anomaly = _angle(SUN_ANOMALY, days, fraction)
+    moon_anomaly = _angle(MOON_ANOMALY, days, fraction)
+    latitude_arg = _angle(LATITUDE_ARG, days, fraction)
+    # Terms with the Sun's anomaly shrink as Earth's orbit circularizes
+    eccentricity = (1.0, 1 - 0.002516 * centuries,
+                    (1 - 0.002516 * centuries) ** 2)
+
+    sum_l = sum_r = sum_b = 0.0
+    for d, m, mp, f, sine, cosine in LONGITUDE_TERMS:
+        arg = math.radians(d * elongation + m * sun_anomaly +
+                           mp * moon_anomaly + f * latitude_arg)
+        scale = eccentricity[abs(m)]
+        sum_l += sine * scale * math.sin(arg)
+        sum_r += cosine * scale * math.cos(arg)
+    for d, m, mp, f, sine in LATITUDE_TERMS:
+        arg = math.radians(d * elongation + m * sun_anomaly +
+                           mp * moon_anomaly + f * latitude_arg)
+        sum_b += sine * eccentricity[abs(m)] * math.sin(arg)
+
+    # Venus, Jupiter and Earth-flattening corrections
+    a_1 = math.radians(_angle(A1, days, fraction))
+    a_2 = math.radians(_angle(A2, days, fraction))
+    a_3 = math.radians(_angle(A3, days, fraction))
+    l_rad = math.radians(mean_longitude)
+    f_rad = math.radians(latitude_arg)
+    mp_rad = math.radians(moon_anomaly)
+    sum_l += (3958 * math.sin(a_1) + 1962 * math.sin(l_rad - f_rad) +
+              318 * math.sin(a_2))
+    sum_b += (-2235 * math.sin(l_rad) + 382 * math.sin(a_3) +
+              175 * math.sin(a_1 - f_rad) + 175 * math.sin(a_1 + f_rad) +
+              127 * math.sin(l_rad - mp_rad) - 115 * math.sin(l_rad + mp_rad))
+
+    return ((mean_longitude + sum_l / 1e6) % 360, sum_b / 1e6,
+            385000.56 + sum_r / 1000)
+
+
+def sun_longitude(utc):
+    """ Apparent ecliptic longitude (degrees) of the Sun at UTC epoch
+        seconds, less nutation (which cancels against the Moon's).
+    """
+    days, fraction = _days(utc)
+    centuries = (days + fraction) / 36525
+    anomaly = math.radians(_angle(SUN_ANOMALY, days, fraction))
+    center = ((1.914602 - 0.004817 * centuries) * math.sin(anomaly) +
+              0.019993 * math.sin(2 * anomaly) +
+              0.000289 * math.sin(3 * anomaly))
+    return (_angle(SUN_LONGITUDE, days, fraction) + center - 0.00569) % 360
+
+
+def phase(utc):
+    """ Return (age, lit) at UTC epoch seconds. age runs 0.0 (new moon)
+        through 0.25 (first quarter), 0.5 (full) and 0.75 (last quarter)
+        to 1.0, linear in the Moon's elongation from the Sun; lit is the
+        fraction of the disc illuminated, 0.0 to 1.0.
+    """
+    longitude, latitude, _ = moon_position(utc)
+    elongation = (longitude - sun_longitude(utc)) % 360
+    cos_angle = (math.cos(math.radians(latitude)) *
+                 math.cos(math.radians(elongation)))
+    return elongation / 360, (1 - cos_angle) / 2
+
+
+def altitude(utc, latitude, longitude):
+    """ Height (degrees) of the Moon's upper limb above the horizon at
+        UTC epoch seconds, with refraction and parallax; 0 at rise and set.
+        longitude is degrees east.
+    """
+    days, fraction = _days(utc)
+    centuries = (days + fraction) / 36525
+    moon_longitude, moon_latitude, distance = moon_position(utc)
+    lam = math.radians(moon_longitude)
+    beta = math.radians(moon_latitude)
+    obliquity = math.radians(23.4392911 - 0.0130042 * centuries)
+    right_ascension = math.atan2(
+        math.sin(lam) * math.cos(obliquity) -
+        math.tan(beta) * math.sin(obliquity), math.cos(lam))
+    declination = math.asin(
+        math.sin(beta) * math.cos(obliquity) +
+        math.cos(beta) * math.sin(obliquity) * math.sin(lam))
+    sidereal = (_angle(SIDEREAL, days, 0) + SIDEREAL_RATE * fraction +
+                longitude) % 360
+    hour_angle = math.radians(sidereal) - right_ascension
+    lat = math.radians(latitude)
+    height = math.degrees(math.asin(
+        math.sin(lat) * math.sin(declination) +
+        math.cos(lat) * math.cos(declination) * math.cos(hour_angle)))
+    parallax = math.degrees(math.asin(6378.14 / distance))
+    # Meeus 15: standard altitude of the Moon's center at rise/set
+    return height - (0.7275 * parallax - 0.5667)
+
+
+def _crossing(start, height_start, end, height_end, latitude, longitude,
+              offset):
+    """ Refine a horizon crossing between two local epochs whose heights
+        have opposite signs (regula falsi; the Moon's height is close to
+        linear over an hour). Returns local epoch seconds.
+    """
+    for _ in range(3):
+        guess = start + (end - start) * height_start / (height_start - height_end)
+        height = altitude(guess - offset, latitude, longitude)
+        if (height < 0) == (height_start < 0):
+            start, height_start = guess, height
+        else:
+            end, height_end = guess, height
+    return int(start + (end - start) * height_start /
+               (height_start - height_end) + 0.5)
+
+
+def rise_set(midnight, latitude, longitude, offset, step=3600):
+    """ Moonrise and moonset within the 24 hours from 'midnight'. Times are
+        local epoch seconds (what time.time() returns on a board whose RTC
+        is set to local time), offset is seconds east of UTC. Returns
+        (rise, set); either is None if it doesn't happen that day.
+    """
+    rise = moonset = None
+    before = midnight
+    height_before = altitude(midnight - offset, latitude, longitude)
+    for after in range(midnight + step, midnight + 86400 + 1, step):
+        height_after = altitude(after - offset, latitude, longitude)
+        if (height_before < 0) != (height_after < 0):
+            when = _crossing(before, height_before, after, height_after,
+                             latitude, longitude, offset)
+            if when < midnight + 86400:
+                if height_after >= 0:
+                    rise = rise or when
+                else:
+                    moonset = moonset or when
+        before, height_before = after, height_after
+    return rise, moonset
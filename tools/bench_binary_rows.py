@@ -0,0 +1,159 @@
+"""
+Compares the SPA board's binary rows source with its JSON path, and checks the format round-trips.
+
+Replays --minutes of the board's update cycle on the recorded fixtures.
+For each update it measures what the board receives and the work of
+turning it into (route_id, epoch, status) records:
+
+    json     the full-tier /predictions body: load_json, prediction_fields
+             and iso_to_local_epoch for every row, as V3Source does
+    binary   tools/frame_server.py's /rows reply for the same rows:
+             binary_rows.RowDecoder reading it into its buffer and unpacking
+
+Both must give the same records, and each row's colour index the colour
+train_layout.row_text() gives it. A round trip of --random synthesised
+replies (status-only rows, far-off times, long route names, every colour)
+checks encode_rows() and the decoder agree away from the fixtures too.
+
+Reports bytes per update, host CPU per update (relative cost; the M4 is
+much slower on both) and peak Python heap while decoding.
+
+Usage: python tools/bench_binary_rows.py [--minutes 30] [--every 15] [--random 2000]
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+
+import hostpaths
+import frame_server
+from mbta_fixtures import fixture_epoch
+
+hostpaths.use_board_modules()
+import binary_rows  # noqa: E402  (board modules)
+import fetch_plan  # noqa: E402
+import prediction_store  # noqa: E402
+import sources  # noqa: E402
+import stream_json  # noqa: E402
+import train_layout  # noqa: E402
+
+V3_PREDICTIONS = ("https://api-v3.mbta.com/predictions?filter[stop]=2706&filter[route]=89,101"
+                  "&sort=departure_time")
+STATUSES = (None, "BOARDING", "ARRIVING", "Stopped 2 stops away", "Delayed")
+
+
+def board_url():
+    """The full-tier URL the SPA board's FetchPlan builds (routes and alerts included)."""
+    plan = fetch_plan.FetchPlan(V3_PREDICTIONS, 3)
+    plan.want('route', 'route', 'short_name', lambda resources: None)
+    plan.want('alerts', 'alert', 'short_header,header', lambda resources: None)
+    return plan.url()
+
+
+def measure(work):
+    """(result, host seconds, peak heap bytes) of one call."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = work()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def colours_match(decoder, records, now, route_names):
+    """Whether the decoder's colour indices are what row_text() draws each record in."""
+    for i, record in enumerate(records):
+        if binary_rows.COLORS[decoder.colors[i]] != train_layout.row_text(record, now, route_names)[1]:
+            return False
+    return True
+
+
+def random_rows(rng, now):
+    rows = []
+    for _ in range(rng.randint(0, 12)):
+        route = rng.choice(("89", "101", "Red", "Green-E", "CR-Newburyport", "SL4"))
+        epoch = None if rng.random() < 0.2 else now + rng.randint(-60, 17 * 3600)
+        rows.append((route, epoch, rng.choice(STATUSES) if epoch is None or rng.random() < 0.3 else None))
+    rows.sort(key=lambda row: row[1] or now)
+    return rows
+
+
+def round_trip(count, seed=1):
+    """Mismatched replies out of `count` random ones, encoded and decoded with one decoder."""
+    rng = random.Random(seed)
+    decoder = binary_rows.RowDecoder(max_rows=12)
+    failures = 0
+    for _ in range(count):
+        now = fixture_epoch() + rng.randint(0, 86400)
+        rows = random_rows(rng, now)
+        decoder.read([frame_server.encode_rows(rows, now)])
+        records = decoder.records()
+        if records != rows or not colours_match(decoder, records, now, {}):
+            failures += 1
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--minutes", type=float, default=30)
+    parser.add_argument("--every", type=float, default=15, help="seconds between updates")
+    parser.add_argument("--random", type=int, default=2000, help="synthesised replies to round-trip")
+    args = parser.parse_args()
+
+    # Server side: fixtures fetched every update, as the board would
+    feed = frame_server.PredictionFeed("2706", "89,101", fixtures=True)
+    server = frame_server.FrameServer(feed, None, interval=0)
+    decoder = binary_rows.RowDecoder()
+    store = prediction_store.PredictionStore()
+    url = board_url()
+
+    totals = {"json": [0, 0.0, 0], "binary": [0, 0.0, 0]}
+    updates = int(args.minutes * 60 / args.every)
+    mismatches = 0
+    start = fixture_epoch()
+    for step in range(updates):
+        now = start + int(step * args.every)
+        body = feed.fixture.predictions_body(url, now)
+
+        def json_records():
+            doc = sources.load_json(body)
+            fields = [stream_json.prediction_fields(p) for p in doc.get('data', [])[:3]]
+            del doc
+            return [(route, sources.iso_to_local_epoch(raw) if raw else None, status)
+                    for route, raw, status in fields]
+
+        records, elapsed, peak = measure(json_records)
+        totals["json"][0] += len(body)
+        totals["json"][1] += elapsed
+        totals["json"][2] = max(totals["json"][2], peak)
+        store.replace(records)
+        store.evict(now)
+
+        reply = server.rows_reply(3, now)
+
+        def binary_records():
+            decoder.read([reply])
+            return decoder.records()
+
+        decoded, elapsed, peak = measure(binary_records)
+        totals["binary"][0] += len(reply)
+        totals["binary"][1] += elapsed
+        totals["binary"][2] = max(totals["binary"][2], peak)
+
+        if decoded != store.next_n(3) or not colours_match(decoder, decoded, now, feed.route_names):
+            mismatches += 1
+
+    print(f"{updates} updates every {args.every:g} s ({args.minutes:g} simulated minutes)")
+    print(f"{'path':10} {'bytes/update':>12} {'host us/update':>15} {'peak heap':>10}")
+    for path in ("json", "binary"):
+        print(f"{path:10} {totals[path][0] / updates:12.0f} {totals[path][1] / updates * 1e6:15.1f} "
+              f"{totals[path][2]:9d}B")
+    print(f"Records differ at {mismatches} of {updates} updates")
+    print(f"Round trip: {round_trip(args.random)} of {args.random} random replies differ")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,148 @@
+"""
+Benchmarks fleet_departures.py against running the board's logic per stop.
+
+Builds one system-wide V3 /predictions snapshot (--stops stops, each
+served by a few routes in both directions, with boarding, status-only and
+just-departed rows mixed in; routes carry short names as with
+include=route) and answers every stop's (route, direction) groups two ways:
+
+    loop     per stop, what update_train_schedule does with its own
+             fetch: prediction_fields, ISO times to epochs, a
+             PredictionStore, evict, next_n(3) per route and direction,
+             then train_layout.row_text
+    numpy    fleet_departures.v3_snapshot + next_departures on the whole
+             snapshot
+
+The snapshot is parsed and split by stop before timing, so neither side
+pays for json.loads. Reports time per snapshot for each and whether the
+rows match text for text and colour for colour; the recorded stop 2706
+fixture is checked the same way at the fixture clock.
+
+Usage: python tools/bench_fleet.py [--stops 3000] [--repeat 3]
+"""
+
+import argparse
+import json
+import random
+import time
+
+import hostpaths
+import fleet_departures
+from mbta_fixtures import epoch_to_iso, fixture_epoch, iso_to_epoch
+
+hostpaths.use_board_modules()
+import prediction_store  # noqa: E402  (board modules)
+import stream_json  # noqa: E402
+import train_layout  # noqa: E402
+
+STATUSES = ("Boarding", "Arriving", "Stopped 3 stops away", "Approaching")
+
+
+def synthesise_snapshot(stops, now, seed=89):
+    """A V3 document shaped like an unfiltered /predictions?include=route answer."""
+    rng = random.Random(seed)
+    route_ids = [str(number) for number in range(1, 240)] + ["Red", "Orange", "Blue", "741", "742"]
+    short_names = {route: route for route in route_ids[:239]}
+    short_names.update({"741": "SL1", "742": "SL2"})
+    data = []
+    for stop in range(stops):
+        stop_id = str(10000 + stop)
+        for route in rng.sample(route_ids, rng.randint(1, 4)):
+            for direction in (0, 1):
+                at = now - rng.randint(0, 240)  # A few just left, some inside the grace minute
+                for _ in range(rng.randint(2, 8)):
+                    at += rng.randint(30, 1200)
+                    status = rng.choice(STATUSES) if rng.random() < 0.05 else None
+                    departure = None if status and rng.random() < 0.5 else epoch_to_iso(at)
+                    data.append({
+                        "type": "prediction",
+                        "id": f"prediction-{stop_id}-{route}-{len(data)}",
+                        "attributes": {"arrival_time": departure, "departure_time": departure,
+                                       "direction_id": direction, "status": status},
+                        "relationships": {"route": {"data": {"id": route, "type": "route"}},
+                                          "stop": {"data": {"id": stop_id, "type": "stop"}}},
+                    })
+    rng.shuffle(data)  # Bulk answers are sorted by time or id, not by stop
+    data.sort(key=lambda p: p["attributes"]["departure_time"] or "")
+    included = [{"type": "route", "id": route, "attributes": {"short_name": name}}
+                for route, name in short_names.items()]
+    return {"data": data, "included": included}
+
+
+def split_by_stop(doc):
+    """The per-stop answers each board would have fetched, in the snapshot's order."""
+    per_stop = {}
+    for prediction in doc["data"]:
+        per_stop.setdefault(prediction["relationships"]["stop"]["data"]["id"], []).append(prediction)
+    return per_stop
+
+
+def per_stop_loop(per_stop, route_names, now):
+    """{(stop, route, direction): [(text, color), ...]} the board's way, one stop at a time."""
+    out = {}
+    for stop_id, predictions in per_stop.items():
+        store = prediction_store.PredictionStore(capacity=len(predictions))
+        for prediction in predictions:
+            route_id, raw, status = stream_json.prediction_fields(prediction)
+            direction = prediction["attributes"].get("direction_id")
+            store.insert(route_id, iso_to_epoch(raw) if raw else None, status,
+                         prediction_store.NO_DIRECTION if direction is None else direction)
+        store.evict(now)
+        groups = []
+        for row in range(store.count):
+            key = (store._route_names[store.routes[row]], store.directions[row])
+            if key not in groups:
+                groups.append(key)
+        for route_id, direction in groups:
+            out[(stop_id, route_id, direction)] = [
+                train_layout.row_text(prediction, now, route_names)
+                for prediction in store.next_n(fleet_departures.DEPTH, route_id, direction)]
+    return out
+
+
+def timed(repeat, work):
+    """(result, best seconds) over `repeat` runs."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = work()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def compare(doc, now, repeat):
+    per_stop = split_by_stop(doc)
+    route_names = {r["id"]: r["attributes"]["short_name"] for r in doc.get("included", [])
+                   if r["attributes"].get("short_name")}
+    loop, loop_time = timed(repeat, lambda: per_stop_loop(per_stop, route_names, now))
+    snapshot, read_time = timed(repeat, lambda: fleet_departures.v3_snapshot(doc))
+    departures, compute_time = timed(repeat, lambda: fleet_departures.next_departures(snapshot, now))
+    vectorised = departures.as_dict()
+    differing = sum(1 for key in loop.keys() | vectorised.keys() if loop.get(key) != vectorised.get(key))
+    return len(doc["data"]), len(per_stop), len(loop), loop_time, read_time, compute_time, differing
+
+
+def report(name, result):
+    count, stops, groups, loop_time, read_time, compute_time, differing = result
+    print(f"{name}: {count} predictions, {stops} stops, {groups} (stop, route, direction) groups")
+    print(f"  loop   {loop_time * 1000:9.1f} ms")
+    print(f"  numpy  {(read_time + compute_time) * 1000:9.1f} ms  "
+          f"(columns {read_time * 1000:.1f} ms, departures {compute_time * 1000:.1f} ms)")
+    print(f"  {differing} groups differ" if differing else "  rows match")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--stops", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per timing, best kept")
+    args = parser.parse_args()
+
+    now = fixture_epoch()
+    fixture = json.loads(hostpaths.read_fixture("v3_predictions_2706_all.json"))
+    report("fixture 2706", compare(fixture, now, args.repeat))
+    report("synthesised", compare(synthesise_snapshot(args.stops, now), now, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
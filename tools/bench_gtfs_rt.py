@@ -0,0 +1,177 @@
+"""
+Benchmarks the board's streaming GTFS-Realtime filter (gtfs_rt.py).
+
+Parses a TripUpdates feed for one stop two ways and reports parse time,
+peak Python heap and the rows found:
+
+    stream     gtfs_rt.TripUpdateFilter over 256-byte chunks (board path)
+    full       whole body read, every message decoded into nested dicts,
+               then filtered (what a general protobuf decoder would do)
+
+Feed the recorded MBTA feed with --feed (download it from
+https://cdn.mbta.com/realtime/TripUpdates.pb); without one, a feed of the
+same shape and size (~1500 trips x 20 stops) is synthesised.
+
+Usage: python tools/bench_gtfs_rt.py [--feed TripUpdates.pb] [--stop 2706]
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+
+import hostpaths
+
+hostpaths.use_board_modules()
+import gtfs_rt  # noqa: E402  (board module, needs the path above)
+
+
+# --- Minimal encoder, only for synthesising a feed ---
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _field(number, wire, payload):
+    key = _varint((number << 3) | wire)
+    if wire == 0:
+        return key + _varint(payload)
+    return key + _varint(len(payload)) + payload
+
+
+def synthesise_feed(stop, trips=1500, stops_per_trip=20, seed=89):
+    """A TripUpdates feed shaped like MBTA's, with `stop` on a few trips."""
+    rng = random.Random(seed)
+    now = 1761825900
+    body = _field(1, 2, _field(1, 2, b"2.0") + _field(3, 0, now))
+    for trip in range(trips):
+        route = rng.choice(("89", "101", "Red", "Orange", "Blue", "39", "1", "66"))
+        descriptor = (_field(1, 2, b"trip-%d" % trip) + _field(5, 2, route.encode())
+                      + _field(6, 0, trip % 2))
+        update = _field(1, 2, descriptor)
+        first = now + rng.randint(-600, 7200)
+        for seq in range(stops_per_trip):
+            stop_id = stop if trip % 60 == 0 and seq == 10 else str(rng.randint(1, 99999))
+            event = _field(2, 0, first + seq * 90)
+            stop_time = (_field(1, 0, seq + 1) + _field(2, 2, event) + _field(3, 2, event)
+                         + _field(4, 2, stop_id.encode()))
+            update += _field(2, 2, stop_time)
+        update += _field(3, 2, _field(1, 2, b"v%d" % trip)) + _field(4, 0, now)
+        body += _field(2, 2, _field(1, 2, b"e%d" % trip) + _field(3, 2, update))
+    return body
+
+
+# --- Baseline: decode everything, then filter ---
+
+def _decode_message(data):
+    """Generic protobuf decode into {field: [values]}; nested bytes stay bytes."""
+    fields = {}
+    at = 0
+    while at < len(data):
+        key, at = _read_varint(data, at)
+        number, wire = key >> 3, key & 7
+        if wire == 0:
+            value, at = _read_varint(data, at)
+        elif wire == 2:
+            length, at = _read_varint(data, at)
+            value = data[at:at + length]
+            at += length
+        elif wire == 1:
+            value, at = data[at:at + 8], at + 8
+        else:
+            value, at = data[at:at + 4], at + 4
+        fields.setdefault(number, []).append(value)
+    return fields
+
+
+def _read_varint(data, at):
+    result = shift = 0
+    while True:
+        byte = data[at]
+        at += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, at
+        shift += 7
+
+
+def full_decode(body, stop):
+    feed = _decode_message(body)
+    entities = []
+    for raw in feed.get(2, []):
+        entity = _decode_message(raw)
+        for raw_update in entity.get(3, []):
+            update = _decode_message(raw_update)
+            trip = _decode_message(update[1][0]) if 1 in update else {}
+            stop_times = [_decode_message(s) for s in update.get(2, [])]
+            for stop_time in stop_times:
+                for event_field in (3, 2):
+                    if event_field in stop_time:
+                        stop_time[event_field] = _decode_message(stop_time[event_field][0])
+            entities.append((trip, stop_times))
+    records = []
+    wanted = stop.encode()
+    for trip, stop_times in entities:
+        route = trip.get(5, [b""])[0].decode() or None
+        direction = trip.get(6, [None])[0]
+        for stop_time in stop_times:
+            if stop_time.get(4, [b""])[0] != wanted:
+                continue
+            event = stop_time.get(3) or stop_time.get(2)
+            if event and 2 in event:
+                records.append((route, direction, event[2][0], stop))
+    records.sort(key=lambda record: record[2])
+    return records
+
+
+def stream_decode(body, stop, chunk=256):
+    flt = gtfs_rt.TripUpdateFilter([stop])
+    return flt.parse(body[i:i + chunk] for i in range(0, len(body), chunk))
+
+
+def measure(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--feed", help="recorded TripUpdates.pb")
+    parser.add_argument("--stop", default="2706")
+    args = parser.parse_args()
+
+    if args.feed:
+        with open(args.feed, "rb") as feed:
+            body = feed.read()
+        origin = args.feed
+    else:
+        body = synthesise_feed(args.stop)
+        origin = "synthesised"
+    print(f"feed: {origin}, {len(body)} bytes, stop {args.stop}")
+
+    # The body itself is not counted: on the board it never exists in one piece
+    streamed, stream_time, stream_peak = measure(stream_decode, body, args.stop)
+    full, full_time, full_peak = measure(full_decode, body, args.stop)
+    print(f"{'stream':8} {stream_time * 1000:9.1f} ms {stream_peak:11d} B peak  {len(streamed)} rows")
+    print(f"{'full':8} {full_time * 1000:9.1f} ms {full_peak:11d} B peak  {len(full)} rows")
+    print("rows match" if streamed == full else "ROWS DIFFER")
+    if streamed:
+        print(f"bytes of feed per matching row: {len(body) // len(streamed)}")
+
+
+if __name__ == "__main__":
+    main()
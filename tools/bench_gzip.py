@@ -0,0 +1,111 @@
+"""
+Compares gzip and plain V3 prediction fetches on recorded fixtures.
+
+For each fixture it reports bytes on air, modelled fetch latency over a
+slow link (round trip + transfer time + measured host CPU for inflate and
+parse) and peak Python heap while turning the body into prediction rows,
+for the three ways the SPA board can read a body:
+
+    plain/full    whole body, then json.loads (TIER_FULL, no gzip)
+    plain/stream  body chunks straight into stream_json (TIER_STREAM)
+    gzip/stream   gzip chunks -> gzip_stream -> stream_json
+
+Usage: python tools/bench_gzip.py [--kbps 200] [--rtt-ms 120] [--chunk 256]
+"""
+
+import argparse
+import gzip
+import json
+import time
+import tracemalloc
+
+import hostpaths
+
+hostpaths.use_board_modules()
+import gzip_stream  # noqa: E402  (board module, needs the path above)
+import stream_json  # noqa: E402
+
+FIXTURES = (
+    "v3_predictions_2706_lite.json",
+    "v3_predictions_2706.json",
+    "v3_predictions_2706_all.json",
+)
+RESPONSE_HEADER_BYTES = 620  # Typical api-v3 response headers, measured by hand
+GZIP_HEADER_BYTES = 24       # The extra "Content-Encoding: gzip" line
+ROWS = 3
+
+
+def chunked(body, size):
+    """Yields the body in socket-sized pieces, like Response.iter_content."""
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+def read_full(body, chunk):
+    data = bytearray()
+    for piece in chunked(body, chunk):
+        data.extend(piece)
+    doc = json.loads(data)
+    del data
+    return [stream_json.prediction_fields(p) for p in doc.get("data", [])[:ROWS]]
+
+
+def read_stream(body, chunk):
+    scanner = stream_json.PredictionScanner(ROWS)
+    for piece in chunked(body, chunk):
+        if scanner.feed(piece):
+            break
+    return scanner.records
+
+
+def read_gzip_stream(body, chunk):
+    scanner = stream_json.PredictionScanner(ROWS)
+    for piece in gzip_stream.iter_inflated(chunked(body, chunk)):
+        if scanner.feed(piece):
+            break
+    return scanner.records
+
+
+def measure(reader, body, chunk, repeats=50):
+    """Returns (rows, cpu seconds per read, peak heap bytes)."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        rows = reader(body, chunk)
+    cpu = (time.perf_counter() - start) / repeats
+    tracemalloc.start()
+    reader(body, chunk)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return rows, cpu, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--kbps", type=float, default=200.0, help="modelled link rate")
+    parser.add_argument("--rtt-ms", type=float, default=120.0, help="modelled round trip")
+    parser.add_argument("--chunk", type=int, default=256, help="socket read size")
+    args = parser.parse_args()
+
+    print(f"link {args.kbps:.0f} kbit/s, rtt {args.rtt_ms:.0f} ms, chunk {args.chunk} B")
+    print(f"{'fixture':34} {'mode':13} {'on-air B':>9} {'latency ms':>11} {'peak heap B':>12}  rows")
+    for name in FIXTURES:
+        plain = hostpaths.read_fixture(name)
+        packed = gzip.compress(plain, compresslevel=6)
+        cases = (
+            ("plain/full", read_full, plain, 0),
+            ("plain/stream", read_stream, plain, 0),
+            ("gzip/stream", read_gzip_stream, packed, GZIP_HEADER_BYTES),
+        )
+        baseline = None
+        for mode, reader, body, extra in cases:
+            rows, cpu, peak = measure(reader, body, args.chunk)
+            if baseline is None:
+                baseline = rows
+            on_air = len(body) + RESPONSE_HEADER_BYTES + extra
+            latency = args.rtt_ms + on_air * 8 / args.kbps + cpu * 1000
+            same = "same" if rows == baseline else "DIFFERENT"
+            print(f"{name:34} {mode:13} {on_air:9d} {latency:11.1f} {peak:12d}  {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Checks the moon clock's local ephemeris (lunar.py) against a reference
+table of met.no sunrise/2.0-style answers and times it.
+
+For every (place, date) row in fixtures/moon_reference.json it computes
+moonrise, moonset and the phase value at local midnight the way MoonData
+now does, and reports the worst and mean error per place: minutes for
+rise/set, percentage points for the phase value (0-100, as met.no gives
+it) and the lit fraction. Then it times phase() and rise_set() per call.
+
+--regenerate rebuilds the table with PyEphem (pip install ephem), using
+met.no's conventions: upper limb on the horizon with 34' of refraction,
+phase value = Moon-Sun elongation / 3.6.
+
+Usage: python tools/bench_moon.py [--regenerate] [--days 60]
+"""
+
+import argparse
+import calendar
+import json
+import time
+
+import hostpaths
+
+hostpaths.use_board_modules(hostpaths.MOON_DIR)
+import lunar  # noqa: E402  (board module, needs the path above)
+
+REFERENCE = "moon_reference.json"
+# (name, latitude, longitude, utc offset): the board's home, met.no's, one
+# southern-hemisphere place and one inside the Arctic circle.
+PLACES = (
+    ("Boston", 42.3601, -71.0589, "-04:00"),
+    ("Oslo", 59.9139, 10.7522, "+02:00"),
+    ("Sydney", -33.8688, 151.2093, "+11:00"),
+    ("Tromso", 69.6492, 18.9553, "+01:00"),
+)
+START = (2025, 10, 1)
+
+
+def iso_local(epoch, offset):
+    """Local epoch seconds as met.no writes them: 2025-10-30T14:05:00-04:00."""
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(epoch)) + offset
+
+
+def local_epoch(iso):
+    """Inverse of iso_local(): the local fields as epoch seconds, offset ignored."""
+    return calendar.timegm(time.strptime(iso[:19], "%Y-%m-%dT%H:%M:%S"))
+
+
+def regenerate(days):
+    import ephem  # Host-only reference, not needed to check
+
+    unix = ephem.Date("1970/1/1")
+
+    def to_epoch(date):
+        return round((float(date) - unix) * 86400)
+
+    rows = []
+    for name, latitude, longitude, offset in PLACES:
+        shift = lunar.offset_seconds(offset)
+        observer = ephem.Observer()
+        observer.lat, observer.lon = str(latitude), str(longitude)
+        observer.pressure = 0       # Fixed refraction instead, as met.no
+        observer.horizon = "-0:34"
+        first = calendar.timegm(START + (0, 0, 0))
+        for day in range(days):
+            midnight = first + day * 86400  # Local midnight, as local epoch
+            utc = midnight - shift
+            row = {"place": name, "date": time.strftime("%Y-%m-%d", time.gmtime(midnight)),
+                   "latitude": latitude, "longitude": longitude, "offset": offset}
+            for key, method in (("moonrise", observer.next_rising), ("moonset", observer.next_setting)):
+                observer.date = ephem.Date(unix + utc / 86400)
+                try:
+                    event = to_epoch(method(ephem.Moon()))
+                except ephem.CircumpolarError:
+                    continue
+                if event < utc + 86400:
+                    row[key] = iso_local(event + shift, offset)
+            when = ephem.Date(unix + utc / 86400)
+            moon, sun = ephem.Moon(when), ephem.Sun(when)
+            elongation = (ephem.Ecliptic(moon).lon - ephem.Ecliptic(sun).lon) % (2 * ephem.pi)
+            row["moonphase"] = round(elongation / (2 * ephem.pi) * 100, 3)
+            row["illumination"] = round(moon.moon_phase * 100, 3)
+            rows.append(row)
+    with open(hostpaths.fixture_path(REFERENCE), "w") as out:
+        out.write("[\n" + ",\n".join(json.dumps(row) for row in rows) + "\n]\n")  # One row per line
+    print(f"Wrote {len(rows)} rows to {hostpaths.fixture_path(REFERENCE)}")
+
+
+def check(rows):
+    print(f"{'place':8} {'rise/set max':>12} {'mean':>6} {'missed':>6} {'phase max':>9} {'lit max':>8}")
+    for name, *_ in PLACES:
+        event_errors, phase_errors, lit_errors, missed = [], [], [], 0
+        for row in (r for r in rows if r["place"] == name):
+            shift = lunar.offset_seconds(row["offset"])
+            midnight = local_epoch(row["date"] + "T00:00:00")
+            computed = lunar.rise_set(midnight, row["latitude"], row["longitude"], shift)
+            for key, value in zip(("moonrise", "moonset"), computed):
+                if (key in row) != (value is not None):
+                    missed += 1
+                elif value is not None:
+                    event_errors.append((value - local_epoch(row[key])) / 60)
+            age, lit = lunar.phase(midnight - shift)
+            phase_errors.append(abs((age * 100 - row["moonphase"] + 50) % 100 - 50))
+            lit_errors.append(abs(lit * 100 - row["illumination"]))
+        worst = max(map(abs, event_errors))
+        mean = sum(map(abs, event_errors)) / len(event_errors)
+        print(f"{name:8} {worst:9.2f} min {mean:6.2f} {missed:6d} {max(phase_errors):9.3f} {max(lit_errors):8.3f}")
+
+
+def bench(rows):
+    row = rows[0]
+    shift = lunar.offset_seconds(row["offset"])
+    midnight = local_epoch(row["date"] + "T00:00:00")
+    calls = [0]
+    altitude = lunar.altitude
+
+    def counted(*args):
+        calls[0] += 1
+        return altitude(*args)
+
+    lunar.altitude = counted
+    lunar.rise_set(midnight, row["latitude"], row["longitude"], shift)
+    lunar.altitude = altitude
+
+    repeats = 200
+    start = time.process_time()
+    for i in range(repeats):
+        lunar.phase(midnight + i * 3600)
+    per_phase = (time.process_time() - start) / repeats
+    start = time.process_time()
+    for i in range(repeats // 10):
+        lunar.rise_set(midnight + i * 86400, row["latitude"], row["longitude"], shift)
+    per_day = (time.process_time() - start) / (repeats // 10)
+    print(f"phase() {per_phase * 1e6:.0f} us, rise_set() {per_day * 1e3:.2f} ms "
+          f"({calls[0]} positions per day) CPU (host)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--regenerate", action="store_true", help="rebuild the reference table with PyEphem")
+    parser.add_argument("--days", type=int, default=60, help="days per place when regenerating")
+    args = parser.parse_args()
+    if args.regenerate:
+        regenerate(args.days)
+    with open(hostpaths.fixture_path(REFERENCE)) as reference:
+        rows = json.load(reference)
+    check(rows)
+    bench(rows)
+
+
+if __name__ == "__main__":
+    main()
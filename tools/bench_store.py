@@ -0,0 +1,78 @@
+"""
+Measures how much heap predictions take in each form the board has used.
+
+    dicts      the json.loads'd 'data' list (prediction['attributes'][...])
+    tuples     (route_id, epoch, status) records, as sources.py returns them
+    store      prediction_store.PredictionStore, the compact arrays
+
+Each form holds the same predictions from the 24-row fixture. Also times
+the store's sorted insert, eviction and next-N query.
+
+Usage: python tools/bench_store.py
+"""
+
+import json
+import time
+import tracemalloc
+
+import hostpaths
+import simulator  # noqa: F401  (microcontroller stand-in for the board modules)
+
+hostpaths.use_board_modules()
+import prediction_store  # noqa: E402  (board module, needs the path above)
+import sources  # noqa: E402
+import stream_json  # noqa: E402
+
+
+def heap_of(build):
+    """Bytes still allocated by build()'s return value."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return after - before
+
+
+def main():
+    body = hostpaths.read_fixture("v3_predictions_2706_all.json")
+    fields = [stream_json.prediction_fields(p) for p in json.loads(body)["data"]]
+    records = [(route, sources.iso_to_local_epoch(raw), status) for route, raw, status in fields]
+    rows = len(records)
+
+    def build_dicts():
+        return json.loads(body)["data"]
+
+    def build_tuples():
+        return [(str(route), int(epoch), status) for route, epoch, status in records]
+
+    def build_store():
+        store = prediction_store.PredictionStore(capacity=rows)
+        store.replace(records)
+        return store
+
+    print(f"{rows} predictions")
+    for name, build in (("dicts", build_dicts), ("tuples", build_tuples), ("store", build_store)):
+        size = heap_of(build)
+        print(f"{name:7} {size:8d} B  {size / rows:7.1f} B/prediction")
+
+    store = build_store()
+    now = records[0][1]
+    repeats = 2000
+    start = time.perf_counter()
+    for _ in range(repeats):
+        store.next_n(3, route_id="89")
+    query = (time.perf_counter() - start) / repeats
+    start = time.perf_counter()
+    for _ in range(repeats // 20):
+        scratch = prediction_store.PredictionStore(capacity=rows)
+        for route, epoch, status in reversed(records):  # Worst case: every insert shifts
+            scratch.insert(route, epoch, status)
+        scratch.evict(now + 1800)
+    fill = (time.perf_counter() - start) / (repeats // 20)
+    print(f"next_n(3, route) {query * 1e6:.1f} us, fill {rows} rows + evict {fill * 1e6:.1f} us (host)")
+
+
+if __name__ == "__main__":
+    main()
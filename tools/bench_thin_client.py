@@ -0,0 +1,138 @@
+"""
+Compares thin-client mode with the SPA board's JSON path, update by update.
+
+Replays --minutes of the board's 15 s update cycle on the recorded
+fixtures and, for each update, measures what the board receives and the
+work it does with it:
+
+    json     the full-tier /predictions body (plain and gzip sizes): parse,
+             convert times, refill the PredictionStore, format three rows
+             and set the labels
+    thin     tools/frame_server.py's reply for the board's last frame:
+             thin_client.FrameClient.apply() painting the changed rows
+
+Reports bytes per update, host CPU per update (relative cost; the M4 is
+much slower on both) and peak Python heap while handling the reply. The
+JSON path's labels are the simulator's, which skip the glyph layout
+adafruit_display_text does in Python on the board, so its real cost
+there is higher still. Both screens are drawn and the thin client's
+pixels checked against the JSON path's at every update.
+
+Usage: python tools/bench_thin_client.py [--minutes 30] [--every 15]
+"""
+
+import argparse
+import gzip
+import time
+import tracemalloc
+
+import numpy as np
+
+import hostpaths
+import frame_server
+from mbta_fixtures import fixture_epoch
+
+hostpaths.use_board_modules()
+import fetch_plan  # noqa: E402  (board modules)
+import prediction_store  # noqa: E402
+import sources  # noqa: E402
+import stream_json  # noqa: E402
+import thin_client  # noqa: E402
+import train_layout  # noqa: E402
+from framebuffer import FramebufferDisplay  # noqa: E402  (stand-in)
+
+TITLE = "To School"
+BACKGROUND = "Tbanner.bmp"
+V3_PREDICTIONS = ("https://api-v3.mbta.com/predictions?filter[stop]=2706&filter[route]=89,101"
+                  "&sort=departure_time")
+
+
+def board_url():
+    """The full-tier URL the SPA board's FetchPlan builds (routes and alerts included)."""
+    plan = fetch_plan.FetchPlan(V3_PREDICTIONS, 3)
+    plan.want('route', 'route', 'short_name', lambda resources: None)
+    plan.want('alerts', 'alert', 'short_header,header', lambda resources: None)
+    return plan.url()
+
+
+def measure(work):
+    """(result, host seconds, peak heap bytes) of one call."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = work()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--minutes", type=float, default=30)
+    parser.add_argument("--every", type=float, default=15, help="seconds between updates")
+    args = parser.parse_args()
+
+    # Server side: fixtures fetched every update, as the board would
+    feed = frame_server.PredictionFeed("2706", "89,101", fixtures=True)
+    server = frame_server.FrameServer(feed, frame_server.ScheduleRenderer(TITLE, BACKGROUND), interval=0)
+    client = thin_client.FrameClient()
+    thin_display = FramebufferDisplay()
+    thin_display.show(client.group)
+
+    # Board side of the JSON path: the same labels the board draws
+    json_board = frame_server.ScheduleRenderer(TITLE, BACKGROUND)
+    store = prediction_store.PredictionStore()
+    url = board_url()
+
+    totals = {"json": [0, 0.0, 0], "gzip": [0], "thin": [0, 0.0, 0]}
+    updates = int(args.minutes * 60 / args.every)
+    mismatches = full_replies = runs = 0
+    start = fixture_epoch()
+    for step in range(updates):
+        now = start + int(step * args.every)
+
+        body = feed.fixture.predictions_body(url, now)
+
+        def json_update():
+            doc = sources.load_json(body)
+            fields = [stream_json.prediction_fields(p) for p in doc.get('data', [])[:3]]
+            del doc
+            store.replace([(route, sources.iso_to_local_epoch(raw) if raw else None, status)
+                           for route, raw, status in fields])
+            rows = store.next_n(3)
+            for i in range(3):
+                label = json_board.group[i + 2]
+                label.text, label.color = (train_layout.row_text(rows[i], now, feed.route_names)
+                                           if i < len(rows) else (train_layout.EMPTY_ROW, train_layout.GOLD))
+
+        _, elapsed, peak = measure(json_update)
+        totals["json"][0] += len(body)
+        totals["json"][1] += elapsed
+        totals["json"][2] = max(totals["json"][2], peak)
+        totals["gzip"][0] += len(gzip.compress(body))
+
+        reply = server.reply(client.session, client.seq, now)
+        full_replies += bool(reply[3] & thin_client.FLAG_FULL)
+        _, elapsed, peak = measure(lambda: client.apply(reply))
+        runs += (len(reply) - thin_client.HEADER_SIZE) // 2
+        totals["thin"][0] += len(reply)
+        totals["thin"][1] += elapsed
+        totals["thin"][2] = max(totals["thin"][2], peak)
+
+        if not np.array_equal(thin_display.frame(), json_board.display.frame()):
+            mismatches += 1
+
+    print(f"{updates} updates every {args.every:g} s ({args.minutes:g} simulated minutes), "
+          f"{full_replies} full frame(s), {client.rows_painted} rows painted, "
+          f"~{runs / updates:.0f} runs per update")
+    print(f"{'path':10} {'bytes/update':>12} {'host us/update':>15} {'peak heap':>10}")
+    print(f"{'json':10} {totals['json'][0] / updates:12.0f} {totals['json'][1] / updates * 1e6:15.1f} "
+          f"{totals['json'][2]:9d}B")
+    print(f"{'json gzip':10} {totals['gzip'][0] / updates:12.0f} {'':>15} {'':>10}")
+    print(f"{'thin':10} {totals['thin'][0] / updates:12.0f} {totals['thin'][1] / updates * 1e6:15.1f} "
+          f"{totals['thin'][2]:9d}B")
+    print(f"Screens differ at {mismatches} of {updates} updates")
+
+
+if __name__ == "__main__":
+    main()
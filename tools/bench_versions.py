@@ -0,0 +1,204 @@
+"""
+Benchmarks every generation of the train board's fetch-parse-format
+pipeline against the same recorded MBTA responses.
+
+Each version's code.py is loaded in the host simulator without its main
+loop (so its own setup runs, then its functions are called directly):
+
+    V3 boards (2022-23)   text_formating() over get_arrival_times()
+    finder boards (2023)  get_arrival_times2(), padded like update_text2()
+    10-8-2025 boards      update_train_schedule(group)
+
+For each version it reports wall time per cycle (host CPython, network
+time excluded), peak and retained tracemalloc bytes per cycle, gc.collect()
+calls per cycle, and how the three displayed lines compare with the
+reference version once reduced to minutes. Fixture responses are built
+before each timed cycle and replayed, so only board code is measured.
+gc.collect() is counted but skipped while timing (a host collection walks
+the whole CPython heap, nothing like the board's); --with-gc keeps it.
+Use it as the regression baseline before optimising a pipeline.
+
+Usage:
+    python tools/bench_versions.py
+    python tools/bench_versions.py --cycles 60 --step 30 --show
+"""
+
+import argparse
+import gc
+import os
+import re
+import time
+import tracemalloc
+
+import hostpaths
+from simulator.backend import FixtureBackend
+from simulator.harness import Simulation
+import simstate  # noqa: E402  (stub-side state; importing simulator puts it on the path)
+
+# (label, board folder under display_code, pipeline kind)
+VERSIONS = [
+    ("April 1 22", "April 1 22 - Version 1", "v3"),
+    ("October 19 22", "October 19 22 - Version 1.1", "v3"),
+    ("May 3 23", "May 3 23 - Version 1.2", "v3"),
+    ("8-23-23 current", "8-23-23/current", "v3"),
+    ("8-23-23 new", "8-23-23/new", "finder"),
+    ("current software", "10-8-2025/current software", "finder"),
+    ("New Version", "10-8-2025/New Version", "group"),
+    ("SPA", "10-8-2025/SPA_Version", "group"),
+]
+REFERENCE = "SPA"
+
+BOARDING_WORDS = ("brding", "brdng", "now", "arriving", "boarding")
+
+
+class ReplayBackend:
+    """Serves each URL from the fixtures once, then replays that response."""
+
+    def __init__(self):
+        self.fixtures = FixtureBackend()
+        self.responses = {}
+
+    def clear(self):
+        self.responses = {}
+
+    def __call__(self, url, headers):
+        key = (url, tuple(sorted(headers.items())))
+        if key not in self.responses:
+            self.responses[key] = self.fixtures(url, headers)
+        return self.responses[key]
+
+
+class GcCounter:
+    """Replaces gc.collect with a counter (optionally still collecting)."""
+
+    def __init__(self, collect):
+        self.calls = 0
+        self._collect = collect
+        self._real = gc.collect
+
+    def __enter__(self):
+        def counted(*args):
+            self.calls += 1
+            return self._real(*args) if self._collect else 0
+        gc.collect = counted
+        return self
+
+    def __exit__(self, *exc):
+        gc.collect = self._real
+
+
+def pipeline(kind, board):
+    """Returns a no-argument callable running one fetch-parse-format cycle."""
+    if kind == "v3":
+        def cycle():
+            return [board["text_formating"](m) for m in board["get_arrival_times"]()]
+    elif kind == "finder":
+        def cycle():
+            times = board["get_arrival_times2"]()
+            return [times[i] if i < len(times) else "***" for i in range(3)]
+    else:
+        # Boards with a mode lifecycle (modes.py) hold the group on the mode on screen
+        group = board.get("train_schedule_group") or board["train_mode"].group
+
+        def cycle():
+            board["update_train_schedule"](group)
+            return [group[i].text for i in range(2, 5)]
+    return cycle
+
+
+def lift_budgets(board):
+    """Takes the request budget off a board's sources (SPA), which would otherwise
+    stop fetching after a burst of three and leave later cycles drawing from cache."""
+    selector = board.get("data_sources")
+    for source in selector.sources if selector is not None else ():
+        source.budget = None
+
+
+def to_minutes(text):
+    """Reduces a displayed line to whole minutes (0 when boarding), or None."""
+    lowered = text.lower()
+    if any(word in lowered for word in BOARDING_WORDS):
+        return 0
+    match = re.search(r"(-?\d+)\s*min", lowered)
+    return int(match.group(1)) if match else None
+
+
+def measure(folder, kind, cycles, step, with_gc):
+    """Runs one version; returns (lines per cycle, s/cycle, peak, retained, gc calls/cycle)."""
+    board_dir = os.path.join(hostpaths.DISPLAY_CODE_DIR, folder)
+    backend = ReplayBackend()
+    simulation = Simulation(board_dir=board_dir, minutes=(cycles + 2) * step / 60 + 5,
+                            backend=backend, network_latency=0.0, quiet=True)
+    outputs = []
+    elapsed = 0.0
+    peaks = []
+    retained = []
+    with simulation.session():
+        board = simulation.load_board()
+        lift_budgets(board)
+        cycle = pipeline(kind, board)
+        cycle()  # Warm up imports and first-use allocations
+        with GcCounter(with_gc) as collects:
+            for index in range(cycles):
+                # Every version sees the same wall-clock instants
+                at = simulation.start_epoch + (index + 1) * step
+                simstate.clock.start_epoch = at - simstate.clock.mono
+                backend.clear()
+                outputs.append(cycle())  # Untimed: builds the fixture responses
+
+                simstate.clock.start_epoch = at - simstate.clock.mono
+                started = time.perf_counter()
+                cycle()
+                elapsed += time.perf_counter() - started
+
+                simstate.clock.start_epoch = at - simstate.clock.mono
+                tracemalloc.start()
+                before = tracemalloc.get_traced_memory()[0]
+                cycle()
+                after, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                peaks.append(peak - before)
+                retained.append(after - before)
+    return outputs, elapsed / cycles, max(peaks), sum(retained) / cycles, collects.calls / (3 * cycles)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--cycles", type=int, default=20, help="Cycles per version")
+    parser.add_argument("--step", type=float, default=60.0, help="Simulated seconds between cycles")
+    parser.add_argument("--with-gc", action="store_true", help="Let gc.collect() run while measuring")
+    parser.add_argument("--show", action="store_true", help="Print every version's displayed lines")
+    args = parser.parse_args()
+
+    results = {}
+    for label, folder, kind in VERSIONS:
+        results[label] = (kind,) + measure(folder, kind, args.cycles, args.step, args.with_gc)
+
+    reference = [[to_minutes(line) for line in lines] for lines in results[REFERENCE][1]]
+    print(f"{args.cycles} cycles per version, {args.step:.0f} s apart, reference: {REFERENCE}")
+    print(f"{'version':<18}{'kind':<8}{'ms/cycle':>10}{'peak B':>10}{'kept B':>9}{'gc':>5}"
+          f"{'same':>7}{'max diff':>10}")
+    for label, (kind, outputs, seconds, peak, kept, collects) in results.items():
+        same = 0
+        worst = 0
+        for lines, expected in zip(outputs, reference):
+            minutes = [to_minutes(line) for line in lines]
+            if minutes == expected:
+                same += 1
+            for got, want in zip(minutes, expected):
+                if got is not None and want is not None:
+                    worst = max(worst, abs(got - want))
+                elif got != want:
+                    worst = max(worst, 999)
+        diff = "n/a" if worst == 999 else f"{worst} min"
+        print(f"{label:<18}{kind:<8}{seconds * 1000:>10.3f}{peak:>10}{kept:>9.0f}{collects:>5.0f}"
+              f"{same:>4}/{len(outputs):<3}{diff:>9}")
+    if args.show:
+        for label, (_, outputs, *_) in results.items():
+            print(f"\n{label}:")
+            for index, lines in enumerate(outputs):
+                print(f"  t+{(index + 1) * args.step:>5.0f}s  " + " | ".join(f"{line:<9}" for line in lines))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Forces the SPA board through each memory tier and checks what it draws.
+
+Loads code.py in the host simulator without its main loop, then runs one
+train update per tier with the heap figures memory_guard sees faked to
+land in that tier: full, small page, stream, then cached (no request,
+minutes recomputed from the last good fetch a minute later). For each
+update it checks the tier memory_guard picked, that the request went to
+the URL that tier should use (none for cached), and that the three rows
+on screen match the same fixture reply, already parsed, run through
+train_layout.row_text(). Exits 1 on any mismatch.
+
+Usage: python tools/check_tiers.py [--verbose]
+"""
+
+import argparse
+import gc
+import sys
+
+import simulator  # noqa: F401  (stand-ins on sys.path)
+import simstate
+from simulator.harness import Simulation
+from mbta_fixtures import V3Fixture, iso_to_epoch
+
+# (tier name, mem_free, largest block) memory_guard should see
+TIERS = (
+    ("full", 60000, 20000),
+    ("small page", 30000, 9000),
+    ("stream", 14000, 4096),
+    ("cached", 8000, 1024),
+)
+STEP = 60  # Simulated seconds between updates
+
+
+def fake_heap(board, free, block):
+    gc.mem_free = lambda: free
+    board["memory_guard"].largest_free_block = lambda limit=0, step=0: min(block, limit or block)
+
+
+def expected_rows(doc, rows, now, route_names):
+    """The row text and colours the first `rows` predictions of a parsed reply give at `now`."""
+    import prediction_store  # Board modules; on sys.path inside the session
+    import stream_json
+    import train_layout
+
+    store = prediction_store.PredictionStore()
+    records = []
+    for prediction in doc["data"][:rows]:
+        route, raw, status = stream_json.prediction_fields(prediction)
+        records.append((route, iso_to_epoch(raw) if raw else None, status))
+    store.replace(records)
+    store.evict(now)
+    shown = store.next_n(3)
+    return [train_layout.row_text(shown[i], now, route_names) if i < len(shown)
+            else (train_layout.EMPTY_ROW, train_layout.GOLD) for i in range(3)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--verbose", action="store_true", help="Show the board's own print output")
+    args = parser.parse_args()
+
+    fixture = V3Fixture()
+    simulation = Simulation(minutes=len(TIERS) * STEP / 60 + 5, network_latency=0.0, quiet=not args.verbose)
+    failures = 0
+    lines = []  # Printed after the session, which silences stdout unless --verbose
+    with simulation.session():
+        board = simulation.load_board()
+        board["microcontroller"].watchdog.deinit()  # No main loop here to feed it
+        memory_guard = board["memory_guard"]
+        group = board["train_mode"].group
+        last_doc = last_rows = None
+        for name, free, block in TIERS:
+            simstate.clock.advance(STEP)
+            fake_heap(board, free, block)
+            tier = memory_guard.choose_tier()[0]
+            requests_before = len(simstate.requests)
+            board["update_train_schedule"](group)
+            now = board["time"].time()
+            made = simstate.requests[requests_before:]
+            problems = []
+            if memory_guard.TIER_NAMES[tier] != name:
+                problems.append(f"memory_guard picked {memory_guard.TIER_NAMES[tier]}")
+            if tier == memory_guard.TIER_CACHED:
+                if made:
+                    problems.append(f"{len(made)} request(s) made")
+                expected = expected_rows(last_doc, last_rows, now, board["route_names"])
+            else:
+                url = made[-1][1] if made else ""
+                lite = board["DATA_SOURCE_LITE"] in url
+                if lite != (tier != memory_guard.TIER_FULL):
+                    problems.append(f"requested {url}")
+                last_doc = fixture.predictions_doc(url, now)
+                last_rows = board["v3_source"].rows if tier == memory_guard.TIER_FULL else board["LITE_PAGE_LIMIT"]
+                expected = expected_rows(last_doc, last_rows, now, board["route_names"])
+            shown = [(group[i].text, group[i].color) for i in range(2, 5)]
+            if shown != expected:
+                problems.append(f"rows {shown}, expected {expected}")
+            failures += bool(problems)
+            lines.append(f"{name:10} {'ok' if not problems else 'FAIL: ' + '; '.join(problems)}")
+            lines.extend(f"           {text}" for text, _ in shown)
+    for line in lines:
+        print(line)
+    print(f"{len(TIERS) - failures} of {len(TIERS)} tiers drew the expected rows")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
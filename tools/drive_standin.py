@@ -0,0 +1,124 @@
+"""
+Runs a board's update loop in the simulator against the MBTA stand-in
+(tools/mbta_standin.py) in virtual time, with faults injected, and reports
+how the board copes.
+
+The stand-in prices every request (latency, TLS handshake on a new
+connection, body bytes over the bandwidth), and the simulated clock moves
+by that much, so a 30-minute run with outages takes seconds. Reported:
+request counts by endpoint and status, p50/p99 fetch latency, and for
+each fault window how many requests it ate, the board resets it caused
+and the recovery time (window end to the first complete 200 from MBTA).
+
+Usage:
+    python tools/drive_standin.py                         # default fault script
+    python tools/drive_standin.py --minutes 20 --fault 503@60+45 --fault 429@400+60
+    python tools/drive_standin.py --board "display_code/10-8-2025/New Version"
+    python tools/drive_standin.py --shared-load 17 --fault 429@300+0    # busy NAT, no outages
+    python tools/drive_standin.py --shared-load 17 --api-key test-key   # same, with a key
+"""
+
+import argparse
+from urllib.parse import urlsplit
+
+import hostpaths
+from mbta_standin import StandIn, parse_fault
+from simulator.harness import Simulation
+import simstate  # noqa: E402  (stub-side state; importing simulator puts it on the path)
+
+DEFAULT_FAULTS = ("503@120+30", "429@300+30", "truncate@480+30", "stall@600+30:4", "stall@660+30:30")
+TIME_SYNC_SECONDS = 0.2  # io.adafruit.com is not part of the stand-in; flat cost
+
+
+class StandInBackend:
+    """Simulator backend that sends MBTA hosts to a StandIn, one connection per host."""
+
+    def __init__(self, standin):
+        self.standin = standin
+        self.open_hosts = set()
+
+    def __call__(self, url, headers):
+        parts = urlsplit(url)
+        if "mbta.com" not in parts.netloc:
+            simstate.clock.advance(TIME_SYNC_SECONDS)
+            return 200, {"Content-Type": "text/plain"}, str(simstate.clock.time()).encode()
+        path = url[url.index(parts.netloc) + len(parts.netloc):]
+        reply = self.standin.respond(path, headers, simstate.clock.mono,
+                                     parts.netloc not in self.open_hosts)
+        simstate.clock.advance(reply.delay)
+        if reply.closes:
+            self.open_hosts.discard(parts.netloc)
+        else:
+            self.open_hosts.add(parts.netloc)
+        body = reply.body if reply.truncate_at is None else reply.body[:reply.truncate_at]
+        return reply.status, reply.headers, body, reply.stalls
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list (None when empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def complete_ok(entry, standin):
+    """A 200 that arrived whole and on time (no truncate or stall fault was active for it)."""
+    elapsed, _, status, _, _ = entry
+    return (status == 200 and standin.fault_at(elapsed, "truncate") is None
+            and standin.fault_at(elapsed, "stall") is None)
+
+
+def report(standin, resets):
+    log = standin.log
+    print(f"Requests: {len(log)}")
+    counts = {}
+    for _, path, status, _, _ in log:
+        counts[(path, status)] = counts.get((path, status), 0) + 1
+    for (path, status), count in sorted(counts.items()):
+        print(f"  {path:<34} {status}  x{count}")
+
+    latencies = [delay for _, _, status, delay, _ in log if status == 200]
+    if latencies:
+        print(f"Fetch latency (200s): p50 {percentile(latencies, 0.5) * 1000:.0f} ms, "
+              f"p99 {percentile(latencies, 0.99) * 1000:.0f} ms, max {max(latencies) * 1000:.0f} ms")
+    print(f"Board resets: {len(resets)}" + (f" at {', '.join(f'{t:.0f}s' for t in resets)}" if resets else ""))
+
+    for fault in standin.faults:
+        during = [entry for entry in log if fault.start <= entry[0] < fault.end]
+        hit = [entry for entry in during if not complete_ok(entry, standin)]
+        reset_count = sum(1 for t in resets if fault.start <= t < fault.end + 60)
+        recovered = next((entry[0] for entry in log if entry[0] >= fault.end and complete_ok(entry, standin)), None)
+        recovery = "never" if recovered is None else f"{recovered - fault.end:.1f} s"
+        print(f"Fault {fault!r}: {len(during)} requests ({len(hit)} failed), "
+              f"{reset_count} resets, recovered after {recovery}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--board", default=hostpaths.SPA_DIR, help="Board folder containing code.py")
+    parser.add_argument("--minutes", type=float, default=12.0, help="Simulated minutes to run")
+    parser.add_argument("--latency", type=float, default=0.15, help="Seconds per request")
+    parser.add_argument("--tls", type=float, default=1.2, help="Extra seconds on a new connection")
+    parser.add_argument("--bandwidth", type=float, default=20000, help="Body bytes per second")
+    parser.add_argument("--fault", type=parse_fault, action="append",
+                        help="KIND@START+SECONDS (default: " + ", ".join(DEFAULT_FAULTS) + ")")
+    parser.add_argument("--shared-load", type=float, default=0.0,
+                        help="Requests a minute other boards on the same IP spend of the anonymous budget")
+    parser.add_argument("--api-key", help="MBTA_API_KEY to put in the board's settings.toml")
+    parser.add_argument("--verbose", action="store_true", help="Show the board's own print output")
+    args = parser.parse_args()
+
+    faults = args.fault or [parse_fault(text) for text in DEFAULT_FAULTS]
+    standin = StandIn(latency=args.latency, tls=args.tls, bandwidth=args.bandwidth, faults=faults,
+                      shared_load=args.shared_load)
+    settings = {"MBTA_API_KEY": args.api_key} if args.api_key else {}
+    simulation = Simulation(board_dir=args.board, minutes=args.minutes, backend=StandInBackend(standin),
+                            network_latency=0.0, quiet=not args.verbose, settings=settings)
+    simulation.run()
+    print(f"Simulated {args.minutes:g} min of {args.board}")
+    report(standin, simstate.resets)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Builds the eyes board's design manifest (eyes/manifest.py).
+
+For every design folder under display_code/march 23 22/eyes it reads
+data.py and the BMP headers, resolves the 'transparent' RGB to the nearest
+palette index of each lid/stencil image (the search Sprite used to run on
+the board at every startup) and writes one module holding every design's
+settings, image sizes and transparent indices. The board imports it once
+and builds a design's sprites only when that design is first shown.
+
+Re-run after adding a design or editing an image or a data.py.
+
+Usage: python tools/eyes_manifest.py [--check]
+"""
+
+import argparse
+import os
+import struct
+import sys
+
+import hostpaths
+
+EYES_DIR = os.path.join(hostpaths.DISPLAY_CODE_DIR, "march 23 22", "eyes")
+MANIFEST = os.path.join(EYES_DIR, "manifest.py")
+IMAGES = ("eye_image", "lower_lid_image", "upper_lid_image", "stencil_image")
+OPAQUE = ("eye_image",)  # Drawn without a transparent color, as before
+
+HEADER = '''# eyes/manifest.py
+# Generated by tools/eyes_manifest.py from each design's data.py and BMPs;
+# edit those and re-run the tool rather than editing this file.
+#
+# DESIGNS: design names in switching order.
+# MANIFEST[name]: the design's data.py settings, with each image entry
+# replaced by (path, width, height, transparent palette index or None).
+
+'''
+
+
+def read_bmp(path):
+    """(width, height, palette as 0xRRGGBB ints) from a paletted BMP's headers."""
+    with open(path, "rb") as bmp:
+        head = bmp.read(54)
+        if head[:2] != b"BM":
+            raise ValueError(f"{path}: not a BMP")
+        dib_size, width, height, _, depth = struct.unpack_from("<IiiHH", head, 14)
+        colors = struct.unpack_from("<I", head, 46)[0] or (1 << depth if depth <= 8 else 0)
+        bmp.seek(14 + dib_size)
+        raw = bmp.read(colors * 4)
+    palette = [(raw[i + 2] << 16) | (raw[i + 1] << 8) | raw[i] for i in range(0, len(raw), 4)]
+    return width, abs(height), palette
+
+
+def nearest_index(palette, rgb):
+    """Palette index closest to rgb: Sprite's old on-board search, first match wins ties."""
+    closest_distance, closest_index = 0x1000000, None
+    for color_index, color in enumerate(palette):
+        delta = (rgb[0] - ((color >> 16) & 0xFF),
+                 rgb[1] - ((color >> 8) & 0xFF),
+                 rgb[2] - (color & 0xFF))
+        distance = delta[0] * delta[0] + delta[1] * delta[1] + delta[2] * delta[2]
+        if distance < closest_distance:
+            closest_distance, closest_index = distance, color_index
+    return closest_index
+
+
+def load_data(design_dir):
+    """A design's EYE_DATA, run from its data.py as the board would import it."""
+    path = os.path.join(design_dir, "data.py")
+    scope = {"__file__": path.replace(os.sep, "/")}
+    with open(path) as source:
+        exec(compile(source.read(), path, "exec"), scope)
+    return scope["EYE_DATA"]
+
+
+def build():
+    designs = sorted(name for name in os.listdir(EYES_DIR)
+                     if os.path.isfile(os.path.join(EYES_DIR, name, "data.py")))
+    manifest = {}
+    for name in designs:
+        design_dir = os.path.join(EYES_DIR, name)
+        data = load_data(design_dir)
+        entry = {}
+        for key, value in data.items():
+            if key in IMAGES:
+                filename = os.path.basename(value)
+                width, height, palette = read_bmp(os.path.join(design_dir, filename))
+                transparent = data["transparent"]
+                if key in OPAQUE:
+                    index = None
+                elif isinstance(transparent, int):
+                    index = transparent
+                else:
+                    index = nearest_index(palette, transparent)
+                entry[key] = (f"/eyes/{name}/{filename}", width, height, index)
+            elif key != "transparent":
+                entry[key] = value
+        manifest[name] = entry
+    lines = [f"DESIGNS = {tuple(designs)!r}", "", "MANIFEST = {"]
+    for name, entry in manifest.items():
+        lines.append(f"    {name!r}: {{")
+        lines.extend(f"        {key!r:18} : {value!r}," for key, value in entry.items())
+        lines.append("    },")
+    lines.append("}")
+    return HEADER + "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--check", action="store_true",
+                        help="exit 1 if manifest.py is out of date instead of writing it")
+    args = parser.parse_args()
+    text = build()
+    if args.check:
+        with open(MANIFEST) as current:
+            if current.read() != text:
+                print(f"{MANIFEST} is out of date; run python tools/eyes_manifest.py")
+                sys.exit(1)
+        print("manifest.py is up to date")
+        return
+    with open(MANIFEST, "w") as out:
+        out.write(text)
+    print(f"Wrote {MANIFEST}")
+
+
+if __name__ == "__main__":
+    main()
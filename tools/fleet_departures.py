@@ -0,0 +1,273 @@
+"""
+Next three departures for every stop in one bulk predictions snapshot.
+
+A backend serving a fleet of boards can fetch the whole system once (V3
+/predictions without a stop filter, or a GTFS-Realtime TripUpdates feed)
+instead of once per board. This works out every (stop, route, direction)'s
+next three departures in a few NumPy passes and gives each one the exact
+text and colour the SPA board's train_layout.row_text would ("89 05min",
+" 89 NOW", "BRDNG"):
+
+    columns   stop, route, direction and status as small-int codes into
+              per-snapshot name tables, epochs as int64 (0 = status only)
+    evict     timed rows that left over a minute ago are dropped, as
+              PredictionStore.evict does on the board
+    sort      one stable argsort on (group key, epoch), so status-only rows
+              come first and ties keep feed order, as PredictionStore.insert
+    top-k     rank in group = position - group start; keep ranks below 3
+    format    minutes-until rounded as the board rounds them; text comes
+              from tables built once per distinct route, status and minute
+
+V3 times are read as local fields on the boards' local-as-UTC scale and
+GTFS-RT times are UTC, so --now defaults to the local clock or the feed's
+header timestamp respectively.
+
+Usage: python tools/fleet_departures.py (--v3 predictions.json | --feed TripUpdates.pb)
+       [--now EPOCH] [--stop 2706 ...]
+"""
+
+import argparse
+import calendar
+import json
+import time
+
+import numpy as np
+
+import hostpaths
+
+hostpaths.use_board_modules()
+import gtfs_rt  # noqa: E402  (board modules)
+import train_layout  # noqa: E402
+
+DEPTH = 3            # Rows per (stop, route, direction), as on the board
+GRACE = 60           # Seconds a departure stays listed after it leaves (PredictionStore.evict)
+NO_TIME = 0
+NO_DIRECTION = -1
+BOARDING = ('BOARDING', 'BRDNG', 'ARRIVING')
+
+
+class Snapshot:
+    """One bulk snapshot as columns: code arrays into name tables, plus epochs."""
+
+    def __init__(self, stops, routes, directions, epochs, statuses,
+                 stop_names, route_names, status_names, short_names=None):
+        self.stops = np.asarray(stops, dtype=np.int32)
+        self.routes = np.asarray(routes, dtype=np.int32)
+        self.directions = np.asarray(directions, dtype=np.int8)
+        self.epochs = np.asarray(epochs, dtype=np.int64)
+        self.statuses = np.asarray(statuses, dtype=np.int32)
+        self.stop_names = stop_names
+        self.route_names = route_names      # route_id per route code
+        self.status_names = status_names    # Code 0 is "no status"
+        self.short_names = short_names or {}  # route_id -> short_name, from include=route
+
+    def __len__(self):
+        return len(self.epochs)
+
+
+class _Codes(dict):
+    """Interns names to 0, 1, 2... in first-seen order."""
+
+    def __init__(self, *first):
+        super().__init__()
+        self.names = []
+        for name in first:
+            self.code(name)
+
+    def code(self, name):
+        code = self.get(name)
+        if code is None:
+            code = self[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+
+def iso_epochs(raws):
+    """Local ISO times -> epoch seconds on the local-as-UTC scale, '' -> NO_TIME, in one pass."""
+    stamps = np.array([raw[:19] if raw else 'NaT' for raw in raws], dtype='datetime64[s]')
+    epochs = stamps.astype(np.int64)
+    epochs[np.isnat(stamps)] = NO_TIME
+    return epochs
+
+
+def v3_snapshot(doc):
+    """Snapshot of a V3 /predictions document (stop and route relationships; include=route for names)."""
+    stops, routes, statuses = _Codes(), _Codes(), _Codes(None)
+    stop_codes, route_codes, directions, raws, status_codes = [], [], [], [], []
+    for prediction in doc.get('data', []):
+        attributes = prediction.get('attributes') or {}
+        relationships = prediction.get('relationships') or {}
+        stop_codes.append(stops.code(((relationships.get('stop') or {}).get('data') or {}).get('id')))
+        route_codes.append(routes.code(((relationships.get('route') or {}).get('data') or {}).get('id')))
+        direction = attributes.get('direction_id')
+        directions.append(NO_DIRECTION if direction is None else direction)
+        raws.append(attributes.get('departure_time') or attributes.get('arrival_time'))
+        status_codes.append(statuses.code(attributes.get('status')))
+    short_names = {}
+    for resource in doc.get('included', []):
+        name = (resource.get('attributes') or {}).get('short_name')
+        if resource.get('type') == 'route' and name:
+            short_names[resource['id']] = name
+    return Snapshot(stop_codes, route_codes, directions, iso_epochs(raws), status_codes,
+                    stops.names, routes.names, statuses.names, short_names)
+
+
+def gtfs_rt_snapshot(body, chunk=4096):
+    """(Snapshot, feed timestamp) of a TripUpdates feed, read by the board's own filter."""
+    feed = gtfs_rt.TripUpdateFilter(None)
+    feed.parse(body[i:i + chunk] for i in range(0, len(body), chunk))
+    stops, routes = _Codes(), _Codes()
+    count = len(feed.records)
+    stop_codes = np.empty(count, dtype=np.int32)
+    route_codes = np.empty(count, dtype=np.int32)
+    directions = np.empty(count, dtype=np.int8)
+    epochs = np.empty(count, dtype=np.int64)
+    for i, (route_id, direction, epoch, stop_id) in enumerate(feed.records):
+        stop_codes[i] = stops.code(stop_id)
+        route_codes[i] = routes.code(route_id)
+        directions[i] = NO_DIRECTION if direction is None else direction
+        epochs[i] = epoch
+    snapshot = Snapshot(stop_codes, route_codes, directions, epochs, np.zeros(count, dtype=np.int32),
+                        stops.names, routes.names, [None])
+    return snapshot, feed.feed_timestamp
+
+
+class Departures:
+    """
+    The next DEPTH rows of every (stop, route, direction) group, sorted by
+    stop, route code, direction and then time. text and color hold what
+    the board's row label would show.
+    """
+
+    def __init__(self, snapshot, stops, routes, directions, ranks, text, color):
+        self.snapshot = snapshot
+        self.stops = stops
+        self.routes = routes
+        self.directions = directions
+        self.ranks = ranks
+        self.text = text
+        self.color = color
+
+    def __len__(self):
+        return len(self.text)
+
+    def groups(self):
+        """Number of (stop, route, direction) groups with something to show."""
+        return int(np.count_nonzero(self.ranks == 0))
+
+    def for_stop(self, stop_id):
+        """{(route_id, direction): [(text, color), ...]} for one stop."""
+        try:
+            code = self.snapshot.stop_names.index(stop_id)
+        except ValueError:
+            return {}
+        low, high = np.searchsorted(self.stops, (code, code + 1))
+        return self._collect(range(low, high))
+
+    def as_dict(self):
+        """{(stop_id, route_id, direction): [(text, color), ...]} for every group."""
+        return self._collect(range(len(self)), with_stop=True)
+
+    def _collect(self, indices, with_stop=False):
+        names = self.snapshot
+        out = {}
+        for i in indices:
+            key = (names.route_names[self.routes[i]], int(self.directions[i]))
+            if with_stop:
+                key = (names.stop_names[self.stops[i]],) + key
+            out.setdefault(key, []).append((self.text[i], int(self.color[i])))
+        return out
+
+
+def next_departures(snapshot, now, depth=DEPTH):
+    """Departures for every group in the snapshot at epoch `now` (same scale as its epochs)."""
+    epochs = snapshot.epochs
+    # Evict: the board keeps status-only rows and anything that left under GRACE ago
+    live = np.flatnonzero((epochs == NO_TIME) | (epochs > now - GRACE))
+    epochs = epochs[live]
+    stops = snapshot.stops[live]
+    routes = snapshot.routes[live]
+    directions = snapshot.directions[live]
+
+    # One int64 sort key: group in the high 32 bits, time since the earliest row below it
+    group = ((stops.astype(np.int64) * len(snapshot.route_names) + routes) * 3 + (directions + 1))
+    timed = epochs != NO_TIME
+    base = epochs[timed].min() - 1 if timed.any() else 0
+    order = np.argsort((group << 32) | np.where(timed, epochs - base, 0), kind='stable')
+
+    sorted_group = group[order]
+    starts = np.flatnonzero(np.concatenate(([True], sorted_group[1:] != sorted_group[:-1])))
+    group_start = np.repeat(starts, np.diff(np.append(starts, len(order))))
+    ranks = np.arange(len(order)) - group_start
+    keep = order[ranks < depth]
+    ranks = ranks[ranks < depth]
+
+    text, color = _row_text(snapshot, live[keep], now)
+    return Departures(snapshot, stops[keep], routes[keep], directions[keep], ranks, text, color)
+
+
+def _row_text(snapshot, rows, now):
+    """train_layout.row_text for the given snapshot rows, built from per-value tables."""
+    count = len(rows)
+    text = np.empty(count, dtype=object)
+    color = np.full(count, train_layout.GOLD, dtype=np.int64)
+    epochs = snapshot.epochs[rows]
+    statuses = snapshot.statuses[rows]
+
+    upper = [str(name or '').upper() for name in snapshot.status_names]
+    boarding = np.isin(statuses, [code for code, name in enumerate(upper) if name in BOARDING])
+    status_only = ~boarding & (epochs == NO_TIME)
+    timed = ~boarding & ~status_only
+
+    text[boarding] = "BRDNG"
+    color[boarding] = train_layout.PURPLE
+    status_text = np.array([name or "N/A" for name in upper], dtype=object)
+    text[status_only] = status_text[statuses[status_only]]
+
+    # Same float maths as row_text's round((prediction_epoch - current_epoch) / 60)
+    minutes = np.rint((epochs[timed] - now) / 60).astype(np.int64)
+    labels = np.array([f"{snapshot.short_names.get(route) or route or '??':>3}"
+                       for route in snapshot.route_names], dtype=object)
+    route_labels = labels[snapshot.routes[rows[timed]]]
+    values, inverse = np.unique(np.maximum(minutes, 0), return_inverse=True)
+    minute_text = np.array([" NOW" if value <= 0 else
+                            f" {value:02d}min" if value < 10 else f" {value}min"
+                            for value in values], dtype=object)
+    text[timed] = route_labels + minute_text[inverse.reshape(-1)]
+    color[timed] = np.where(minutes <= 0, train_layout.PURPLE, train_layout.GOLD)
+    return text, color
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--v3", help="V3 /predictions document without a stop filter (include=route)")
+    source.add_argument("--feed", help="GTFS-Realtime TripUpdates.pb")
+    parser.add_argument("--now", type=float, help="epoch to count down from (default: see above)")
+    parser.add_argument("--stop", nargs="*", default=[], help="stops to print (default: a summary only)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.v3:
+        with open(args.v3, "rb") as document:
+            snapshot = v3_snapshot(json.load(document))
+        now = calendar.timegm(time.localtime()) if args.now is None else args.now
+    else:
+        with open(args.feed, "rb") as feed:
+            snapshot, feed_timestamp = gtfs_rt_snapshot(feed.read())
+        now = feed_timestamp if args.now is None else args.now
+    read = time.perf_counter() - started
+
+    started = time.perf_counter()
+    departures = next_departures(snapshot, now)
+    computed = time.perf_counter() - started
+    print(f"{len(snapshot)} predictions, {len(snapshot.stop_names)} stops: {departures.groups()} groups, "
+          f"{len(departures)} rows (read {read * 1000:.1f} ms, computed {computed * 1000:.1f} ms)")
+    for stop_id in args.stop:
+        print(f"stop {stop_id}")
+        for (route_id, direction), rows in departures.for_stop(stop_id).items():
+            print(f"  {route_id} dir {direction}: " + " | ".join(text for text, _ in rows))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""
+Companion renderer for the SPA board's thin-client mode and binary rows.
+
+Draws the train schedule screen the way the board would (the page's
+background BMP, the 6x10 font, and the layout and row text from the
+board's train_layout.py) into 64x32 indexed frames, and answers the
+board's GET /frame?session=S&since=N with only the pixel rows that changed
+since frame N, run-length encoded as thin_client.py describes. Drawing
+goes through the simulator's displayio and font stand-ins, the code the
+golden frames check.
+
+Predictions come from api-v3 (--stop, --routes, MBTA_API_KEY from the
+environment) or, with --fixtures, from the recorded fixtures replayed on
+the local clock. Point the board at it with
+THIN_CLIENT_SOURCE = 'http://<this computer>:8064/frame' in code.py.
+
+GET /rows?count=N answers with the next N departures in binary_rows.py's
+fixed layout (encode_rows() is the reference encoder), for a board that
+still draws its own screen but should not parse JSON: set
+BINARY_ROWS_SOURCE = 'http://<this computer>:8064/rows'.
+
+Usage: python tools/frame_server.py [--port 8064] [--fixtures]
+       [--stop 2706] [--routes 89,101] [--title "To School"]
+       [--background Tbanner.bmp] [--interval 15]
+"""
+
+import argparse
+import calendar
+import json
+import os
+import zlib
+import random
+import struct
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+import hostpaths
+import simulator  # noqa: F401  (puts the displayio/font stand-ins on sys.path)
+from mbta_fixtures import V3Fixture
+
+hostpaths.use_board_modules()
+import displayio  # noqa: E402  (stand-ins)
+from framebuffer import FramebufferDisplay  # noqa: E402
+import adafruit_display_text.label  # noqa: E402
+from adafruit_bitmap_font import bitmap_font  # noqa: E402
+import binary_rows  # noqa: E402  (board modules)
+import prediction_store  # noqa: E402
+import sources  # noqa: E402
+import stream_json  # noqa: E402
+import thin_client  # noqa: E402
+import train_layout  # noqa: E402
+
+V3_URL = ("https://api-v3.mbta.com/predictions?filter[stop]={stop}&filter[route]={routes}"
+          "&sort=departure_time&include=route&page[limit]=10")
+
+
+def local_now():
+    """Local wall-clock time as epoch seconds, on the boards' local-as-UTC scale."""
+    return calendar.timegm(time.localtime())
+
+
+class ScheduleRenderer:
+    """The board's train schedule group, built from the stand-ins and drawn to palette indices."""
+
+    def __init__(self, title, background, width=64, height=32):
+        self.display = FramebufferDisplay(width, height)
+        font = bitmap_font.load_font(os.path.join(hostpaths.SPA_DIR, train_layout.FONT.lstrip("/")))
+        self.group = displayio.Group()
+        bitmap = displayio.OnDiskBitmap(os.path.join(hostpaths.SPA_DIR, background))
+        self.group.append(displayio.TileGrid(bitmap, pixel_shader=bitmap.pixel_shader))
+        self.group.append(adafruit_display_text.label.Label(
+            font, color=train_layout.DIM, x=train_layout.TITLE_X, y=train_layout.TITLE_Y, text=title))
+        for y in train_layout.ROW_YS:
+            self.group.append(adafruit_display_text.label.Label(
+                font, color=train_layout.GOLD, x=train_layout.ROW_X, y=y, text="---"))
+        self.display.show(self.group)
+        self.palette = []  # 0xRRGGBB per index; colours keep their index once assigned
+
+    def render(self, rows, current_epoch, route_names):
+        """(height, width) uint8 palette indices for up to three predictions."""
+        for i in range(3):
+            label = self.group[i + 2]
+            label.text, label.color = train_layout.EMPTY_ROW, train_layout.GOLD
+            if i < len(rows):
+                try:
+                    label.text, label.color = train_layout.row_text(rows[i], current_epoch, route_names)
+                except Exception:
+                    label.text, label.color = "PARSE ERR", train_layout.RED
+        rgb = self.display.frame().astype(np.uint32)
+        packed = (rgb[:, :, 0] << 16) | (rgb[:, :, 1] << 8) | rgb[:, :, 2]
+        colors, inverse = np.unique(packed, return_inverse=True)
+        lookup = np.array([self._index(int(color)) for color in colors], dtype=np.uint8)
+        return lookup[inverse.reshape(packed.shape)]
+
+    def _index(self, color):
+        if color not in self.palette:
+            if len(self.palette) < thin_client.COLORS:
+                self.palette.append(color)
+            else:  # Full: reuse the nearest colour rather than fail
+                rgb = np.array([(c >> 16, (c >> 8) & 0xFF, c & 0xFF) for c in self.palette])
+                target = np.array((color >> 16, (color >> 8) & 0xFF, color & 0xFF))
+                return int(((rgb - target) ** 2).sum(axis=1).argmin())
+        return self.palette.index(color)
+
+
+def encode_row(y, row):
+    """One row record: y, run count, then (length, index) runs."""
+    runs = bytearray()
+    count = 0
+    x = 0
+    width = len(row)
+    while x < width:
+        value = row[x]
+        end = x + 1
+        while end < width and row[end] == value and end - x < 255:
+            end += 1
+        runs += bytes((end - x, int(value)))
+        count += 1
+        x = end
+    return bytes((y, count)) + bytes(runs)
+
+
+def encode_rows(rows, now, route_names=None):
+    """
+    binary_rows.py's reply for (route_id, epoch, status) rows, soonest first.
+    Times are seconds after the earliest of `now` and the rows' own; rows
+    more than 18 hours out do not fit and are left off.
+    """
+    route_names = route_names or {}
+    epochs = [int(epoch) for _, epoch, _ in rows if epoch]
+    base = min([int(now)] + epochs)
+    names = [""]
+    packed = bytearray()
+    count = 0
+    for row in rows:
+        route, epoch, status = row
+        offset = binary_rows.NO_TIME if not epoch else int(epoch) - base
+        if offset > binary_rows.NO_TIME:
+            continue
+        for name in (route or "", status or ""):
+            if name not in names:
+                names.append(name)
+        try:
+            _, color = train_layout.row_text(row, now, route_names)
+        except Exception:
+            color = train_layout.RED
+        packed += struct.pack(binary_rows.ROW, names.index(route or ""), offset, names.index(status or ""),
+                              binary_rows.COLORS.index(color))
+        count += 1
+    table = b"".join(bytes((len(name.encode()),)) + name.encode() for name in names)
+    header = struct.pack(binary_rows.HEADER, binary_rows.MAGIC, binary_rows.VERSION, base,
+                         zlib.crc32(table) & 0xFFFF, len(names), count)
+    return header + table + bytes(packed)
+
+
+class FrameHistory:
+    """Tracks which rows changed in which frame so each reply carries only the difference."""
+
+    def __init__(self):
+        self.session = random.getrandbits(32) or 1  # New per server start; 0 is the board's "none"
+        self.seq = 0
+        self.frame = None
+        self.row_seq = []      # Frame number each row last changed in
+        self.palette = []
+        self.palette_seq = 0
+
+    def update(self, frame, palette):
+        """Records a newly rendered frame; only bumps seq if something differs."""
+        if self.frame is None:
+            self.seq = 1
+            self.row_seq = [1] * frame.shape[0]
+        else:
+            changed = np.nonzero((frame != self.frame).any(axis=1))[0]
+            if len(changed) == 0 and palette == self.palette:
+                return
+            self.seq += 1
+            for y in changed:
+                self.row_seq[y] = self.seq
+        if palette != self.palette:
+            self.palette = list(palette)
+            self.palette_seq = self.seq
+        self.frame = frame.copy()
+
+    def reply(self, session, since):
+        """The body for a board that last painted frame `since` of `session`."""
+        full = session != self.session or not 0 < since <= self.seq
+        flags = 0
+        body = bytearray()
+        if full:
+            flags |= thin_client.FLAG_FULL
+        if full or self.palette_seq > since:
+            flags |= thin_client.FLAG_PALETTE
+            body.append(len(self.palette))
+            for color in self.palette:
+                body += bytes((color >> 16, (color >> 8) & 0xFF, color & 0xFF))
+        rows = [y for y, seq in enumerate(self.row_seq) if full or seq > since]
+        for y in rows:
+            body += encode_row(y, self.frame[y])
+        header = struct.pack(thin_client.HEADER, thin_client.MAGIC, thin_client.VERSION, flags,
+                             self.session, self.seq, len(rows))
+        return header + bytes(body)
+
+
+class PredictionFeed:
+    """The board's fetch-parse-cache path on the host: api-v3 (or fixtures) into a PredictionStore."""
+
+    def __init__(self, stop, routes, fixtures=False, api_key=None):
+        self.url = V3_URL.format(stop=stop, routes=routes)
+        self.fixture = V3Fixture() if fixtures else None
+        self.api_key = api_key
+        self.store = prediction_store.PredictionStore()
+        self.route_names = {}
+
+    def body(self, now):
+        if self.fixture is not None:
+            return self.fixture.predictions_body(self.url, now)
+        request = urllib.request.Request(self.url, headers={"x-api-key": self.api_key} if self.api_key else {})
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.read()
+
+    def refresh(self, now):
+        doc = json.loads(self.body(now))
+        for route in doc.get("included", []):
+            name = (route.get("attributes") or {}).get("short_name")
+            if route.get("type") == "route" and name:
+                self.route_names[route["id"]] = name
+        fields = [stream_json.prediction_fields(p) for p in doc.get("data", [])]
+        self.store.replace([(route, sources.iso_to_local_epoch(raw) if raw else None, status)
+                            for route, raw, status in fields])
+
+    def rows(self, now, count=3):
+        self.store.evict(now)
+        return self.store.next_n(count)
+
+
+class FrameServer:
+    """Renders on demand and remembers frames; shared by the HTTP handler and the benchmark."""
+
+    def __init__(self, feed, renderer, interval=15):
+        self.feed = feed
+        self.renderer = renderer
+        self.history = FrameHistory()
+        self.interval = interval
+        self.fetched_at = None
+        self.lock = threading.Lock()
+
+    def reply(self, session, since, now=None):
+        with self.lock:
+            now = self._refresh(now)
+            frame = self.renderer.render(self.feed.rows(now), now, self.feed.route_names)
+            self.history.update(frame, self.renderer.palette)
+            return self.history.reply(session, since)
+
+    def rows_reply(self, count, now=None):
+        """The next `count` departures for a board reading binary rows."""
+        with self.lock:
+            now = self._refresh(now)
+            return encode_rows(self.feed.rows(now, count), now, self.feed.route_names)
+
+    def _refresh(self, now):
+        now = local_now() if now is None else now
+        if self.fetched_at is None or now - self.fetched_at >= self.interval:
+            try:
+                self.feed.refresh(now)
+                self.fetched_at = now
+            except Exception as e:  # Keep counting down from what we have
+                print(f"Fetch failed: {e}")
+        return now
+
+
+def serve(server, port):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            if parts.path not in ("/frame", "/rows"):
+                self.send_error(404)
+                return
+            query = parse_qs(parts.query)
+            try:
+                if parts.path == "/rows":
+                    body = server.rows_reply(min(int(query.get("count", ["3"])[0]), 255))
+                else:
+                    body = server.reply(int(query.get("session", ["0"])[0]), int(query.get("since", ["0"])[0]))
+            except ValueError:
+                self.send_error(400)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    httpd = ThreadingHTTPServer(("", port), Handler)
+    print(f"Serving frames on http://0.0.0.0:{port}/frame (session {server.history.session}) and rows on /rows")
+    httpd.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--port", type=int, default=8064)
+    parser.add_argument("--fixtures", action="store_true", help="replay the recorded fixtures instead of api-v3")
+    parser.add_argument("--stop", default="2706")
+    parser.add_argument("--routes", default="89,101")
+    parser.add_argument("--title", default="To School")
+    parser.add_argument("--background", default="Tbanner.bmp", help="BMP in the SPA board folder")
+    parser.add_argument("--interval", type=float, default=15, help="seconds between prediction fetches")
+    args = parser.parse_args()
+    feed = PredictionFeed(args.stop, args.routes, args.fixtures, os.environ.get("MBTA_API_KEY"))
+    serve(FrameServer(feed, ScheduleRenderer(args.title, args.background), args.interval), args.port)
+
+
+if __name__ == "__main__":
+    main()
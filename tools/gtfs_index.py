@@ -0,0 +1,208 @@
+"""
+Builds the board's offline schedule table from MBTA GTFS static data.
+
+Streams trips.txt, calendar.txt, calendar_dates.txt and stop_times.txt
+(from a folder or the MBTA_GTFS.zip itself) without loading them whole,
+keeps only the stops asked for, and writes a small binary table of
+scheduled departure minutes per (stop, route, direction, service days).
+Services are resolved for the week starting --date, exceptions included;
+the table is valid until a later date runs different services than its
+weekday did that week. Copy the output to the board as
+/sd/schedule.bin (or /schedule.bin); schedule_index.py reads it.
+
+Usage:
+    python tools/gtfs_index.py MBTA_GTFS.zip --stop 2706 --route 89 --route 101
+    python tools/gtfs_index.py gtfs_dir/ --stop place-wondl -o schedule.bin
+
+File layout (little-endian), see schedule_index.py for the reader:
+    header  '<4sBHII'  magic b'GTFI', version, entry count,
+                       valid_from, valid_to (YYYYMMDD)
+    entry   B stop_len, stop, B route_len, route, B direction,
+            B weekday mask (bit 0 = Monday),
+            I offset, H count                         (one per table)
+    data    sorted uint16 minutes after service-day midnight
+"""
+
+import argparse
+import csv
+import datetime
+import io
+import os
+import struct
+import zipfile
+
+MAGIC = b"GTFI"
+VERSION = 1
+HEADER = struct.Struct("<4sBHII")
+ENTRY_TAIL = struct.Struct("<BBIH")
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+
+class GtfsSource:
+    """Opens GTFS text files from a directory or a zip, one row at a time."""
+
+    def __init__(self, path):
+        self.path = path
+        self._zip = zipfile.ZipFile(path) if zipfile.is_zipfile(path) else None
+
+    def has(self, name):
+        """Whether the feed includes an (optional) GTFS file."""
+        if self._zip is not None:
+            return name in self._zip.namelist()
+        return os.path.exists(os.path.join(self.path, name))
+
+    def rows(self, name):
+        """Yields each row of a GTFS file as a dict, streaming from disk."""
+        if self._zip is not None:
+            raw = self._zip.open(name)
+            text = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+        else:
+            text = open(os.path.join(self.path, name), encoding="utf-8-sig", newline="")
+        with text:
+            yield from csv.DictReader(text)
+
+
+def minutes_of_day(hh_mm_ss):
+    """'25:10:00' -> 1510. GTFS times past midnight stay on the service day."""
+    hours, minutes, _ = hh_mm_ss.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def _yyyymmdd(date):
+    return int(date.strftime("%Y%m%d"))
+
+
+def service_calendar(source):
+    """Reads calendar.txt and calendar_dates.txt.
+
+    Returns ({service_id: (start, end, weekday mask)}, {YYYYMMDD: {service_id: exception_type}}).
+    """
+    weekly = {}
+    for row in source.rows("calendar.txt"):
+        mask = 0
+        for bit, name in enumerate(WEEKDAYS):
+            if row[name] == "1":
+                mask |= 1 << bit
+        weekly[row["service_id"]] = (int(row["start_date"]), int(row["end_date"]), mask)
+    exceptions = {}
+    if source.has("calendar_dates.txt"):
+        for row in source.rows("calendar_dates.txt"):
+            exceptions.setdefault(int(row["date"]), {})[row["service_id"]] = row["exception_type"]
+    return weekly, exceptions
+
+
+def services_on(date, weekly, exceptions):
+    """The service_ids running on a date: calendar.txt, then calendar_dates.txt added (1) or removed (2)."""
+    day = _yyyymmdd(date)
+    bit = 1 << date.weekday()
+    running = {service for service, (start, end, mask) in weekly.items()
+               if start <= day <= end and mask & bit}
+    for service, kind in exceptions.get(day, {}).items():
+        if kind == "1":
+            running.add(service)
+        elif kind == "2":
+            running.discard(service)
+    return frozenset(running)
+
+
+def active_weekdays(source, on_date):
+    """Maps service_id -> weekday bit mask (bit 0 = Monday) over the week starting on_date.
+
+    Services are resolved per date, calendar_dates.txt exceptions included,
+    so a service replaced for the week is not merged with its replacement.
+    The table stays valid for as long as every later date runs the same
+    services as its weekday did that week (the next holiday or timetable
+    change ends it).
+    """
+    weekly, exceptions = service_calendar(source)
+    week = {}
+    services = {}
+    for offset in range(7):
+        date = on_date + datetime.timedelta(days=offset)
+        week[date.weekday()] = running = services_on(date, weekly, exceptions)
+        for service in running:
+            services[service] = services.get(service, 0) | 1 << date.weekday()
+    last = max([end for _, end, _ in weekly.values()] + list(exceptions) + [_yyyymmdd(on_date)])
+    valid_to = on_date + datetime.timedelta(days=6)
+    while _yyyymmdd(valid_to) < last:
+        following = valid_to + datetime.timedelta(days=1)
+        if services_on(following, weekly, exceptions) != week[following.weekday()]:
+            break
+        valid_to = following
+    return services, _yyyymmdd(on_date), _yyyymmdd(valid_to)
+
+
+def build_tables(source, stops, routes, on_date):
+    """Returns ({(stop, route, direction, weekday mask): sorted minutes}, valid_from, valid_to)."""
+    services, valid_from, valid_to = active_weekdays(source, on_date)
+
+    trips = {}
+    for row in source.rows("trips.txt"):
+        if routes and row["route_id"] not in routes:
+            continue
+        mask = services.get(row["service_id"])
+        if mask:
+            trips[row["trip_id"]] = (row["route_id"], int(row["direction_id"] or 0), mask)
+
+    tables = {}
+    for row in source.rows("stop_times.txt"):
+        if row["stop_id"] not in stops:
+            continue
+        trip = trips.get(row["trip_id"])
+        if trip is None:
+            continue
+        route, direction, mask = trip
+        minute = minutes_of_day(row["departure_time"] or row["arrival_time"])
+        # Services running on the same resolved days share one table
+        tables.setdefault((row["stop_id"], route, direction, mask), []).append(minute)
+
+    for minutes in tables.values():
+        minutes.sort()
+    return tables, valid_from, valid_to
+
+
+def write_index(path, tables, valid_from, valid_to):
+    """Writes the binary table file. Returns its size in bytes."""
+    keys = sorted(tables)
+    directory = bytearray()
+    entry_sizes = 0
+    for stop, route, _, _ in keys:
+        entry_sizes += 2 + len(stop.encode()) + len(route.encode()) + ENTRY_TAIL.size
+    offset = HEADER.size + entry_sizes
+    for key in keys:
+        stop, route, direction, mask = key
+        for text in (stop, route):
+            encoded = text.encode()
+            directory.append(len(encoded))
+            directory.extend(encoded)
+        directory.extend(ENTRY_TAIL.pack(direction, mask, offset, len(tables[key])))
+        offset += 2 * len(tables[key])
+
+    with open(path, "wb") as out:
+        out.write(HEADER.pack(MAGIC, VERSION, len(keys), valid_from, valid_to))
+        out.write(directory)
+        for key in keys:
+            out.write(struct.pack("<%dH" % len(tables[key]), *tables[key]))
+        return out.tell()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("gtfs", help="MBTA_GTFS.zip or an unpacked GTFS folder")
+    parser.add_argument("--stop", action="append", required=True, help="stop_id to keep (repeatable)")
+    parser.add_argument("--route", action="append", default=[], help="route_id to keep (default all)")
+    parser.add_argument("--date", help="service date YYYY-MM-DD (default today)")
+    parser.add_argument("-o", "--output", default="schedule.bin")
+    args = parser.parse_args()
+
+    on_date = datetime.date.fromisoformat(args.date) if args.date else datetime.date.today()
+    source = GtfsSource(args.gtfs)
+    tables, valid_from, valid_to = build_tables(source, set(args.stop), set(args.route), on_date)
+    size = write_index(args.output, tables, valid_from, valid_to)
+    departures = sum(len(minutes) for minutes in tables.values())
+    print(f"{args.output}: {len(tables)} tables, {departures} departures, {size} bytes, "
+          f"valid {valid_from}-{valid_to}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+# hostpaths.py
+# Shared paths for the host-side tools, so every script finds the board
+# code and the recorded fixtures the same way.
+
+import os
+import sys
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TOOLS_DIR)
+DISPLAY_CODE_DIR = os.path.join(REPO_DIR, "display_code")
+SPA_DIR = os.path.join(DISPLAY_CODE_DIR, "10-8-2025", "SPA_Version")
+MOON_DIR = os.path.join(DISPLAY_CODE_DIR, "march 29 22", "bckp1 moon")
+FIXTURES_DIR = os.path.join(TOOLS_DIR, "fixtures")
+
+# Local wall-clock time the V3 fixtures were captured at (Y, M, D, h, m, s).
+# The boards read ISO times as local fields, so tools use the same clock.
+FIXTURE_CLOCK = (2025, 10, 30, 8, 5, 0)
+
+
+def fixture_path(name):
+    """Absolute path of a file in tools/fixtures."""
+    return os.path.join(FIXTURES_DIR, name)
+
+
+def read_fixture(name):
+    """Returns the raw bytes of a recorded fixture."""
+    with open(fixture_path(name), "rb") as fixture:
+        return fixture.read()
+
+
+def use_board_modules(board_dir=SPA_DIR):
+    """Puts a board folder first on sys.path so its helper modules import."""
+    if board_dir not in sys.path:
+        sys.path.insert(0, board_dir)
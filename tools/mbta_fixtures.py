@@ -0,0 +1,154 @@
+"""
+Serves MBTA API responses at any simulated time from recorded fixtures.
+
+The recorded full-stop response (every prediction for the stop over ~2.5
+hours) is replayed as a loop: at a given local time, predictions already
+gone are dropped and the rest answer the request's page[limit], include
+(route, alerts) and sparse-field options the way api-v3 would. Shared by the simulator,
+the benchmarks and the stand-in server.
+"""
+
+import calendar
+import json
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import hostpaths
+
+ISO_SUFFIX = "-04:00"  # Fixtures were recorded in EDT
+
+
+def iso_to_epoch(iso):
+    """Local ISO time -> epoch seconds, treating local time as UTC (as the boards do)."""
+    return calendar.timegm((int(iso[0:4]), int(iso[5:7]), int(iso[8:10]),
+                            int(iso[11:13]), int(iso[14:16]), int(iso[17:19]), 0, 0, 0))
+
+
+def epoch_to_iso(epoch):
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(epoch)) + ISO_SUFFIX
+
+
+def sparse(resource, query):
+    """Applies fields[<type>]=a,b to a resource's attributes (a copy when it changes)."""
+    fields = query.get(f"fields[{resource['type']}]", [None])[0]
+    if fields is None:
+        return resource
+    wanted = fields.split(",")
+    trimmed = dict(resource)
+    trimmed["attributes"] = {k: v for k, v in resource["attributes"].items() if k in wanted}
+    return trimmed
+
+
+def fixture_epoch():
+    """Epoch of hostpaths.FIXTURE_CLOCK on the same local-as-UTC scale."""
+    return calendar.timegm(hostpaths.FIXTURE_CLOCK + (0, 0, 0))
+
+
+class V3Fixture:
+    """Answers V3 /predictions requests from a recorded full-stop response."""
+
+    def __init__(self, name="v3_predictions_2706_all.json", alerts_name="v3_alerts_2706.json"):
+        doc = json.loads(hostpaths.read_fixture(name))
+        self.alerts = json.loads(hostpaths.read_fixture(alerts_name))["data"]
+        self.included = {item["id"]: item for item in doc.get("included", [])}
+        self.predictions = []
+        for prediction in doc["data"]:
+            attributes = prediction["attributes"]
+            epoch = iso_to_epoch(attributes["departure_time"] or attributes["arrival_time"])
+            self.predictions.append((epoch, prediction))
+        self.predictions.sort(key=lambda item: item[0])
+        first = fixture_epoch()
+        self.start = first
+        # Loop the recording: one period after the last departure it starts again
+        self.period = self.predictions[-1][0] - first + 300
+
+    def upcoming(self, now, count):
+        """(epoch, shift, prediction) for the next `count` departures at local time now."""
+        found = []
+        cycle = max(0, (now - self.start) // self.period)
+        while len(found) < count:
+            shift = cycle * self.period
+            for epoch, prediction in self.predictions:
+                if epoch + shift >= now - 30:
+                    found.append((epoch + shift, shift, prediction))
+                    if len(found) == count:
+                        break
+            cycle += 1
+        return found
+
+    def predictions_doc(self, url, now):
+        """The JSON document api-v3 would return for this URL at local time now."""
+        query = parse_qs(urlsplit(url).query)
+        limit = int(query.get("page[limit]", ["0"])[0] or 0) or len(self.predictions)
+        includes = query.get("include", [""])[0].split(",")
+        data = []
+        routes = []
+        for _, shift, prediction in self.upcoming(now, limit):
+            item = json.loads(json.dumps(prediction))
+            attributes = item["attributes"]
+            for key in ("arrival_time", "departure_time"):
+                if attributes.get(key):
+                    attributes[key] = epoch_to_iso(iso_to_epoch(attributes[key]) + shift)
+            item = sparse(item, query)
+            route_id = item["relationships"]["route"]["data"]["id"]
+            if route_id not in routes:
+                routes.append(route_id)
+            data.append(item)
+        doc = {"data": data}
+        included = []
+        if "route" in includes:
+            included += [sparse(self.included[r], query) for r in routes if r in self.included]
+        if "alerts" in includes:
+            # Alerts that inform on the returned predictions' routes at this stop
+            stops = query.get("filter[stop]", [""])[0]
+            alerts_url = f"/alerts?filter[route]={','.join(routes)}&filter[stop]={stops}"
+            included += [sparse(alert, query) for alert in self.alerts_doc(alerts_url, now)["data"]]
+        if included:
+            doc["included"] = included
+        doc["jsonapi"] = {"version": "1.0"}
+        return doc
+
+    def predictions_body(self, url, now):
+        return json.dumps(self.predictions_doc(url, now), separators=(",", ":")).encode()
+
+    def alerts_doc(self, url, now):
+        """/alerts at local time now, honouring filter[route] and filter[stop]."""
+        query = parse_qs(urlsplit(url).query)
+        routes = query.get("filter[route]", [""])[0].split(",")
+        stops = query.get("filter[stop]", [""])[0].split(",")
+        data = []
+        for alert in self.alerts:
+            attributes = alert["attributes"]
+            active = any(iso_to_epoch(period["start"]) <= now
+                         and (period["end"] is None or now < iso_to_epoch(period["end"]))
+                         for period in attributes["active_period"])
+            entities = attributes["informed_entity"]
+            if routes != [""] and not any(e.get("route") in routes for e in entities):
+                continue
+            if stops != [""] and not any(e.get("stop") in stops or "stop" not in e for e in entities):
+                continue
+            if active:
+                data.append(alert)
+        return {"data": data, "jsonapi": {"version": "1.0"}}
+
+    def alerts_body(self, url, now):
+        return json.dumps(self.alerts_doc(url, now), separators=(",", ":")).encode()
+
+    def finder_doc(self, now, count=10):
+        """The list www.mbta.com/schedules/finder_api/departures returns, from the same data."""
+        entries = []
+        for epoch, _, prediction in self.upcoming(now, count):
+            minutes = round((epoch - now) / 60)
+            if prediction["attributes"].get("status") == "Boarding" or minutes <= 0:
+                time_parts = ["arriving"]
+            else:
+                time_parts = [str(minutes), " ", "min"]
+            entries.append({
+                "realtime": {"prediction": {"time": time_parts, "seconds": epoch - now}},
+                "route": {"id": prediction["relationships"]["route"]["data"]["id"]},
+                "trip": {"id": prediction["relationships"]["trip"]["data"]["id"]},
+            })
+        return entries
+
+    def finder_body(self, now, count=10):
+        return json.dumps(self.finder_doc(now, count), separators=(",", ":")).encode()
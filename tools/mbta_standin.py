@@ -0,0 +1,310 @@
+"""
+A local stand-in for the MBTA endpoints the boards call, with latency and
+fault injection.
+
+    /predictions                          api-v3, from the recorded fixtures
+    /alerts                               api-v3, from the alerts fixture
+    /schedules/finder_api/departures      www.mbta.com finder_api
+
+Responses carry weak ETags (If-None-Match gets a 304), gzip when asked
+for, and api-v3's x-ratelimit-* headers with a per-client budget (20 a
+minute anonymous, 1000 with an x-api-key, like the real API); over budget
+answers 429. --shared-load spends part of the anonymous budget at an even
+rate, the way other boards behind the same router would. `Accept: text/event-stream` on /predictions streams reset and
+update events the way api-v3's streaming mode does.
+
+Every reply is priced in seconds: --latency per request, --tls on a new
+connection (after a 429/5xx/truncation the stand-in closes the connection,
+so the next request pays the handshake again) and body bytes over
+--bandwidth. Faults are scheduled in seconds since start:
+
+    429@120+30        rate-limit every request from t=120 s for 30 s
+    503@300+20        any 4xx/5xx status
+    truncate@400+15   send half the body, then drop the connection
+    stall@600+30:8    stop sending for 8 s after each quarter of the body
+    slow@500+60:4     multiply all delays by 4
+
+The same StandIn object answers the simulator in virtual time
+(tools/drive_standin.py) and real sockets here.
+
+Usage:
+    python tools/mbta_standin.py --port 8080 --latency 0.2 --fault 503@60+20
+    curl -s 'http://localhost:8080/predictions?filter[stop]=2706&page[limit]=3'
+"""
+
+import argparse
+import gzip
+import json
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from mbta_fixtures import V3Fixture, epoch_to_iso, fixture_epoch
+
+ANON_LIMIT = 20         # Requests per window without an API key
+KEYED_LIMIT = 1000      # ... and with one
+RATE_WINDOW = 60        # Seconds
+SSE_INTERVAL = 10.0     # Seconds between streamed update events
+
+
+class Fault:
+    """One scheduled fault window: kind ('429', '503', 'truncate', 'stall', 'slow')."""
+
+    def __init__(self, kind, start, duration, factor=1.0):
+        self.kind = kind
+        self.start = start
+        self.end = start + duration
+        self.factor = factor
+
+    def active(self, elapsed):
+        return self.start <= elapsed < self.end
+
+    def __repr__(self):
+        factor = f":{self.factor:g}" if self.kind in ("slow", "stall") else ""
+        return f"{self.kind}@{self.start:g}+{self.end - self.start:g}{factor}"
+
+
+def parse_fault(text):
+    """'503@300+20' -> Fault('503', 300, 20); 'slow@500+60:4' sets the factor (a stall's seconds)."""
+    kind, _, rest = text.partition("@")
+    rest, _, factor = rest.partition(":")
+    start, _, duration = rest.partition("+")
+    if kind not in ("truncate", "stall", "slow") and not kind.isdigit():
+        raise ValueError(f"Unknown fault kind: {kind}")
+    return Fault(kind, float(start), float(duration), float(factor or 1))
+
+
+class Reply:
+    """What the stand-in sends: status, headers, body and its cost in seconds."""
+
+    def __init__(self, status, headers, body, delay, truncate_at=None, stalls=()):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.delay = delay
+        self.truncate_at = truncate_at  # Bytes sent before the connection drops
+        self.stalls = stalls  # (bytes sent, seconds without sending) pauses, in body order
+
+    @property
+    def closes(self):
+        return self.headers.get("Connection") == "close"
+
+
+class StandIn:
+    """
+    Answers requests at a point in time given as seconds since start.
+    Keeps a log of (elapsed, path, status, delay, bytes) per request.
+    """
+
+    def __init__(self, fixture=None, latency=0.15, tls=0.0, bandwidth=None, faults=(),
+                 start_epoch=None, shared_load=0.0):
+        self.fixture = fixture or V3Fixture()
+        self.latency = latency
+        self.tls = tls
+        self.bandwidth = bandwidth  # Bytes per second, None for unlimited
+        self.faults = list(faults)
+        self.shared_load = shared_load  # Requests a minute other clients on our IP make
+        self.start_epoch = fixture_epoch() if start_epoch is None else start_epoch
+        self.log = []
+        self._windows = {}  # client -> [window start, requests in window]
+
+    def fault_at(self, elapsed, kind=None):
+        for fault in self.faults:
+            if fault.active(elapsed) and (kind is None or fault.kind == kind):
+                return fault
+        return None
+
+    def _budget(self, client, limit, elapsed, shared=False):
+        """Counts the request; returns (remaining, seconds until the window resets)."""
+        window = self._windows.setdefault(client, [elapsed, 0])
+        if elapsed - window[0] >= RATE_WINDOW:
+            window[0], window[1] = elapsed, 0
+        window[1] += 1
+        used = window[1]
+        if shared:
+            used += int(self.shared_load * (elapsed - window[0]) / RATE_WINDOW)
+        return limit - used, window[0] + RATE_WINDOW - elapsed
+
+    def _document(self, path, url, now):
+        if path.endswith("/predictions"):
+            return "application/vnd.api+json", self.fixture.predictions_body(url, now)
+        if path.endswith("/alerts"):
+            return "application/vnd.api+json", self.fixture.alerts_body(url, now)
+        if path.endswith("/finder_api/departures"):
+            return "application/json", self.fixture.finder_body(now)
+        return None, None
+
+    def respond(self, url, headers, elapsed, new_connection=True):
+        """The Reply for a GET of url (path and query) at elapsed seconds."""
+        headers = {key.lower(): value for key, value in headers.items()}
+        path = urlsplit(url).path
+        now = int(self.start_epoch + elapsed)
+        delay = self.latency + (self.tls if new_connection else 0.0)
+        slow = self.fault_at(elapsed, "slow")
+        if slow:
+            delay *= slow.factor
+
+        key = headers.get("x-api-key")
+        limit = KEYED_LIMIT if key else ANON_LIMIT
+        remaining, reset_in = self._budget(key or headers.get("x-client", "anon"), limit, elapsed,
+                                           shared=not key)
+        reply_headers = {
+            "x-ratelimit-limit": str(limit),
+            "x-ratelimit-remaining": str(max(remaining, 0)),
+            "x-ratelimit-reset": str(int(now + reset_in)),
+            "Date": time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(now)),
+        }
+
+        injected = self.fault_at(elapsed)
+        status = None
+        if injected is not None and injected.kind.isdigit():
+            status = int(injected.kind)
+        elif remaining < 0:
+            status = 429
+        if status is not None:
+            reply_headers["Connection"] = "close"
+            if status == 429:
+                reply_headers["Retry-After"] = str(max(1, int(reset_in)))
+            body = json.dumps({"errors": [{"status": str(status)}]}).encode()
+            return self._finish(path, status, reply_headers, body, delay, elapsed)
+
+        content_type, body = self._document(path, url, now)
+        if body is None:
+            return self._finish(path, 404, reply_headers, b'{"errors":[{"status":"404"}]}', delay, elapsed)
+        etag = 'W/"%08x"' % (zlib.crc32(body) & 0xFFFFFFFF)
+        reply_headers["ETag"] = etag
+        reply_headers["Content-Type"] = content_type
+        if headers.get("if-none-match") == etag:
+            return self._finish(path, 304, reply_headers, b"", delay, elapsed)
+        if "gzip" in headers.get("accept-encoding", ""):
+            body = gzip.compress(body)
+            reply_headers["Content-Encoding"] = "gzip"
+        truncate_at = None
+        if self.fault_at(elapsed, "truncate"):
+            truncate_at = len(body) // 2
+            reply_headers["Connection"] = "close"
+        stalls = ()
+        stall = self.fault_at(elapsed, "stall")
+        if stall:
+            stalls = tuple((len(body) * quarter // 4, stall.factor) for quarter in (1, 2, 3))
+        return self._finish(path, 200, reply_headers, body, delay, elapsed, truncate_at, stalls)
+
+    def _finish(self, path, status, headers, body, delay, elapsed, truncate_at=None, stalls=()):
+        headers["Content-Length"] = str(len(body))
+        sent = len(body) if truncate_at is None else truncate_at
+        if self.bandwidth:
+            delay += sent / self.bandwidth
+        self.log.append((elapsed, path, status, delay, sent))
+        return Reply(status, headers, body, delay, truncate_at, stalls)
+
+    def sse_events(self, url, elapsed):
+        """(seconds to wait, event text) pairs for a streamed /predictions request."""
+        now = int(self.start_epoch + elapsed)
+        doc = self.fixture.predictions_doc(url, now)
+        yield 0.0, "event: reset\ndata: " + json.dumps(doc["data"], separators=(",", ":")) + "\n\n"
+        while True:
+            elapsed += SSE_INTERVAL
+            now = int(self.start_epoch + elapsed)
+            wait = SSE_INTERVAL
+            for item in self.fixture.predictions_doc(url, now)["data"]:
+                yield wait, "event: update\ndata: " + json.dumps(item, separators=(",", ":")) + "\n\n"
+                wait = 0.0
+            if wait:
+                yield wait, ": keep-alive " + epoch_to_iso(now) + "\n\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, so the TLS delay is per connection
+    standin = None
+    started = 0.0
+
+    def setup(self):
+        super().setup()
+        self._new_connection = True
+
+    def log_message(self, format, *args):
+        pass  # The stand-in keeps its own log
+
+    def do_GET(self):
+        elapsed = time.monotonic() - self.started
+        if "text/event-stream" in self.headers.get("Accept", "") and "/predictions" in self.path:
+            return self._stream(elapsed)
+        headers = dict(self.headers.items())
+        headers.setdefault("x-client", self.client_address[0])
+        reply = self.standin.respond(self.path, headers, elapsed, self._new_connection)
+        self._new_connection = False
+        body = reply.body if reply.truncate_at is None else reply.body[:reply.truncate_at]
+        self._pace(reply.delay, len(body))
+        self.send_response_only(reply.status)
+        for key, value in reply.headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self._send_body(body, reply.stalls)
+        if reply.closes:
+            self.close_connection = True
+
+    def _pace(self, delay, size):
+        """Sleeps the part of the delay that is not spent sending the body."""
+        transfer = size / self.standin.bandwidth if self.standin.bandwidth else 0.0
+        time.sleep(max(0.0, delay - transfer))
+
+    def _send_body(self, body, stalls=()):
+        bandwidth = self.standin.bandwidth
+        step = max(1, int(bandwidth / 20)) if bandwidth else len(body) or 1
+        pauses = list(stalls)
+        start = 0
+        while start < len(body):
+            end = min(start + step, len(body), pauses[0][0] if pauses else len(body))
+            self.wfile.write(body[start:end])
+            self.wfile.flush()
+            if bandwidth:
+                time.sleep((end - start) / bandwidth)
+            while pauses and pauses[0][0] <= end:
+                time.sleep(pauses.pop(0)[1])
+            start = end
+
+    def _stream(self, elapsed):
+        self.send_response_only(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        try:
+            for wait, event in self.standin.sse_events(self.path, elapsed):
+                time.sleep(wait)
+                self.wfile.write(event.encode())
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.15, help="Seconds per request")
+    parser.add_argument("--tls", type=float, default=0.0, help="Extra seconds on a new connection")
+    parser.add_argument("--bandwidth", type=float, help="Body bytes per second")
+    parser.add_argument("--fault", type=parse_fault, action="append", default=[],
+                        help="KIND@START+SECONDS, e.g. 429@120+30, truncate@400+15, slow@500+60:4")
+    parser.add_argument("--shared-load", type=float, default=0.0,
+                        help="Requests a minute other boards on the same IP spend of the anonymous budget")
+    args = parser.parse_args()
+
+    _Handler.standin = StandIn(latency=args.latency, tls=args.tls, bandwidth=args.bandwidth,
+                               faults=args.fault, shared_load=args.shared_load)
+    _Handler.started = time.monotonic()
+    server = ThreadingHTTPServer((args.host, args.port), _Handler)
+    print(f"MBTA stand-in on http://{args.host}:{args.port} (faults: {args.fault or 'none'})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
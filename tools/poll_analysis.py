@@ -0,0 +1,357 @@
+"""
+Works out how often the SPA board needs to poll, from recorded traffic.
+
+Reads the board's raw traffic logs (TRAFFIC_LOG_DIR, see traffic_log.py)
+and keeps the V3 /predictions replies for one stop as NumPy arrays: reply
+times, and each reply's predictions as route, epoch and status columns.
+What the board shows at any moment is then a pure function of (the reply
+it last fetched, the time now): the first three rows per page, evicted
+and counted down the way the board does it between fetches. From that,
+for every candidate interval and a few poll phases at once:
+
+    changes   polls per hour at which a shown row actually changed
+    stale     share of the time a shown row differs from what the newest
+              reply would show (the cost of polling less often)
+    requests  per hour (3600 / interval)
+
+per page ("*" for every route, then each route alone) and per local hour.
+For each page and hour it picks the longest interval whose stale share is
+under --target and writes them to a poll schedule (poll_schedule.py's
+format) for the board's /poll_schedule.bin; hours with under --min-minutes
+of recording are left to UPDATE_DELAY.
+
+Intervals can only be judged down to the recording's own gap, so record
+with a short UPDATE_DELAY (5 s) and a FETCH_ROWS deep enough for each
+route to have its own three rows. --synthesise writes a day of made-up
+traffic in the same format to try the tool on.
+
+Usage: python tools/poll_analysis.py DIR [--stop 2706] [--target 0.05]
+       [--intervals 10,15,20,30,45,60,90,120,180,240] [--write poll_schedule.bin]
+       python tools/poll_analysis.py DIR --synthesise [--hours 18]
+"""
+
+import argparse
+import gzip
+import json
+import random
+import struct
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+import hostpaths
+import simulator  # noqa: F401  (microcontroller and rtc stand-ins for the board modules)
+from mbta_fixtures import epoch_to_iso, fixture_epoch, iso_to_epoch
+
+hostpaths.use_board_modules()
+import poll_schedule  # noqa: E402  (board modules)
+import traffic_log  # noqa: E402
+
+ROWS = 3
+GRACE = 60            # PredictionStore.evict's grace
+NO_TIME = 0
+MISSING = -1          # Epoch of a padding slot
+BOARDING = ("BOARDING", "BRDNG", "ARRIVING")
+EMPTY, SHOWN_BOARDING, SHOWN_STATUS, SHOWN_TIME = 0, 1, 2, 3
+PHASES = 8            # Most poll phases averaged per interval (on the recording's own grid)
+
+
+class Recording:
+    """One stop's recorded replies: times (n) and predictions (n, width) as code columns."""
+
+    def __init__(self, times, routes, epochs, statuses, route_names, status_names):
+        self.times = times
+        self.routes = routes
+        self.epochs = epochs
+        self.statuses = statuses
+        self.route_names = route_names
+        self.status_names = status_names
+        upper = [str(name or "").upper() for name in status_names]
+        self.boarding_codes = [code for code, name in enumerate(upper) if name in BOARDING]
+
+    def __len__(self):
+        return len(self.times)
+
+    def gap(self):
+        """Typical seconds between replies."""
+        return float(np.median(np.diff(self.times))) if len(self.times) > 1 else 0.0
+
+
+def read_logs(directory, files, stop=None):
+    """Recording of the V3 /predictions replies for `stop` (default: the stop most logged)."""
+    replies = []
+    for record in traffic_log.LogReader(traffic_log.log_files(directory, files)):
+        if (record.kind != traffic_log.RESPONSE_RECORD or record.status != 200
+                or record.end != traffic_log.END_COMPLETE or "/predictions" not in (record.url or "")):
+            continue
+        record_stop = parse_qs(urlsplit(record.url).query).get("filter[stop]", [None])[0]
+        body = b"".join(traffic_log.body_chunks(record))
+        if record.headers.get("content-encoding") == "gzip":
+            body = gzip.decompress(body)
+        try:
+            data = json.loads(body).get("data", [])
+        except ValueError:
+            continue
+        replies.append((record_stop, record.wall, data))
+    if not replies:
+        raise SystemExit(f"No complete /predictions replies in {directory}")
+    if stop is None:
+        stops = [reply[0] for reply in replies]
+        stop = max(set(stops), key=stops.count)
+    replies = [(wall, data) for reply_stop, wall, data in replies if reply_stop == stop]
+    replies.sort(key=lambda reply: reply[0])
+
+    width = max(len(data) for _, data in replies) or 1
+    count = len(replies)
+    times = np.empty(count, dtype=np.int64)
+    routes = np.zeros((count, width), dtype=np.int32)
+    epochs = np.full((count, width), MISSING, dtype=np.int64)
+    statuses = np.zeros((count, width), dtype=np.int32)
+    route_names, status_names = [], [None]
+    for i, (wall, data) in enumerate(replies):
+        times[i] = wall
+        for k, prediction in enumerate(data):
+            attributes = prediction.get("attributes") or {}
+            route = (((prediction.get("relationships") or {}).get("route") or {}).get("data") or {}).get("id")
+            raw = attributes.get("departure_time") or attributes.get("arrival_time")
+            status = attributes.get("status")
+            if route not in route_names:
+                route_names.append(route)
+            if status not in status_names:
+                status_names.append(status)
+            routes[i, k] = route_names.index(route)
+            epochs[i, k] = iso_to_epoch(raw) if raw else NO_TIME
+            statuses[i, k] = status_names.index(status)
+    return stop, Recording(times, routes, epochs, statuses, route_names, status_names)
+
+
+def shown(recording, replies, at, route=None):
+    """
+    (len(at), ROWS) codes of the rows a page for `route` (None: every route)
+    shows at times `at` when its last fetch was reply `replies`. Equal codes
+    mean equal text: boarding, a status, or route and rounded minutes.
+    """
+    epochs = recording.epochs[replies]
+    routes = recording.routes[replies]
+    statuses = recording.statuses[replies]
+    now = at[:, None]
+    keep = (epochs != MISSING) & ((epochs == NO_TIME) | (epochs > now - GRACE))
+    if route is not None:
+        keep &= routes == route
+    # The first ROWS kept slots of each reply, in reply order (replies are sorted by time)
+    first = np.argsort(~keep, axis=1, kind="stable")[:, :ROWS]
+    valid = np.take_along_axis(keep, first, axis=1)
+    epochs = np.take_along_axis(epochs, first, axis=1)
+    routes = np.take_along_axis(routes, first, axis=1)
+    statuses = np.take_along_axis(statuses, first, axis=1)
+
+    boarding = np.isin(statuses, recording.boarding_codes)
+    status_only = ~boarding & (epochs == NO_TIME)
+    minutes = np.maximum(np.rint((epochs - now) / 60), 0).astype(np.int64)
+    kind = np.where(boarding, SHOWN_BOARDING, np.where(status_only, SHOWN_STATUS, SHOWN_TIME))
+    value = np.where(status_only, statuses, np.where(boarding, 0, ((routes + 1) << 16) | minutes))
+    codes = (kind.astype(np.int64) << 40) | value
+    codes[~valid] = EMPTY
+    if codes.shape[1] < ROWS:
+        codes = np.pad(codes, ((0, 0), (0, ROWS - codes.shape[1])))
+    return codes
+
+
+def evaluate(recording, interval, route=None, max_gap=None):
+    """
+    (stale seconds per hour of day, recorded seconds per hour of day,
+    changed polls) for polling every `interval` seconds, averaged over up
+    to PHASES poll phases that fall on replies, as a real board's polls
+    would land anywhere between them.
+    """
+    times = recording.times
+    truth = shown(recording, np.arange(len(times)), times, route)
+    # Each recorded moment is weighted by the gap to the next reply (outages capped)
+    weights = np.diff(times, append=times[-1] + int(recording.gap()))
+    if max_gap is not None:
+        weights = np.minimum(weights, max_gap)
+    hours = (times // 3600) % 24
+    stale = np.zeros(24)
+    covered = np.zeros(24)
+    changed = 0
+    start = times[0]
+    gap = recording.gap() or interval
+    phases = np.unique(np.round(np.arange(PHASES) * interval / PHASES / gap) * gap)
+    for phase in phases:
+        # The board's last poll at or before each moment, and the newest reply it could have had
+        last_poll = start + phase + np.floor((times - start - phase) / interval) * interval
+        used = np.maximum(np.searchsorted(times, last_poll, side="right") - 1, 0)
+        wrong = (shown(recording, used, times, route) != truth).any(axis=1)
+        stale += np.bincount(hours, weights * wrong, minlength=24)
+        covered += np.bincount(hours, weights, minlength=24)
+
+        polls = start + phase + np.arange(int((times[-1] - start - phase) // interval) + 1) * interval
+        fetched = np.maximum(np.searchsorted(times, polls, side="right") - 1, 0)
+        if len(polls) > 1:
+            before = shown(recording, fetched[:-1], polls[1:], route)
+            after = shown(recording, fetched[1:], polls[1:], route)
+            changed += int((before != after).any(axis=1).sum())
+    return stale / len(phases), covered / len(phases), changed / len(phases)
+
+
+def recommend(recording, intervals, target, min_minutes, route=None):
+    """({interval: (changes/h, stale share)}, 24 seconds per hour or 0 where there is too little data)."""
+    max_gap = max(4 * recording.gap(), 60)
+    report = {}
+    shares = []
+    covered = None
+    for interval in intervals:
+        stale, covered, changed = evaluate(recording, interval, route, max_gap)
+        hours_recorded = covered.sum() / 3600
+        report[interval] = (changed / hours_recorded if hours_recorded else 0.0,
+                            stale.sum() / covered.sum() if covered.sum() else 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            shares.append(np.where(covered > 0, stale / covered, np.inf))
+    shares = np.array(shares)                        # (intervals, 24)
+    ok = shares <= target
+    candidates = np.array(intervals)
+    # Longest interval under the target; the shortest if none is
+    best = np.where(ok.any(axis=0), candidates[len(candidates) - 1 - np.argmax(ok[::-1], axis=0)], candidates[0])
+    enough = covered >= min_minutes * 60
+    return report, np.where(enough, best, 0).astype(np.int64)
+
+
+def write_schedule(path, tables, target):
+    """tables: [(route, 24 seconds)], written in poll_schedule.py's layout."""
+    with open(path, "wb") as out:
+        out.write(struct.pack(poll_schedule._HEADER, poll_schedule.MAGIC, 1, len(tables), round(target * 1000)))
+        for route, seconds in tables:
+            name = route.encode()
+            out.write(bytes((len(name),)) + name + bytes(int(min(s, 255)) for s in seconds))
+
+
+# --- Made-up traffic, to try the tool without a field capture ---
+
+class _Clock:
+    """Stands in for the time module inside traffic_log while synthesising."""
+
+    def __init__(self, epoch):
+        self.epoch = epoch
+        self.mono = 0.0
+
+    def monotonic(self):
+        return self.mono
+
+    def time(self):
+        return self.epoch + int(self.mono)
+
+
+class _Reply:
+    status_code = 200
+
+    def __init__(self, body, date):
+        self._body = gzip.compress(body)
+        self.headers = {"content-type": "application/vnd.api+json", "content-encoding": "gzip", "date": date}
+
+    def iter_content(self, chunk_size=256):
+        for start in range(0, len(self._body), chunk_size):
+            yield self._body[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+
+def synthesise(directory, hours, every=5, seed=89):
+    """Writes `hours` of 5 s polls for stop 2706 (routes 89 and 101) starting 05:00 on the fixture day."""
+    rng = random.Random(seed)
+    day = fixture_epoch() - fixture_epoch() % 86400
+    clock = _Clock(day + 5 * 3600)
+    traffic_log.time = clock
+    trips = []  # [route, scheduled epoch, delay seconds]
+    for route, peak, off_peak in (("89", 600, 1200), ("101", 900, 1800)):
+        at = clock.epoch - 1800
+        while at < clock.epoch + hours * 3600 + 3600:
+            trips.append([route, at, rng.randint(-60, 180)])
+            local_hour = (at // 3600) % 24
+            at += peak if local_hour in (7, 8, 16, 17, 18) else off_peak
+    recorder = traffic_log.TrafficRecorder(None, directory, files=1, max_bytes=1 << 30, buffer_size=1 << 16)
+    url = ("https://api-v3.mbta.com/predictions?filter[stop]=2706&filter[route]=89,101"
+           "&sort=departure_time&page[limit]=10")
+    for step in range(int(hours * 3600 / every)):
+        clock.mono = step * every
+        now = clock.time()
+        local_hour = (now // 3600) % 24
+        busy = local_hour in (7, 8, 16, 17, 18)
+        for trip in trips:
+            # Delays drift more in the rush, and mostly as the bus gets close
+            if trip[1] + trip[2] > now and rng.random() < (0.006 if busy else 0.0008) * every / 5:
+                trip[2] += rng.randint(-45, 90) if trip[1] + trip[2] - now < 1800 else rng.randint(-20, 20)
+        data = []
+        for route, scheduled, delay in sorted(trips, key=lambda trip: trip[1] + trip[2]):
+            departure = scheduled + delay
+            if now - 30 < departure < now + 3600 and len(data) < 10:
+                status = "Boarding" if departure - now < 40 else None
+                data.append({"type": "prediction", "attributes": {
+                    "arrival_time": epoch_to_iso(departure), "departure_time": epoch_to_iso(departure),
+                    "status": status}, "relationships": {"route": {"data": {"id": route, "type": "route"}}}})
+        recorder.network = _Network(_Reply(json.dumps({"data": data}).encode(), str(now)))
+        response = recorder.fetch(url)
+        for _ in response.iter_content(256):
+            pass
+        response.close()
+    recorder.poll()
+    print(f"Wrote {recorder.records} synthesised replies ({recorder.written} bytes) to {directory}")
+
+
+class _Network:
+    def __init__(self, reply):
+        self.reply = reply
+
+    def fetch(self, url, *, headers=None, timeout=10):
+        return self.reply
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("directory", help="folder holding the board's traffic logs")
+    parser.add_argument("--files", type=int, default=4, help="TRAFFIC_LOG_FILES on the board")
+    parser.add_argument("--stop", help="stop to analyse (default: the one most logged)")
+    parser.add_argument("--target", type=float, default=0.05, help="stale share to stay under")
+    parser.add_argument("--intervals", default="10,15,20,30,45,60,90,120,180,240")
+    parser.add_argument("--min-minutes", type=float, default=20, help="recording an hour needs for advice")
+    parser.add_argument("--write", help="write the poll schedule here")
+    parser.add_argument("--synthesise", action="store_true", help="write made-up traffic to DIR instead")
+    parser.add_argument("--hours", type=float, default=18)
+    args = parser.parse_args()
+
+    if args.synthesise:
+        synthesise(args.directory, args.hours)
+        return
+
+    stop, recording = read_logs(args.directory, args.files, args.stop)
+    hours = (recording.times // 3600) % 24
+    recorded = np.bincount(hours, np.diff(recording.times, append=recording.times[-1]), minlength=24)
+    gap = recording.gap()
+    intervals = [i for i in map(int, args.intervals.split(",")) if i >= gap]
+    print(f"stop {stop}: {len(recording)} replies, one every {gap:.0f} s, "
+          f"{(recording.times[-1] - recording.times[0]) / 3600:.1f} h recorded")
+    if not intervals:
+        raise SystemExit("The recording is coarser than every candidate interval")
+
+    pages = [(poll_schedule.ALL_ROUTES, None)] + [(name, code) for code, name in enumerate(recording.route_names)]
+    tables = []
+    for name, route in pages:
+        report, seconds = recommend(recording, intervals, args.target, args.min_minutes, route)
+        print(f"\npage {name}")
+        print(f"  {'interval':>8} {'requests/h':>10} {'changes/h':>10} {'stale':>7}")
+        for interval, (changes, share) in report.items():
+            print(f"  {interval:7d}s {3600 / interval:10.0f} {changes:10.1f} {share * 100:6.2f}%")
+        advice = " ".join(f"{hour:02d}h:{s}" for hour, s in enumerate(seconds) if s)
+        print(f"  advice at {args.target * 100:g}% stale: {advice or 'none (too little recording)'}")
+        if advice:
+            advised = np.where(seconds > 0, recorded / np.maximum(seconds, 1), 0).sum()
+            fixed = recorded[seconds > 0].sum() / 15
+            print(f"  requests over the advised hours: {advised:.0f} (every 15 s: {fixed:.0f})")
+        tables.append((name, seconds))
+    if args.write:
+        write_schedule(args.write, tables, args.target)
+        print(f"\nWrote {args.write}; copy it to the board as /poll_schedule.bin")
+
+
+if __name__ == "__main__":
+    main()
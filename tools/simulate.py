@@ -0,0 +1,103 @@
+"""
+Runs a board's code.py headless on the host for N simulated minutes.
+
+The board sees stand-in CircuitPython modules (tools/simulator/stubs), a
+virtual clock starting at the fixture capture time and the recorded MBTA
+responses in place of Wi-Fi. The 64x32 panel renders into a framebuffer
+that is captured every --frame-every seconds.
+
+Usage:
+    python tools/simulate.py --minutes 10
+    python tools/simulate.py --frames out/frames            # write PNGs
+    python tools/simulate.py --golden tools/golden --update-golden
+    python tools/simulate.py --golden tools/golden          # exit 1 on any diff
+    python tools/simulate.py --heap 20000:4096              # force a low tier
+    python tools/simulate.py --press up@30 --profile        # mode switch, hot paths
+    python tools/simulate.py --press up@60 --press up@150 --latency 3  # switch latency
+    python tools/simulate.py --set TRAFFIC_LOG_DIR=/tmp/log # settings.toml entries
+    python tools/simulate.py --set METRICS_PORT=9100 --scrape 60 --scrape 200  # GET /metrics
+"""
+
+import argparse
+import cProfile
+import os
+import sys
+
+import hostpaths
+from simulator.backend import FixtureBackend
+from simulator.harness import Simulation, print_profile
+
+
+def parse_heap(text):
+    free, _, block = text.partition(":")
+    return int(free), int(block or free)
+
+
+def parse_press(text):
+    pin, _, second = text.rpartition("@")
+    return "BUTTON_" + (pin or "up").upper(), float(second)
+
+
+def parse_setting(text):
+    key, _, value = text.partition("=")
+    return key, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--board", default=hostpaths.SPA_DIR, help="Board folder containing code.py")
+    parser.add_argument("--minutes", type=float, default=5.0, help="Simulated minutes to run")
+    parser.add_argument("--frame-every", type=float, default=15.0, help="Seconds between captured frames")
+    parser.add_argument("--frames", help="Write captured frames here as PNGs")
+    parser.add_argument("--scale", type=int, default=8, help="Pixel size of written PNGs")
+    parser.add_argument("--golden", help="Compare captured frames with the PNGs in this folder")
+    parser.add_argument("--update-golden", action="store_true", help="Rewrite --golden instead of comparing")
+    parser.add_argument("--heap", type=parse_heap, help="FREE:BLOCK bytes memory_guard should see")
+    parser.add_argument("--press", type=parse_press, action="append", default=[],
+                        help="Press a button at a simulated second, e.g. up@30 or down@45")
+    parser.add_argument("--latency", type=float, default=0.3, help="Seconds each request takes")
+    parser.add_argument("--fail", action="append", default=[], help="Answer 503 to URLs containing this")
+    parser.add_argument("--profile", action="store_true", help="Profile the board code with cProfile")
+    parser.add_argument("--profile-sort", default="cumulative", help="pstats sort key")
+    parser.add_argument("--quiet", action="store_true", help="Hide the board's own print output")
+    parser.add_argument("--set", type=parse_setting, action="append", default=[], metavar="KEY=VALUE",
+                        help="A settings.toml entry the board reads with os.getenv")
+    parser.add_argument("--scrape", type=float, action="append", default=[], metavar="SECOND",
+                        help="GET /metrics from the board at a simulated second (needs METRICS_PORT)")
+    args = parser.parse_args()
+
+    simulation = Simulation(
+        board_dir=args.board, minutes=args.minutes, frame_every=args.frame_every,
+        backend=FixtureBackend(fail_urls=args.fail), heap=args.heap, presses=args.press,
+        network_latency=args.latency, quiet=args.quiet, settings=dict(args.set),
+        scrapes=args.scrape,
+    )
+    profile = cProfile.Profile() if args.profile else None
+    simulation.run(profile)
+
+    print()
+    for line in simulation.summary():
+        print(line)
+    if profile is not None:
+        print()
+        print_profile(profile, sort=args.profile_sort)
+    if args.frames:
+        paths = simulation.save_frames(args.frames, args.scale)
+        print(f"Wrote {len(paths)} frames to {args.frames}")
+    if args.golden:
+        if args.update_golden:
+            simulation.save_frames(args.golden, args.scale)
+            print(f"Updated golden frames in {args.golden}")
+        else:
+            mismatches = simulation.compare_frames(args.golden, args.scale)
+            if mismatches:
+                print(f"{len(mismatches)} frames differ from {args.golden}:")
+                for name in mismatches:
+                    print("  " + name)
+                return 1
+            print(f"All {len(simulation.frames)} frames match {os.path.basename(args.golden)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,9 @@
+"""
+Headless simulator for the board code.
+
+Runs a board's code.py unchanged under CPython, with stand-in CircuitPython
+modules from stubs/, a virtual clock, recorded MBTA responses for the
+network and a NumPy framebuffer for the 64x32 panel. See tools/simulate.py.
+"""
+
+from simulator.harness import Simulation  # noqa: F401
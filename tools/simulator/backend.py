@@ -0,0 +1,44 @@
+"""
+Network backends for the simulator: callables (url, headers) that return
+(status, headers, body bytes), installed as simstate.backend.
+"""
+
+import gzip
+import time
+
+import simstate
+from mbta_fixtures import V3Fixture
+
+
+class FixtureBackend:
+    """Answers V3 predictions, finder_api and time requests from fixtures."""
+
+    def __init__(self, fixture=None, fail_urls=()):
+        self.fixture = fixture or V3Fixture()
+        self.fail_urls = tuple(fail_urls)  # Substrings of URLs that answer 503
+        self.bytes_sent = 0
+
+    def __call__(self, url, headers):
+        now = simstate.clock.time()
+        for pattern in self.fail_urls:
+            if pattern in url:
+                return self._reply(503, "text/plain", b"Service Unavailable", headers)
+        if "api-v3.mbta.com/predictions" in url:
+            return self._reply(200, "application/vnd.api+json",
+                               self.fixture.predictions_body(url, now), headers)
+        if "finder_api/departures" in url:
+            return self._reply(200, "application/json", self.fixture.finder_body(now), headers)
+        if "io.adafruit.com" in url:
+            return self._reply(200, "text/plain", str(now).encode(), headers)
+        return self._reply(404, "text/plain", b"Not Found", headers)
+
+    def _reply(self, status, content_type, body, headers):
+        reply_headers = {"Content-Type": content_type,
+                         "Date": time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(simstate.clock.time()))}
+        accept = {key.lower(): value for key, value in headers.items()}.get("accept-encoding", "")
+        if status == 200 and "gzip" in accept:
+            body = gzip.compress(body)
+            reply_headers["Content-Encoding"] = "gzip"
+        reply_headers["Content-Length"] = str(len(body))
+        self.bytes_sent += len(body)
+        return status, reply_headers, body
@@ -0,0 +1,397 @@
+"""
+Runs a board's code.py on the host against the stand-in modules in stubs/.
+
+The harness owns everything a real board gets from its hardware: the
+clock (time.monotonic/time/sleep/localtime are patched onto a
+VirtualClock), the filesystem root ("/fonts/..." opens inside the board
+folder), the network (simstate.backend) and the heap figures memory_guard
+sees. It restores all of it when the run ends.
+"""
+
+import ast
+import builtins
+import contextlib
+import gc
+import io
+import os
+import pstats
+import runpy
+import sys
+import time
+
+import hostpaths
+
+STUBS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stubs")
+if STUBS_DIR not in sys.path:
+    sys.path.insert(0, STUBS_DIR)
+
+import framebuffer  # noqa: E402
+import simstate  # noqa: E402
+from simulator.backend import FixtureBackend  # noqa: E402
+from mbta_fixtures import fixture_epoch  # noqa: E402
+
+PRESS_SECONDS = 0.3  # How long a scheduled button press holds the button down
+TIME_URL = "/api/v2/time"  # get_local_time()'s request; not data the screen shows
+REBOOT_SECONDS = 3.0  # Reset to code.py running again (boot, Wi-Fi join)
+
+
+class _TimestampedOutput(io.TextIOBase):
+    """Prefixes each line the board prints with the simulated time."""
+
+    def __init__(self, target, clock):
+        self._target = target
+        self._clock = clock
+        self._at_line_start = True
+
+    def write(self, text):
+        for piece in text.splitlines(True):
+            if self._at_line_start:
+                self._target.write(f"[{self._clock.mono:9.2f}] ")
+            self._target.write(piece)
+            self._at_line_start = piece.endswith("\n")
+        return len(text)
+
+    def flush(self):
+        self._target.flush()
+
+
+class Simulation:
+    """
+    One simulated run of a board folder's code.py.
+
+    minutes: simulated run length. frame_every: seconds between captured
+    frames (taken at the board's loop sleeps). heap: (mem_free, largest
+    block) to report to memory_guard, or None for no heap limits. presses:
+    list of (pin name, start second) button presses. settings: what the
+    board's settings.toml would hold, returned by os.getenv. scrapes:
+    seconds at which a client GETs /metrics from the board's ESP32.
+    """
+
+    def __init__(self, board_dir=hostpaths.SPA_DIR, minutes=5.0, start_epoch=None,
+                 backend=None, frame_every=15.0, heap=None, presses=(),
+                 network_latency=0.3, reset_on_crash=True, quiet=False, settings=None,
+                 scrapes=()):
+        self.board_dir = os.path.abspath(board_dir)
+        self.code_path = os.path.join(self.board_dir, "code.py")
+        self.duration = minutes * 60
+        self.start_epoch = fixture_epoch() if start_epoch is None else start_epoch
+        self.backend = backend or FixtureBackend()
+        self.frame_every = frame_every
+        self.heap = heap
+        self.presses = presses
+        self.network_latency = network_latency
+        self.reset_on_crash = reset_on_crash
+        self.quiet = quiet
+        self.settings = dict(settings or {})
+        self.scrapes = sorted(scrapes)
+        self.frames = []  # (simulated second, RGB array)
+        self.switches = []  # (press second, new screen after, loop free after, data age) per press
+        self.boots = 0
+        self.crash = None
+        self.wall_seconds = 0.0
+        self._next_frame = 0.0
+        self._pending_presses = []
+        self._saved = {}
+
+    # --- Patching ---
+    def _board_path(self, path):
+        """
+        Maps a board-absolute path ("/fonts/x.bdf") into the board folder,
+        and matches names case-insensitively like the board's FAT drive.
+        """
+        if not isinstance(path, str):
+            return path
+        if path.startswith("/"):
+            first = path.lstrip("/").split("/", 1)[0]
+            if not first or os.path.exists("/" + first):
+                return path
+            path = os.path.join(self.board_dir, path.lstrip("/"))
+        if not os.path.exists(path):
+            folder, name = os.path.split(path)
+            try:
+                for entry in os.listdir(folder or "."):
+                    if entry.lower() == name.lower():
+                        return os.path.join(folder, entry)
+            except OSError:
+                pass
+        return path
+
+    def _install(self):
+        clock = simstate.clock
+        real_open = builtins.open
+        real_localtime = time.localtime
+
+        def board_open(file, *args, **kwargs):
+            return real_open(self._board_path(file), *args, **kwargs)
+
+        def sleep(seconds):
+            self._note_switches()
+            clock.sleep(seconds)
+            self._maybe_capture()
+
+        def localtime(seconds=None):
+            return real_localtime(clock.time() if seconds is None else seconds)
+
+        def getenv(key, default=None):
+            # CircuitPython's os.getenv reads settings.toml, not the host environment
+            return self.settings.get(key, default)
+
+        self._saved = {
+            "open": builtins.open, "monotonic": time.monotonic, "time": time.time,
+            "monotonic_ns": time.monotonic_ns,
+            "sleep": time.sleep, "localtime": time.localtime, "cwd": os.getcwd(),
+            "getenv": os.getenv,
+            "path": list(sys.path), "modules": set(sys.modules), "stdout": sys.stdout,
+            "TZ": os.environ.get("TZ"), "mem_free": getattr(gc, "mem_free", None),
+        }
+        # CircuitPython has no time zones: local time is UTC-style arithmetic
+        os.environ["TZ"] = "UTC"
+        time.tzset()
+        builtins.open = board_open
+        time.monotonic = clock.monotonic
+        time.monotonic_ns = lambda: int(clock.monotonic() * 1000000000)
+        time.time = clock.time
+        time.sleep = sleep
+        time.localtime = localtime
+        os.getenv = getenv
+        os.chdir(self.board_dir)
+        sys.path.insert(0, self.board_dir)
+        if not self.quiet:
+            sys.stdout = _TimestampedOutput(self._saved["stdout"], clock)
+        else:
+            sys.stdout = open(os.devnull, "w")
+
+    def _restore(self):
+        saved = self._saved
+        if self.quiet:
+            sys.stdout.close()
+        sys.stdout = saved["stdout"]
+        builtins.open = saved["open"]
+        time.monotonic = saved["monotonic"]
+        time.monotonic_ns = saved["monotonic_ns"]
+        time.time = saved["time"]
+        time.sleep = saved["sleep"]
+        time.localtime = saved["localtime"]
+        os.getenv = saved["getenv"]
+        if saved["TZ"] is None:
+            os.environ.pop("TZ", None)
+        else:
+            os.environ["TZ"] = saved["TZ"]
+        time.tzset()
+        os.chdir(saved["cwd"])
+        sys.path[:] = saved["path"]
+        self._forget_board_modules()
+        if saved["mem_free"] is None:
+            if hasattr(gc, "mem_free"):
+                del gc.mem_free
+        else:
+            gc.mem_free = saved["mem_free"]
+
+    def _forget_board_modules(self):
+        """Drops modules imported by the board so the next boot starts clean."""
+        for name in set(sys.modules) - self._saved["modules"]:
+            del sys.modules[name]
+
+    def _fake_heap(self):
+        if self.heap is None:
+            return
+        free, block = self.heap
+        gc.mem_free = lambda: free
+        try:
+            import memory_guard
+        except ImportError:
+            return  # Older boards have no memory guard to fool
+        memory_guard.largest_free_block = lambda limit=0, step=0: min(block, limit or block)
+
+    # --- Frames ---
+    def _maybe_capture(self):
+        display = simstate.display
+        if display is None or simstate.clock.mono < self._next_frame:
+            return
+        self.frames.append((int(simstate.clock.mono), display.frame()))
+        self._next_frame += self.frame_every
+        while self._next_frame <= simstate.clock.mono:
+            self._next_frame += self.frame_every
+
+    # --- Mode switches ---
+    def _note_switches(self):
+        """
+        Times the mode switch of each press that has happened, once the board
+        sleeps again: how long until the new screen was up, how long the loop
+        was busy (buttons unread), and how old the newest data response was.
+        """
+        display = simstate.display
+        now = simstate.clock.mono
+        while self._pending_presses and self._pending_presses[0] <= now:
+            start = self._pending_presses[0]
+            swaps = [at for at in (display.changed_at if display else ()) if at >= start]
+            if not swaps:
+                return
+            received = [at for at, url, status, _ in simstate.requests
+                        if status < 400 and TIME_URL not in url and at <= now]
+            self.switches.append((start, swaps[0] - start, now - start,
+                                  now - received[-1] if received else None))
+            self._pending_presses.pop(0)
+
+    def switch_report(self):
+        """Lines describing each measured mode switch."""
+        lines = []
+        for start, shown, free, age in self.switches:
+            data = f"newest data {age:.1f} s old" if age is not None else "no data yet"
+            lines.append(f"  press at {start:.1f} s: new screen after {shown:.2f} s, "
+                         f"loop free after {free:.2f} s, {data}")
+        return lines
+
+    def save_frames(self, directory, scale=8):
+        """Writes every captured frame as frame_<second>.png; returns the paths."""
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for second, rgb in self.frames:
+            path = os.path.join(directory, f"frame_{second:05d}.png")
+            framebuffer.write_png(path, rgb, scale)
+            paths.append(path)
+        return paths
+
+    def compare_frames(self, directory, scale=8):
+        """Compares captured frames with golden PNGs; returns the mismatching names."""
+        mismatches = []
+        for second, rgb in self.frames:
+            name = f"frame_{second:05d}.png"
+            path = os.path.join(directory, name)
+            if not os.path.exists(path):
+                mismatches.append(name + " (missing)")
+                continue
+            golden = framebuffer.read_png(path)[::scale, ::scale]
+            if golden.shape != rgb.shape or (golden != rgb).any():
+                mismatches.append(name)
+        return mismatches
+
+    # --- Running ---
+    def _boot(self):
+        self._fake_heap()
+        try:
+            runpy.run_path(self.code_path, run_name="__main__")
+        finally:
+            self.boots += 1
+
+    def _start(self):
+        """Fresh clock, network log and display, then the patches."""
+        simstate.clock = simstate.VirtualClock(self.start_epoch, self.duration)
+        simstate.backend = self.backend
+        simstate.display = None
+        simstate.network_latency = self.network_latency
+        simstate.requests = []
+        simstate.resets = []
+        simstate.reset_reason = "POWER_ON"
+        simstate.nvm = bytearray(b"\xff" * 256)
+        simstate.button_presses = {}
+        simstate.scrapes = list(self.scrapes)
+        simstate.scraped = []
+        for pin, start in self.presses:
+            simstate.button_presses.setdefault(pin, []).append((start, start + PRESS_SECONDS))
+        self._pending_presses = sorted(start for _, start in self.presses)
+        self.switches = []
+        self._next_frame = 0.0
+        self._install()
+
+    @contextlib.contextmanager
+    def session(self):
+        """
+        Installs the simulated board for the duration of a with block,
+        for callers that drive board functions themselves (see load_board).
+        """
+        self._start()
+        try:
+            yield self
+        finally:
+            self._restore()
+
+    def load_board(self):
+        """
+        Executes code.py without its top-level `while` loops and returns the
+        module namespace, so its setup has run and its functions can be
+        called directly. Call inside session().
+        """
+        with builtins.open(self.code_path, "r") as source:
+            tree = ast.parse(source.read(), self.code_path)
+        tree.body = [node for node in tree.body if not isinstance(node, ast.While)]
+        namespace = {"__name__": "__board__", "__file__": self.code_path}
+        self._fake_heap()
+        exec(compile(tree, self.code_path, "exec"), namespace)
+        return namespace
+
+    def run(self, profile=None):
+        """
+        Runs code.py until the simulated time is up. A board reset reboots
+        code.py on the same clock; an uncaught exception ends the run (and
+        is kept in .crash) unless reset_on_crash, where it reboots like the
+        real supervisor would after a crash. Pass a cProfile.Profile to
+        profile the board code.
+        """
+        self._start()
+        started = time.perf_counter()  # perf_counter is not patched
+        try:
+            while True:
+                try:
+                    if profile is not None:
+                        profile.runcall(self._boot)
+                    else:
+                        self._boot()
+                    break  # code.py returned on its own
+                except simstate.SimulationDone:
+                    break
+                except simstate.BoardReset as reset:
+                    print(f"*** Board reset: {reset} ***")
+                    simstate.reset_reason = "WATCHDOG" if str(reset) == "watchdog" else "SOFTWARE"
+                except Exception as error:  # noqa: BLE001 - mirrors the supervisor
+                    self.crash = error
+                    print(f"*** code.py crashed: {error!r} ***")
+                    if not self.reset_on_crash:
+                        break
+                self._forget_board_modules()
+                simstate.display = None
+                simstate.clock.listeners = []  # The old boot's watchdog is gone
+                simstate.clock.advance(REBOOT_SECONDS)
+                simstate.clock.boot_at = simstate.clock.mono  # monotonic() restarts at boot
+        except simstate.SimulationDone:
+            pass
+        finally:
+            self.wall_seconds = time.perf_counter() - started
+            self._restore()
+        return self
+
+    def summary(self):
+        """A few lines describing the finished run."""
+        requests = simstate.requests
+        failed = sum(1 for _, _, status, _ in requests if status >= 400)
+        received = sum(size for _, _, _, size in requests)
+        display = simstate.display
+        lines = [
+            f"Simulated {self.duration / 60:.1f} min in {self.wall_seconds:.2f} s wall "
+            f"({self.duration / max(self.wall_seconds, 1e-9):.0f}x real time)",
+            f"Boots: {self.boots}, resets: {len(simstate.resets)}",
+            f"Requests: {len(requests)} ({failed} failed), {received} body bytes received",
+            f"Frames captured: {len(self.frames)}",
+        ]
+        if display is not None:
+            lines.append(f"Display: {display.root_group_changes} root group changes, "
+                         f"{display.refreshes} explicit refreshes")
+        if self.scrapes:
+            lines.append(f"Metrics scrapes: {len(simstate.scraped)} of {len(self.scrapes)} answered")
+            for at, reply in simstate.scraped:
+                head, _, body = reply.partition(b"\r\n\r\n")
+                status = head.split(b"\r\n", 1)[0].decode()
+                lines.append(f"  at {at:.1f} s: {status}, {body.count(b'#')} metric families, "
+                             f"{len(body)} bytes")
+        if self.switches:
+            lines.append(f"Mode switches: {len(self.switches)}")
+            lines.extend(self.switch_report())
+        if self.crash is not None:
+            lines.append(f"Last crash: {self.crash!r}")
+        return lines
+
+
+def print_profile(profile, limit=25, sort="cumulative"):
+    """Prints the board code's hottest functions from a cProfile run."""
+    stats = pstats.Stats(profile)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
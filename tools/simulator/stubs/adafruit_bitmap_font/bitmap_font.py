@@ -0,0 +1,79 @@
+"""
+Stand-in for adafruit_bitmap_font.bitmap_font: parses BDF fonts on the host.
+
+Paths are opened through open(), so the harness's board-root remapping
+makes "/fonts/6x10.bdf" resolve inside the board folder.
+"""
+
+import numpy as np
+
+
+class Glyph:
+    def __init__(self, width, height, dx, dy, shift_x, pixels):
+        self.width = width
+        self.height = height
+        self.dx = dx
+        self.dy = dy
+        self.shift_x = shift_x
+        self.pixels = pixels  # (height, width) bool array
+
+
+class BDF:
+    def __init__(self, path):
+        self.path = path
+        self.ascent = 0
+        self.descent = 0
+        self._box = (0, 0, 0, 0)
+        self._glyphs = {}
+        with open(path, "r") as source:
+            self._parse(source)
+
+    def _parse(self, source):
+        code = None
+        box = (0, 0, 0, 0)
+        shift_x = 0
+        rows = None
+        for line in source:
+            words = line.split()
+            if not words:
+                continue
+            key = words[0]
+            if key == "FONTBOUNDINGBOX":
+                self._box = tuple(int(w) for w in words[1:5])
+            elif key == "FONT_ASCENT":
+                self.ascent = int(words[1])
+            elif key == "FONT_DESCENT":
+                self.descent = int(words[1])
+            elif key == "ENCODING":
+                code = int(words[1])
+            elif key == "DWIDTH":
+                shift_x = int(words[1])
+            elif key == "BBX":
+                box = tuple(int(w) for w in words[1:5])
+            elif key == "BITMAP":
+                rows = []
+            elif key == "ENDCHAR":
+                width, height = box[0], box[1]
+                pixels = np.zeros((height, width), dtype=bool)
+                for y, row in enumerate(rows[:height]):
+                    value = int(row, 16)
+                    bits = len(row) * 4
+                    for x in range(width):
+                        pixels[y, x] = bool(value >> (bits - 1 - x) & 1)
+                self._glyphs[code] = Glyph(width, height, box[2], box[3], shift_x, pixels)
+                rows = None
+            elif rows is not None:
+                rows.append(key)
+
+    def get_bounding_box(self):
+        return self._box
+
+    def load_glyphs(self, code_points):
+        pass  # Everything is parsed up front
+
+    def get_glyph(self, code_point):
+        return self._glyphs.get(code_point)
+
+
+def load_font(filename, bitmap=None):
+    return BDF(filename)
@@ -0,0 +1,19 @@
+"""
+Stand-in for adafruit_datetime on top of CPython's datetime.
+
+now() reads the simulated wall clock (time.time is patched by the
+harness), as the library reads the board's RTC.
+"""
+
+import datetime as _datetime
+import time
+
+timedelta = _datetime.timedelta
+timezone = _datetime.timezone
+date = _datetime.date
+
+
+class datetime(_datetime.datetime):  # noqa: N801 - same name as the library
+    @classmethod
+    def now(cls, tz=None):
+        return cls.fromtimestamp(time.time(), _datetime.timezone.utc).replace(tzinfo=tz)
@@ -0,0 +1,28 @@
+"""Stand-in for adafruit_debouncer (no bounce to filter in simulation)."""
+
+
+class Debouncer:
+    def __init__(self, io, interval=0.010):
+        self._io = io
+        self.interval = interval
+        self._state = self._sample()
+        self._previous = self._state
+
+    def _sample(self):
+        return self._io.value if hasattr(self._io, "value") else self._io()
+
+    def update(self):
+        self._previous = self._state
+        self._state = self._sample()
+
+    @property
+    def value(self):
+        return self._state
+
+    @property
+    def rose(self):
+        return self._state and not self._previous
+
+    @property
+    def fell(self):
+        return self._previous and not self._state
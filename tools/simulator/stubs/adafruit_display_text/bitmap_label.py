@@ -0,0 +1,3 @@
+"""Stand-in for adafruit_display_text.bitmap_label (draws like Label here)."""
+
+from adafruit_display_text.label import Label  # noqa: F401
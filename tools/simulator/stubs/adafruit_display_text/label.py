@@ -0,0 +1,90 @@
+"""
+Stand-in for adafruit_display_text.label.Label.
+
+Positions text the way the library does: y is the vertical centre of the
+line, so the baseline sits ascent // 2 below it.
+"""
+
+import numpy as np
+
+
+class Label:
+    def __init__(self, font, *, text="", color=0xFFFFFF, x=0, y=0, scale=1,
+                 background_color=None, anchor_point=None, anchored_position=None,
+                 line_spacing=1.25, **kwargs):
+        self.font = font
+        self.color = color
+        self.x = x
+        self.y = y
+        self.scale = scale
+        self.background_color = background_color
+        self.line_spacing = line_spacing
+        self.hidden = False
+        self._text = ""
+        self.text = text
+        self.anchor_point = anchor_point
+        if anchored_position is not None:
+            self.anchored_position = anchored_position
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, text):
+        self._text = str(text)
+
+    def _width(self):
+        width = 0
+        for char in self._text:
+            glyph = self.font.get_glyph(ord(char))
+            if glyph is not None:
+                width += glyph.shift_x
+        return width
+
+    @property
+    def bounding_box(self):
+        ascent = getattr(self.font, "ascent", 0) or self.font.get_bounding_box()[1]
+        return (0, -(ascent // 2), self._width(), ascent + getattr(self.font, "descent", 0))
+
+    @property
+    def anchored_position(self):
+        anchor = self.anchor_point or (0, 0)
+        _, top, width, height = self.bounding_box
+        return (self.x + round(anchor[0] * width * self.scale),
+                self.y + top + round(anchor[1] * height * self.scale))
+
+    @anchored_position.setter
+    def anchored_position(self, position):
+        anchor = self.anchor_point or (0, 0)
+        _, top, width, height = self.bounding_box
+        self.x = position[0] - round(anchor[0] * width * self.scale)
+        self.y = position[1] - top - round(anchor[1] * height * self.scale)
+
+    def _visible_text(self):
+        return self._text
+
+    def draw(self, fb, x=0, y=0):
+        if self.hidden or not self._text:
+            return
+        rgb = np.array(((self.color >> 16) & 0xFF, (self.color >> 8) & 0xFF, self.color & 0xFF),
+                       dtype=np.uint8)
+        fb_h, fb_w, _ = fb.shape
+        ascent = getattr(self.font, "ascent", 0) or self.font.get_bounding_box()[1]
+        baseline = y + self.y + ascent // 2
+        pen = x + self.x
+        for char in self._visible_text():
+            glyph = self.font.get_glyph(ord(char))
+            if glyph is None:
+                continue
+            left = pen + glyph.dx
+            top = baseline - glyph.height - glyph.dy
+            for row in range(glyph.height):
+                fy = top + row
+                if not 0 <= fy < fb_h:
+                    continue
+                for column in np.nonzero(glyph.pixels[row])[0]:
+                    fx = left + int(column)
+                    if 0 <= fx < fb_w:
+                        fb[fy, fx] = rgb
+            pen += glyph.shift_x
@@ -0,0 +1,37 @@
+"""Stand-in for adafruit_display_text.scrolling_label.ScrollingLabel."""
+
+import time
+
+from adafruit_display_text.label import Label
+
+
+class ScrollingLabel(Label):
+    def __init__(self, font, *, max_characters=10, animate_time=0.3, current_index=0, **kwargs):
+        self.max_characters = max_characters
+        self.animate_time = animate_time
+        self.current_index = current_index
+        self._last_animate_time = -1
+        super().__init__(font, **kwargs)
+
+    def _visible_text(self):
+        if len(self._text) <= self.max_characters:
+            return self._text
+        looped = self._text + "  " + self._text
+        return looped[self.current_index:self.current_index + self.max_characters]
+
+    def update(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_animate_time < self.animate_time:
+            return
+        self._last_animate_time = now
+        if len(self._text) > self.max_characters:
+            self.current_index = (self.current_index + 1) % (len(self._text) + 2)
+
+    @property
+    def full_text(self):
+        return self._text
+
+    @full_text.setter
+    def full_text(self, text):
+        self.text = text
+        self.current_index = 0
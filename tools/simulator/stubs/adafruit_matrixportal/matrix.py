@@ -0,0 +1,13 @@
+"""Stand-in for adafruit_matrixportal.matrix: the display is a framebuffer."""
+
+import framebuffer
+import simstate
+
+
+class Matrix:
+    def __init__(self, *, width=64, height=32, bit_depth=2, alt_addr_pins=None,
+                 color_order="RGB", serpentine=True, tile_rows=1, rotation=0):
+        if simstate.display is None:
+            simstate.display = framebuffer.FramebufferDisplay(width, height)
+        self.display = simstate.display
+        self.display.rotation = rotation
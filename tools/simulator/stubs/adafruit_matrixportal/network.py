@@ -0,0 +1,228 @@
+"""
+Stand-in for adafruit_matrixportal.network.Network.
+
+Requests go to simstate.backend instead of Wi-Fi and cost
+simstate.network_latency seconds of simulated time. Bodies come back the
+way adafruit_portalbase returns them: fetch() gives a streaming response,
+fetch_data() parses application/json when given a json_path (json_path=[]
+is the whole document) and otherwise returns the body as text, which the
+2022-23 boards json.loads themselves.
+
+A backend may add a fourth item, (bytes sent, seconds) pauses partway
+through the body: reading across one costs that much simulated time, or
+the request's timeout and an ETIMEDOUT OSError if the pause is longer,
+as a socket read timeout would.
+
+network._wifi.esp stands in for the ESP32SPI object, with just the socket
+calls a board uses to serve on the ESP32: at each of simstate.scrapes a
+client connects to the listening socket and sends a GET /metrics, and the
+reply the board writes is kept in simstate.scraped when it closes.
+"""
+
+import json
+import time
+
+import simstate
+
+
+class HttpError(Exception):
+    def __init__(self, message, response=None):
+        super().__init__(message)
+        self.response = response
+
+
+ETIMEDOUT = 110
+
+
+class _Socket:
+    """Stands in for response.socket; closing it directly abandons the body."""
+
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class Response:
+    """A finished response. A body shorter than Content-Length models the
+    server dropping the connection: reading past what arrived raises OSError.
+    close() reads off whatever is left of the body, as adafruit_requests does,
+    unless the socket was closed (or dropped from the response) first."""
+
+    def __init__(self, status, headers, body, stalls=(), timeout=None):
+        self.status_code = status
+        self.reason = b"OK" if status < 400 else b"Error"
+        self.headers = {key.lower(): value for key, value in headers.items()}
+        self._body = body
+        self._closed = False
+        self._truncated = int(self.headers.get("content-length", len(body))) > len(body)
+        self._stalls = list(stalls)
+        self._timeout = timeout
+        self._cached = False  # content read the whole body: nothing for close() to drain
+        self.socket = _Socket()
+
+    def _dropped(self):
+        return OSError(104, "Connection closed after %d bytes" % len(self._body))
+
+    def _wait_for(self, end):
+        """Sits out the pauses before byte `end` of the body arrives."""
+        while self._stalls and self._stalls[0][0] < end:
+            at, seconds = self._stalls.pop(0)
+            if self._timeout is not None and seconds > self._timeout:
+                simstate.clock.advance(self._timeout)
+                raise OSError(ETIMEDOUT, "Read timed out after %d bytes" % at)
+            simstate.clock.advance(seconds)
+
+    @property
+    def content(self):
+        self._wait_for(len(self._body))
+        if self._truncated:
+            raise self._dropped()
+        self._cached = True
+        return self._body
+
+    @property
+    def text(self):
+        return self.content.decode()
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        for start in range(0, len(self._body), chunk_size):
+            if self._closed:
+                return
+            self._wait_for(start + chunk_size)
+            yield self._body[start:start + chunk_size]
+        if self._truncated and not self._closed:
+            raise self._dropped()
+
+    def close(self):
+        self._closed = True  # An iter_content() still running stops
+        if self.socket is None:
+            return
+        if not (self._cached or self.socket.closed):
+            # adafruit_requests' _throw_away(): the pauses and timeout still apply
+            self._wait_for(len(self._body))
+            if self._truncated:
+                raise self._dropped()
+        self.socket = None
+
+
+class _Esp:
+    """The ESP_SPIcontrol server calls, with scrape clients from simstate."""
+
+    NO_SOCKET = 255
+    REQUEST = b"GET /metrics HTTP/1.1\r\nHost: board\r\n\r\n"
+
+    def __init__(self):
+        self.ip_address = b"\xc0\xa8\x01\x17"
+        self._sockets = 0
+        self._listening = None
+        self._clients = {}  # socket number -> [request bytes still unread, reply bytes]
+
+    def pretty_ip(self, ip):
+        return ".".join(str(part) for part in ip)
+
+    def get_socket(self):
+        self._sockets += 1
+        return self._sockets
+
+    def start_server(self, port, socket_num, conn_mode=0):
+        self._listening = socket_num
+
+    def socket_available(self, socket_num):
+        if socket_num != self._listening:
+            return len(self._clients[socket_num][0])
+        if not simstate.scrapes or simstate.scrapes[0] > simstate.clock.mono:
+            return self.NO_SOCKET
+        simstate.scrapes.pop(0)
+        client = self.get_socket()
+        self._clients[client] = [self.REQUEST, b""]
+        return client
+
+    def socket_read(self, socket_num, size):
+        pending = self._clients[socket_num]
+        data, pending[0] = pending[0][:size], pending[0][size:]
+        return data
+
+    def socket_write(self, socket_num, buffer, conn_mode=0):
+        self._clients[socket_num][1] += bytes(buffer)
+        return len(buffer)
+
+    def socket_close(self, socket_num):
+        _, reply = self._clients.pop(socket_num)
+        simstate.scraped.append((simstate.clock.mono, reply))
+
+
+class _WiFi:
+    def __init__(self):
+        self.esp = _Esp()
+
+
+class _Session:
+    """The `requests` attribute some code reaches for directly."""
+
+    def __init__(self, network):
+        self._network = network
+
+    def get(self, url, headers=None, timeout=None, stream=False):
+        return self._network._request(url, headers, timeout)
+
+
+class Network:
+    def __init__(self, *, status_neopixel=None, esp=None, external_spi=None,
+                 extract_values=True, debug=False, **kwargs):
+        self.debug = debug
+        self.requests = _Session(self)
+        self._wifi = _WiFi()
+        self.local_time_syncs = 0
+
+    @property
+    def is_connected(self):
+        return True
+
+    @property
+    def enabled(self):
+        return True
+
+    def connect(self, max_attempts=10):
+        pass
+
+    def _request(self, url, headers, timeout=None):
+        simstate.clock.advance(simstate.network_latency)
+        status, response_headers, body, *stalls = simstate.backend(url, dict(headers or {}))
+        simstate.requests.append((simstate.clock.mono, url, status, len(body)))
+        return Response(status, response_headers, body, stalls[0] if stalls else (), timeout)
+
+    def fetch(self, url, *, headers=None, timeout=10):
+        # Like portalbase, any reply comes back; only fetch_data() checks the status
+        return self._request(url, headers, timeout)
+
+    def check_response(self, response):
+        if response.status_code != 200:
+            response.close()
+            raise HttpError(f"Code {response.status_code}: {response.reason.decode()}", response)
+
+    def fetch_data(self, url, *, headers=None, json_path=None, regexp_path=None, timeout=10):
+        response = self.fetch(url, headers=headers, timeout=timeout)
+        self.check_response(response)
+        if json_path is None or "json" not in response.headers.get("content-type", ""):
+            return response.text
+        value = response.json()
+        if json_path:
+            paths = json_path if isinstance(json_path[0], (list, tuple)) else (json_path,)
+            values = []
+            for path in paths:
+                node = value
+                for key in path:
+                    node = node[key]
+                values.append(node)
+            return values[0] if len(values) == 1 else values
+        return value
+
+    def get_local_time(self, location=None, max_attempts=10):
+        self._request("https://io.adafruit.com/api/v2/time", None)
+        self.local_time_syncs += 1
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(simstate.clock.time()))
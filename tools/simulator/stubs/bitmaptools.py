@@ -0,0 +1,5 @@
+"""Stand-in for CircuitPython's bitmaptools module (the parts the boards use)."""
+
+
+def fill_region(bitmap, x1, y1, x2, y2, value):
+    bitmap.pixels[y1:y2, x1:x2] = value
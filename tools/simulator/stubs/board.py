@@ -0,0 +1,19 @@
+"""Stand-in for CircuitPython's board module (Matrix Portal pin names)."""
+
+
+class Pin:
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return "board." + self.name
+
+
+NEOPIXEL = Pin("NEOPIXEL")
+BUTTON_UP = Pin("BUTTON_UP")
+BUTTON_DOWN = Pin("BUTTON_DOWN")
+SCL = Pin("SCL")
+SDA = Pin("SDA")
+SCK = Pin("SCK")
+MOSI = Pin("MOSI")
+MISO = Pin("MISO")
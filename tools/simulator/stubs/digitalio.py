@@ -0,0 +1,38 @@
+"""Stand-in for digitalio. Button pins read the harness's press schedule."""
+
+import simstate
+
+
+class Direction:
+    INPUT = "input"
+    OUTPUT = "output"
+
+
+class Pull:
+    UP = "up"
+    DOWN = "down"
+
+
+class DigitalInOut:
+    def __init__(self, pin):
+        self.pin = pin
+        self.direction = Direction.INPUT
+        self.pull = None
+        self._value = False
+
+    @property
+    def value(self):
+        if self.direction == Direction.OUTPUT:
+            return self._value
+        now = simstate.clock.mono if simstate.clock else 0
+        for start, end in simstate.button_presses.get(self.pin.name, ()):
+            if start <= now < end:
+                return self.pull != Pull.UP  # Pressed pulls the line to ground
+        return self.pull == Pull.UP
+
+    @value.setter
+    def value(self, value):
+        self._value = value
+
+    def deinit(self):
+        pass
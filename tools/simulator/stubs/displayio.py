@@ -0,0 +1,268 @@
+"""
+Stand-in for displayio that can draw itself into a NumPy framebuffer.
+
+Covers what the boards use: Group, TileGrid, Bitmap, Palette,
+OnDiskBitmap (BMP files), ColorConverter and release_displays. Objects
+that know how to draw themselves (TileGrid here, Labels in the
+adafruit_display_text stand-in) provide draw(fb, x, y).
+"""
+
+import struct
+
+import numpy as np
+
+
+def color_to_rgb(color):
+    return ((color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF)
+
+
+class Group:
+    def __init__(self, *, scale=1, x=0, y=0):
+        self.scale = scale
+        self.x = x
+        self.y = y
+        self.hidden = False
+        self._items = []
+
+    def append(self, item):
+        self._items.append(item)
+
+    def insert(self, index, item):
+        self._items.insert(index, item)
+
+    def remove(self, item):
+        self._items.remove(item)
+
+    def pop(self, index=-1):
+        return self._items.pop(index)
+
+    def index(self, item):
+        return self._items.index(item)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def __setitem__(self, index, item):
+        self._items[index] = item
+
+    def __delitem__(self, index):
+        del self._items[index]
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def draw(self, fb, x=0, y=0):
+        if self.hidden:
+            return
+        for item in self._items:
+            item.draw(fb, x + self.x, y + self.y)
+
+
+class Palette:
+    def __init__(self, color_count, *, dither=False):
+        self._colors = [0] * color_count
+        self._transparent = set()
+
+    def __len__(self):
+        return len(self._colors)
+
+    def __getitem__(self, index):
+        return self._colors[index]
+
+    def __setitem__(self, index, color):
+        if isinstance(color, (tuple, list)):
+            color = (color[0] << 16) | (color[1] << 8) | color[2]
+        elif isinstance(color, (bytes, bytearray)):
+            color = (color[0] << 16) | (color[1] << 8) | color[2]
+        self._colors[index] = color
+
+    def __iter__(self):
+        return iter(self._colors)
+
+    def make_transparent(self, index):
+        self._transparent.add(index)
+
+    def make_opaque(self, index):
+        self._transparent.discard(index)
+
+    def is_transparent(self, index):
+        return index in self._transparent
+
+    def rgb_table(self):
+        """(N, 3) uint8 colours and an (N,) bool transparency mask."""
+        table = np.array([color_to_rgb(c) for c in self._colors], dtype=np.uint8).reshape(-1, 3)
+        mask = np.zeros(len(self._colors), dtype=bool)
+        for index in self._transparent:
+            mask[index] = True
+        return table, mask
+
+
+class ColorConverter:
+    """Pixel shader for true-colour bitmaps (values are 0xRRGGBB)."""
+
+    def __init__(self, *, input_colorspace=None, dither=False):
+        self._transparent = None
+
+    def make_transparent(self, color):
+        self._transparent = color
+
+    def make_opaque(self, color):
+        self._transparent = None
+
+
+class Bitmap:
+    def __init__(self, width, height, value_count):
+        self.width = width
+        self.height = height
+        self.value_count = value_count
+        self.pixels = np.zeros((height, width), dtype=np.uint32)
+
+    def __getitem__(self, index):
+        x, y = index if isinstance(index, tuple) else (index % self.width, index // self.width)
+        return int(self.pixels[y, x])
+
+    def __setitem__(self, index, value):
+        x, y = index if isinstance(index, tuple) else (index % self.width, index // self.width)
+        self.pixels[y, x] = value
+
+    def fill(self, value):
+        self.pixels[:, :] = value
+
+    def blit(self, x, y, source, *, x1=0, y1=0, x2=None, y2=None, skip_index=None):
+        x2 = source.width if x2 is None else x2
+        y2 = source.height if y2 is None else y2
+        patch = source.pixels[y1:y2, x1:x2]
+        target = self.pixels[y:y + patch.shape[0], x:x + patch.shape[1]]
+        patch = patch[:target.shape[0], :target.shape[1]]
+        if skip_index is None:
+            target[:, :] = patch
+        else:
+            keep = patch != skip_index
+            target[keep] = patch[keep]
+
+    def dirty(self, x1=0, y1=0, x2=-1, y2=-1):
+        pass
+
+
+def _read_bmp(data):
+    """Decodes an uncompressed 1/4/8/24-bit BMP into (Bitmap, shader)."""
+    offset = struct.unpack_from("<I", data, 10)[0]
+    header_size, width, height, _, bpp, compression = struct.unpack_from("<IiiHHI", data, 14)
+    if compression not in (0, 3):
+        raise ValueError("Compressed BMPs are not supported")
+    top_down = height < 0
+    height = abs(height)
+    row_bytes = ((width * bpp + 31) // 32) * 4
+    rows = np.frombuffer(data, dtype=np.uint8, count=row_bytes * height, offset=offset)
+    rows = rows.reshape(height, row_bytes)
+    if not top_down:
+        rows = rows[::-1]
+    bitmap = Bitmap(width, height, 1 << min(bpp, 24))
+    if bpp == 24:
+        bgr = rows[:, :width * 3].reshape(height, width, 3).astype(np.uint32)
+        bitmap.pixels = (bgr[:, :, 2] << 16) | (bgr[:, :, 1] << 8) | bgr[:, :, 0]
+        return bitmap, ColorConverter()
+    colors = struct.unpack_from("<I", data, 46)[0] or (1 << bpp)
+    palette = Palette(colors)
+    table = 14 + header_size
+    for index in range(colors):
+        b, g, r = data[table + 4 * index: table + 4 * index + 3]
+        palette[index] = (r << 16) | (g << 8) | b
+    if bpp == 8:
+        bitmap.pixels = rows[:, :width].astype(np.uint32)
+    else:
+        bits = np.unpackbits(rows, axis=1)[:, :width * bpp].reshape(height, width, bpp)
+        weights = 1 << np.arange(bpp - 1, -1, -1)
+        bitmap.pixels = (bits * weights).sum(axis=2).astype(np.uint32)
+    return bitmap, palette
+
+
+class OnDiskBitmap(Bitmap):
+    def __init__(self, file):
+        if isinstance(file, str):
+            with open(file, "rb") as handle:
+                data = handle.read()
+        else:
+            data = file.read()
+        decoded, shader = _read_bmp(data)
+        super().__init__(decoded.width, decoded.height, decoded.value_count)
+        self.pixels = decoded.pixels
+        self.pixel_shader = shader
+
+
+class TileGrid:
+    def __init__(self, bitmap, *, pixel_shader, width=1, height=1, tile_width=None,
+                 tile_height=None, default_tile=0, x=0, y=0):
+        self.bitmap = bitmap
+        self.pixel_shader = pixel_shader
+        self.width = width
+        self.height = height
+        self.tile_width = tile_width or bitmap.width
+        self.tile_height = tile_height or bitmap.height
+        self.x = x
+        self.y = y
+        self.hidden = False
+        self.flip_x = False
+        self.flip_y = False
+        self.transpose_xy = False
+        self._tiles = [default_tile] * (width * height)
+
+    def __getitem__(self, index):
+        if isinstance(index, tuple):
+            index = index[1] * self.width + index[0]
+        return self._tiles[index]
+
+    def __setitem__(self, index, value):
+        if isinstance(index, tuple):
+            index = index[1] * self.width + index[0]
+        self._tiles[index] = value
+
+    def _tile_pixels(self, tile):
+        per_row = max(1, self.bitmap.width // self.tile_width)
+        tx = (tile % per_row) * self.tile_width
+        ty = (tile // per_row) * self.tile_height
+        return self.bitmap.pixels[ty:ty + self.tile_height, tx:tx + self.tile_width]
+
+    def draw(self, fb, x=0, y=0):
+        if self.hidden:
+            return
+        for row in range(self.height):
+            for column in range(self.width):
+                pixels = self._tile_pixels(self._tiles[row * self.width + column])
+                if self.flip_x:
+                    pixels = pixels[:, ::-1]
+                if self.flip_y:
+                    pixels = pixels[::-1]
+                left = x + self.x + column * self.tile_width
+                top = y + self.y + row * self.tile_height
+                _paint(fb, left, top, pixels, self.pixel_shader)
+
+
+def _paint(fb, left, top, pixels, shader):
+    """Composites bitmap values through a shader onto the RGB framebuffer."""
+    fb_h, fb_w, _ = fb.shape
+    x0, y0 = max(left, 0), max(top, 0)
+    x1 = min(left + pixels.shape[1], fb_w)
+    y1 = min(top + pixels.shape[0], fb_h)
+    if x0 >= x1 or y0 >= y1:
+        return
+    values = pixels[y0 - top:y1 - top, x0 - left:x1 - left]
+    target = fb[y0:y1, x0:x1]
+    if isinstance(shader, Palette):
+        table, transparent = shader.rgb_table()
+        values = np.minimum(values, len(table) - 1)
+        opaque = ~transparent[values]
+        target[opaque] = table[values][opaque]
+    else:
+        rgb = np.stack(((values >> 16) & 0xFF, (values >> 8) & 0xFF, values & 0xFF), axis=-1)
+        opaque = np.ones(values.shape, dtype=bool)
+        if shader is not None and shader._transparent is not None:
+            opaque = values != shader._transparent
+        target[opaque] = rgb.astype(np.uint8)[opaque]
+
+
+def release_displays():
+    pass
@@ -0,0 +1,89 @@
+"""
+The simulated 64x32 panel: a displayio-like display that renders its
+root group into a NumPy RGB framebuffer, plus PNG read/write helpers.
+"""
+
+import struct
+import zlib
+
+import numpy as np
+
+import simstate
+
+
+class FramebufferDisplay:
+    def __init__(self, width=64, height=32):
+        self.width = width
+        self.height = height
+        self.rotation = 0
+        self.auto_refresh = True
+        self.brightness = 1.0
+        self._root_group = None
+        self.root_group_changes = 0
+        self.changed_at = []  # Simulated second of each root group change
+        self.refreshes = 0
+
+    @property
+    def root_group(self):
+        return self._root_group
+
+    @root_group.setter
+    def root_group(self, group):
+        if group is not self._root_group:
+            self.root_group_changes += 1
+            self.changed_at.append(simstate.clock.mono if simstate.clock else 0.0)
+        self._root_group = group
+
+    def show(self, group):
+        self.root_group = group
+
+    def refresh(self, *, target_frames_per_second=None, minimum_frames_per_second=0):
+        self.refreshes += 1
+        return True
+
+    def frame(self):
+        """Renders the current root group; returns a (height, width, 3) uint8 array."""
+        fb = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        if self._root_group is not None:
+            self._root_group.draw(fb, 0, 0)
+        return fb
+
+
+def _chunk(kind, data):
+    body = kind + data
+    return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body) & 0xFFFFFFFF)
+
+
+def write_png(path, rgb, scale=1):
+    """Writes an (h, w, 3) uint8 array as an 8-bit RGB PNG, optionally scaled up."""
+    if scale > 1:
+        rgb = np.repeat(np.repeat(rgb, scale, axis=0), scale, axis=1)
+    height, width, _ = rgb.shape
+    raw = b"".join(b"\x00" + rgb[row].tobytes() for row in range(height))
+    with open(path, "wb") as out:
+        out.write(b"\x89PNG\r\n\x1a\n")
+        out.write(_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        out.write(_chunk(b"IDAT", zlib.compress(raw, 9)))
+        out.write(_chunk(b"IEND", b""))
+
+
+def read_png(path):
+    """Reads a PNG written by write_png (RGB, no row filters) back into an array."""
+    with open(path, "rb") as source:
+        data = source.read()
+    at = 8
+    width = height = 0
+    idat = b""
+    while at < len(data):
+        length = struct.unpack_from(">I", data, at)[0]
+        kind = data[at + 4:at + 8]
+        body = data[at + 8:at + 8 + length]
+        if kind == b"IHDR":
+            width, height = struct.unpack_from(">II", body)
+        elif kind == b"IDAT":
+            idat += body
+        at += 12 + length
+    raw = np.frombuffer(zlib.decompress(idat), dtype=np.uint8).reshape(height, 1 + width * 3)
+    if raw[:, 0].any():
+        raise ValueError("Only unfiltered PNGs (from write_png) can be compared")
+    return raw[:, 1:].reshape(height, width, 3).copy()
@@ -0,0 +1,70 @@
+"""Stand-in for microcontroller: reset() ends (or restarts) the simulated run."""
+
+import simstate
+
+
+class ResetReason:
+    POWER_ON = "POWER_ON"
+    BROWNOUT = "BROWNOUT"
+    SOFTWARE = "SOFTWARE"
+    DEEP_SLEEP_ALARM = "DEEP_SLEEP_ALARM"
+    RESET_PIN = "RESET_PIN"
+    WATCHDOG = "WATCHDOG"
+    UNKNOWN = "UNKNOWN"
+    RESCUE_DEBUG = "RESCUE_DEBUG"
+
+
+class _Processor:
+    frequency = 120000000
+    temperature = 35.0
+    uid = b"\x00" * 16
+
+    @property
+    def reset_reason(self):
+        return getattr(ResetReason, simstate.reset_reason)
+
+
+class _WatchDogMode:
+    RAISE = "RAISE"
+    RESET = "RESET"
+
+
+class _WatchDog:
+    """Tracks feeds; a starved watchdog resets the simulated board."""
+
+    def __init__(self):
+        self.timeout = 0
+        self.mode = None
+        self.feeds = 0
+        self._fed_at = 0.0
+        self._listening = False
+
+    def feed(self):
+        self.feeds += 1
+        self._fed_at = simstate.clock.mono if simstate.clock else 0.0
+        if not self._listening and simstate.clock:
+            simstate.clock.listeners.append(self._check)
+            self._listening = True
+
+    def deinit(self):
+        self.mode = None
+
+    def _check(self, now):
+        if self.mode is not None and self.timeout and now - self._fed_at > self.timeout:
+            simstate.resets.append(now)
+            raise simstate.BoardReset("watchdog")
+
+
+cpu = _Processor()
+cpus = (cpu,)
+watchdog = _WatchDog()
+nvm = simstate.nvm
+
+
+def reset():
+    simstate.resets.append(simstate.clock.mono if simstate.clock else 0.0)
+    raise simstate.BoardReset("microcontroller.reset()")
+
+
+def on_next_reset(run_mode):
+    pass
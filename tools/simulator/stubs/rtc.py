@@ -0,0 +1,17 @@
+"""Stand-in for rtc: setting the time moves the simulated wall clock."""
+
+import calendar
+
+import simstate
+
+
+class RTC:
+    @property
+    def datetime(self):
+        import time
+        return time.localtime()
+
+    @datetime.setter
+    def datetime(self, value):
+        clock = simstate.clock
+        clock.start_epoch = calendar.timegm(tuple(value)[:6] + (0, 0, 0)) - clock.mono
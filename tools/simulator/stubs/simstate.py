@@ -0,0 +1,59 @@
+"""
+Shared state between the stand-in CircuitPython modules and the harness.
+
+The harness fills these in before running a board's code.py; the stubs
+read them. Nothing here exists on a real board.
+"""
+
+
+class SimulationDone(BaseException):
+    """Raised from the virtual clock when the simulated run is over.
+
+    A BaseException so board code's `except Exception` cannot swallow it.
+    """
+
+
+class BoardReset(BaseException):
+    """Raised by microcontroller.reset()."""
+
+
+class VirtualClock:
+    """Simulated time: monotonic seconds since boot plus a wall-clock epoch."""
+
+    def __init__(self, start_epoch, duration, tick=0.0005):
+        self.mono = 0.0       # Seconds since the run started (frames, presses, logs)
+        self.boot_at = 0.0    # Run time of the last boot; time.monotonic() counts from it
+        self.start_epoch = start_epoch
+        self.end = duration
+        self.tick = tick  # Charged per monotonic() call so busy loops still advance
+        self.listeners = []  # Called as listener(mono) after time moves
+
+    def advance(self, seconds):
+        self.mono += seconds
+        for listener in self.listeners:
+            listener(self.mono)
+        if self.mono >= self.end:
+            raise SimulationDone()
+
+    def monotonic(self):
+        self.advance(self.tick)
+        return self.mono - self.boot_at
+
+    def time(self):
+        return int(self.start_epoch + self.mono)
+
+    def sleep(self, seconds):
+        self.advance(max(seconds, 0))
+
+
+clock = None          # VirtualClock for the current run
+backend = None        # callable(url, headers) -> (status, headers, body bytes)
+display = None        # The one FramebufferDisplay, created by Matrix()
+button_presses = {}   # pin name -> list of (start, end) monotonic seconds held down
+network_latency = 0.3  # Seconds each request takes on the simulated link
+requests = []         # (monotonic, url, status, body bytes) for every request made
+scrapes = []          # monotonic seconds at which a client GETs /metrics (ESP32 server)
+scraped = []          # (monotonic, reply bytes) for every scrape the board answered
+resets = []           # monotonic time of each microcontroller.reset()
+reset_reason = "POWER_ON"  # microcontroller.cpu.reset_reason for the current boot
+nvm = bytearray(b"\xff" * 256)  # microcontroller.nvm, kept across simulated resets
@@ -0,0 +1,7 @@
+"""Stand-in for CircuitPython's watchdog module."""
+
+from microcontroller import _WatchDogMode as WatchDogMode  # noqa: F401
+
+
+class WatchDogTimeout(Exception):
+    pass
@@ -0,0 +1,66 @@
+"""
+Lists the records in the SPA board's raw traffic logs (traffic_log.py).
+
+Give it the folder the board logged to (an SD card, or a copy of it);
+the files are read oldest first, one line per record: monotonic and
+wall-clock time, status, body bytes, how the read ended, and the URL.
+Each file starts with its boot's reset reason and cause, so the run of
+responses before a reset reads straight down. --body N writes record N's
+body (as the board received it, gzip included) to stdout, e.g. to turn a
+field capture into a fixture.
+
+Usage: python tools/traffic_dump.py DIR [--files 4] [--body N]
+"""
+
+import argparse
+import sys
+import time
+
+import hostpaths
+import simulator  # noqa: F401  (microcontroller and rtc stand-ins for the board modules)
+
+hostpaths.use_board_modules()
+import metrics  # noqa: E402  (board modules)
+import traffic_log  # noqa: E402
+
+KINDS = {traffic_log.RESPONSE_RECORD: "", traffic_log.ERROR_RECORD: "error", traffic_log.TIME_RECORD: "time"}
+ENDS = ("", "closed early", "dropped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("directory")
+    parser.add_argument("--files", type=int, default=4, help="TRAFFIC_LOG_FILES on the board")
+    parser.add_argument("--body", type=int, help="write this record's body to stdout")
+    args = parser.parse_args()
+
+    paths = traffic_log.log_files(args.directory, args.files)
+    if not paths:
+        print(f"No traffic logs in {args.directory}")
+        return 1
+    number = 0
+    for path in paths:
+        sequence, reason, cause = traffic_log._file_header(path)
+        if args.body is None:
+            print(f"{path}: boot {sequence}, reset reason {metrics.REASONS[reason]}, cause {metrics.CAUSES[cause]}")
+        for record in traffic_log.LogReader([path]):
+            if args.body == number:
+                for chunk in traffic_log.body_chunks(record):
+                    sys.stdout.buffer.write(chunk)
+                return 0
+            if args.body is None:
+                size = sum(len(chunk) for chunk in traffic_log.body_chunks(record)) if record.status else 0
+                when = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(record.wall))
+                detail = KINDS[record.kind] or f"{record.status} {size:6d} B {ENDS[record.end]}"
+                if record.kind == traffic_log.ERROR_RECORD:
+                    detail += f" {record.message}"
+                print(f"  {number:5d} {record.mono_ms / 1000:10.1f} s  {when}  {detail:28}  {record.url or ''}")
+            number += 1
+    if args.body is not None:
+        print(f"No record {args.body}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())